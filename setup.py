@@ -129,6 +129,17 @@ def CythonExtension(module_name, **kw):
     return Extension(module_name, [path], **kw)
 
 
+# OpenMP lets the likelihood kernels split site patterns across threads.
+# Apple's compiler lacks it, and it can be disabled with DONT_USE_OPENMP
+if "DONT_USE_OPENMP" in os.environ or sys.platform == "darwin":
+    openmp_args = {}
+elif sys.platform == "win32":
+    # MSVC spells the flag differently and needs nothing at link time
+    openmp_args = dict(extra_compile_args=["/openmp"])
+else:
+    openmp_args = dict(extra_compile_args=["-fopenmp"], extra_link_args=["-fopenmp"])
+
+
 short_description = "COmparative GENomics Toolkit 3"
 
 readme_path = pathlib.Path(__file__).parent / "README.md"
@@ -202,7 +213,7 @@ setup(
             CythonExtension("cogent3.align._pairwise_seqs"),
             CythonExtension("cogent3.align._pairwise_pogs"),
             CythonExtension("cogent3.evolve._solved_models"),
-            CythonExtension("cogent3.evolve._likelihood_tree"),
+            CythonExtension("cogent3.evolve._likelihood_tree", **openmp_args),
             CythonExtension("cogent3.evolve._pairwise_distance"),
             CythonExtension("cogent3.maths._period"),
         ]
@@ -18,6 +18,7 @@ from cogent3.core.alignment import (
     SequenceCollection,
 )
 from cogent3.core.genetic_code import available_codes, get_code
+from cogent3.core.mmap_alignment import load_mmap_alignment
 # note that moltype has to be imported last, because it sets the moltype in
 # the objects created by the other modules.
 from cogent3.core.moltype import (
@@ -260,7 +261,9 @@ def load_aligned_seqs(
     filename : str
         path to sequence file
     format : str
-        sequence file format, if not specified tries to guess from the path suffix
+        sequence file format, if not specified tries to guess from the path
+        suffix. A 'c3aln' file is returned as a memory mapped ArrayAlignment
+        unless it must be converted.
     moltype
         the moltype, eg DNA, PROTEIN, 'dna', 'protein'
     array_align : bool
@@ -278,7 +281,17 @@ def load_aligned_seqs(
     for other_kw in ("constructor_kw", "kw"):
         other_kw = kw.pop(other_kw, None) or {}
         kw.update(other_kw)
-    data = list(FromFilenameParser(filename, format, **parser_kw))
+    if format == "c3aln" or (
+        format is None and get_format_suffixes(filename)[0] == "c3aln"
+    ):
+        # memory mapped, so only converted if required
+        data = load_mmap_alignment(filename)
+        if array_align and moltype is None and label_to_name is None and not kw:
+            data.info.update(info or {})
+            data.info["source"] = filename
+            return data
+    else:
+        data = list(FromFilenameParser(filename, format, **parser_kw))
     return make_aligned_seqs(
         data,
         array_align=array_align,
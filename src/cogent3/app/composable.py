@@ -6,6 +6,8 @@ import re
 import time
 import traceback
 
+from contextlib import nullcontext
+
 import scitrack
 
 from cogent3 import make_aligned_seqs, make_unaligned_seqs
@@ -18,6 +20,7 @@ from .data_store import (
     OVERWRITE,
     RAISE,
     SKIP,
+    BackgroundWriter,
     DataStoreMember,
     SingleReadDataStore,
     WritableDirectoryDataStore,
@@ -316,11 +319,12 @@ class Composable(ComposableType):
             return val
 
         if self.checkpointable:
-            job_done = self.job_done(refobj)
-            if job_done and self.output:
-                result = self._load_checkpoint(refobj)
-            elif job_done:
-                result = self._make_output_identifier(refobj)
+            with self._data_store_lock():
+                job_done = self.job_done(refobj)
+                if job_done and self.output:
+                    result = self._load_checkpoint(refobj)
+                elif job_done:
+                    result = self._make_output_identifier(refobj)
 
             if job_done:
                 return result
@@ -381,6 +385,8 @@ class Composable(ComposableType):
         par_kw=None,
         logger=True,
         cleanup=False,
+        max_in_flight=None,
+        background_write=False,
         ui=None,
     ):
         """invokes self composable function on the provided data store
@@ -407,15 +413,93 @@ class Composable(ComposableType):
         cleanup : bool
             after copying of log files into the data store, they are deleted
             from their original location
+        max_in_flight : int or None
+            if parallel, the maximum number of members submitted to workers
+            whose results have not been received. Defaults to 4 * the number
+            of workers.
+        background_write : bool
+            Argument ignored if not an io.writer. Writes to the data store, and
+            logging, are performed by a separate thread in batches so they do
+            not delay collecting results. The time spent waiting on the writer
+            is logged and recorded as the write_wait_time attribute. As the
+            write has not happened when the writer returns, the stored
+            attribute of written data is None.
 
         Returns
         -------
-        Result of the process as a list
+        Result of the process as a list, in the order of dstore
         Notes
         -----
         If run in parallel, this instance serves as the master object and
-        aggregates results.
+        aggregates results. Results are written and logged as they complete.
+        Use iter_apply_to() to avoid holding all results in memory.
+        """
+        results = {}
+        for index, outcome in self._apply_to(
+            dstore,
+            parallel=parallel,
+            mininterval=mininterval,
+            par_kw=par_kw,
+            logger=logger,
+            cleanup=cleanup,
+            max_in_flight=max_in_flight,
+            background_write=background_write,
+            ui=ui,
+        ):
+            results[index] = outcome
+        return [results[index] for index in sorted(results)]
+
+    def iter_apply_to(
+        self,
+        dstore,
+        parallel=False,
+        mininterval=2,
+        par_kw=None,
+        logger=True,
+        cleanup=False,
+        max_in_flight=None,
+        background_write=False,
+        ui=None,
+    ):
+        """generator version of apply_to, yielding results as they complete
+
+        Parameters are as for apply_to. ui defaults to displaying no
+        progress.
+
+        Notes
+        -----
+        If run in parallel, results are yielded in the order they complete.
+        Only the results for max_in_flight members are held at any time, and
+        no reference to a result is retained once yielded, so memory does not
+        grow with the size of dstore.
         """
+        ui = ui or UI.NULL_CONTEXT
+        for _, outcome in self._apply_to(
+            dstore,
+            parallel=parallel,
+            mininterval=mininterval,
+            par_kw=par_kw,
+            logger=logger,
+            cleanup=cleanup,
+            max_in_flight=max_in_flight,
+            background_write=background_write,
+            ui=ui,
+        ):
+            yield outcome
+
+    def _apply_to(
+        self,
+        dstore,
+        parallel,
+        mininterval,
+        par_kw,
+        logger,
+        cleanup,
+        max_in_flight,
+        background_write,
+        ui,
+    ):
+        """yields (index, outcome) for each member of dstore not yet done"""
         if isinstance(dstore, str):
             dstore = [dstore]
 
@@ -444,8 +528,7 @@ class Composable(ComposableType):
         if LOGGER:
             LOGGER.log_message(str(self), label="composable function")
             LOGGER.log_versions(["cogent3"])
-        results = []
-        i = 0
+
         process = self.input if self.input else self
         if self.input:
             # As we will be explicitly calling the input object, we disconnect
@@ -458,52 +541,80 @@ class Composable(ComposableType):
         # with a tinydb dstore, this also excludes data that failed to complete
         todo = [m for m in dstore if not self.job_done(m)]
 
-        for result in ui.imap(
-            process, todo, parallel=parallel, par_kw=par_kw, mininterval=mininterval
-        ):
-            outcome = result if process is self else self(result)
-            results.append(outcome)
-            if LOGGER:
-                member = dstore[i]
-                # ensure member is a DataStoreMember instance
-                if not isinstance(member, DataStoreMember):
-                    member = SingleReadDataStore(member)[0]
-
-                LOGGER.log_message(member, label="input")
-                if member.md5:
-                    LOGGER.log_message(member.md5, label="input md5sum")
-                mem_id = self.data_store.make_relative_identifier(member.name)
-                if outcome:
-                    member = self.data_store.get_member(mem_id)
-                    LOGGER.log_message(member, label="output")
-                    LOGGER.log_message(member.md5, label="output md5sum")
-                else:
-                    # we have a NotCompletedResult
-                    try:
-                        # tinydb supports storage
-                        self.data_store.write_incomplete(mem_id, outcome.to_rich_dict())
-                    except AttributeError:
-                        pass
-                    LOGGER.log_message(
-                        f"{outcome.origin} : {outcome.message}", label=outcome.type
-                    )
-
-            i += 1
-
-        finish = time.time()
-        taken = finish - start
-        if LOGGER:
-            LOGGER.log_message(f"{taken}", label="TIME TAKEN")
-            LOGGER.shutdown()
-            log_file_path = str(log_file_path)
-            self.data_store.add_file(log_file_path, cleanup=cleanup, keep_suffix=True)
-            self.data_store.close()
+        writer = None
+        if background_write and loggable and process is not self:
+            writer = self._writer = BackgroundWriter(self.data_store)
 
-        # now reconnect input
-        if process is not self:
-            self = process + self
-
-        return results
+        try:
+            for index, result in ui.as_completed(
+                process,
+                todo,
+                parallel=parallel,
+                par_kw=par_kw,
+                mininterval=mininterval,
+                max_in_flight=max_in_flight,
+            ):
+                outcome = result if process is self else self(result)
+                # the written outcome is all that is retained
+                del result
+                if LOGGER and writer:
+                    # logging requires the output has been written
+                    writer.call(self._log_outcome, LOGGER, todo[index], outcome)
+                elif LOGGER:
+                    self._log_outcome(LOGGER, todo[index], outcome)
+
+                yield index, outcome
+        finally:
+            # run even if iteration stopped early or a worker raised
+            try:
+                if writer is not None:
+                    # flushes pending writes, raising any errors
+                    self._writer = None
+                    self.write_wait_time = writer.wait_time
+                    writer.close()
+            finally:
+                # now reconnect input
+                if process is not self:
+                    self = process + self
+
+                if LOGGER:
+                    taken = time.time() - start
+                    if writer is not None:
+                        LOGGER.log_message(
+                            f"{writer.wait_time}", label="WRITER WAIT TIME"
+                        )
+                    LOGGER.log_message(f"{taken}", label="TIME TAKEN")
+                    log_file_path = str(LOGGER.log_file_path)
+                    LOGGER.shutdown()
+                    self.data_store.add_file(
+                        log_file_path, cleanup=cleanup, keep_suffix=True
+                    )
+                    self.data_store.close()
+
+    def _log_outcome(self, LOGGER, member, outcome):
+        """logs the input member and the outcome of applying self to it"""
+        # ensure member is a DataStoreMember instance
+        if not isinstance(member, DataStoreMember):
+            member = SingleReadDataStore(member)[0]
+
+        LOGGER.log_message(member, label="input")
+        if member.md5:
+            LOGGER.log_message(member.md5, label="input md5sum")
+        mem_id = self.data_store.make_relative_identifier(member.name)
+        if outcome:
+            member = self.data_store.get_member(mem_id)
+            LOGGER.log_message(member, label="output")
+            LOGGER.log_message(member.md5, label="output md5sum")
+        else:
+            # we have a NotCompletedResult
+            try:
+                # tinydb supports storage
+                self.data_store.write_incomplete(mem_id, outcome.to_rich_dict())
+            except AttributeError:
+                pass
+            LOGGER.log_message(
+                f"{outcome.origin} : {outcome.message}", label=outcome.type
+            )
 
 
 class ComposableTabular(Composable):
@@ -612,8 +723,10 @@ class _checkpointable(Composable):
         super(_checkpointable, self).__init__(**kwargs)
         self._formatted_params()
 
-        if data_path.endswith(".tinydb") and not self.__class__.__name__.endswith("db"):
-            raise ValueError("tinydb suffix reserved for write_db")
+        if data_path.endswith((".tinydb", ".sqlitedb")) and not (
+            self.__class__.__name__.endswith("db")
+        ):
+            raise ValueError("tinydb and sqlitedb suffixes reserved for write_db")
 
         self._checkpointable = True
         if_exists = if_exists.lower()
@@ -638,6 +751,8 @@ class _checkpointable(Composable):
         )
         self._callback = name_callback
         self.func = self.write
+        # a BackgroundWriter, set during apply_to(background_write=True)
+        self._writer = None
 
         # override the following in subclasses
         self._format = None
@@ -651,9 +766,16 @@ class _checkpointable(Composable):
         identifier = self.data_store.make_absolute_identifier(data)
         return identifier
 
+    def _data_store_lock(self):
+        """context for accessing the data store, which must be locked while
+        a background writer is active"""
+        writer = self._writer
+        return nullcontext() if writer is None else writer.lock
+
     def job_done(self, data):
         identifier = self._make_output_identifier(data)
-        exists = identifier in self.data_store
+        with self._data_store_lock():
+            exists = identifier in self.data_store
         if exists and self._if_exists == RAISE:
             msg = "'%s' already exists" % identifier
             raise RuntimeError(msg)
@@ -662,6 +784,18 @@ class _checkpointable(Composable):
             exists = False
         return exists
 
+    def _write(self, identifier, data):
+        """writes to data store, returning the DataStoreMember
+
+        If writing in the background, the write is queued and None returned
+        as the member does not exist yet.
+        """
+        if self._writer is None:
+            return self.data_store.write(identifier, data)
+
+        self._writer.write(identifier, data)
+        return None
+
     def write(self, data):
         # over-ride in subclass
         raise NotImplementedError
@@ -3,7 +3,11 @@ import json
 import os
 import pathlib
 import re
+import queue
 import shutil
+import sqlite3
+import threading
+import time
 import weakref
 import zipfile
 
@@ -46,6 +50,9 @@ OVERWRITE = "overwrite"
 RAISE = "raise"
 IGNORE = "ignore"
 
+# md5 checksums recorded before a manifest is saved
+MANIFEST_SAVE_EVERY = 100
+
 
 def make_record_for_json(identifier, data, completed):
     """returns a dict for storage as json"""
@@ -98,12 +105,49 @@ class DataStoreMember(str):
         return self.parent.md5(self, force=True)
 
 
+class _Manifest:
+    """the content of a data store manifest file"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as infile:
+                self.data = json.load(infile)
+        except (OSError, ValueError):
+            self.data = {}
+        # whether data differs from the file, and the number of md5
+        # checksums recorded since it was saved
+        self.dirty = False
+        self.unsaved = 0
+        self.finish = None
+
+    def save(self, quiet=False):
+        """writes the manifest, if it has changed
+
+        If quiet, failures to write are ignored."""
+        if not self.dirty:
+            return
+
+        dirname = os.path.dirname(self.path) or "."
+        try:
+            with atomic_write(self.path, tmpdir=dirname) as out:
+                json.dump(self.data, out)
+        except OSError:
+            if not quiet:
+                raise
+            return
+        self.dirty = False
+        self.unsaved = 0
+
+
 class ReadOnlyDataStoreBase:
     """a read only data store"""
 
     store_suffix = None
 
-    def __init__(self, source, suffix=None, limit=None, verbose=False, md5=True):
+    def __init__(
+        self, source, suffix=None, limit=None, verbose=False, md5=True, manifest=False
+    ):
         """
         Parameters
         ----------
@@ -118,6 +162,13 @@ class ReadOnlyDataStoreBase:
             variant)
         md5 : bool
             record md5 hexadecimal checksum of read data when possible
+        manifest : bool
+            members, their sizes, modification times and md5 checksums are
+            cached in a file next to source (applies only to the Directory and
+            Zipped variants). Only changes since the manifest was written are
+            rescanned. The manifest is written when members are first listed,
+            after every MANIFEST_SAVE_EVERY new md5 checksums, and by close()
+            or when the data store is garbage collected.
         """
         # assuming delimiter is /
 
@@ -141,6 +192,14 @@ class ReadOnlyDataStoreBase:
         self._verbose = verbose
         self._md5 = md5
         self._checksums = {}
+        self._use_manifest = manifest
+        # manifest file content and the records for this store's suffix
+        self._manifest = None
+        self._manifest_records = None
+        # member name to member, for O(1) lookups
+        self._index = None
+        self._index_members = None
+        self._index_size = 0
 
     def __getstate__(self):
         data = self._persistent.copy()
@@ -201,21 +260,26 @@ class ReadOnlyDataStoreBase:
                 klass = ReadOnlyDirectoryDataStore
             new = klass(self.source, suffix=suffix)
             return identifier in new
-        identifier = self.get_relative_identifier(identifier)
-        result = False
-        for member in self.members:
-            if identifier in member:
-                result = True
-                break
-        return result
+        return self.get_member(identifier) is not None
+
+    def _get_index(self):
+        """returns dict of member names to members"""
+        members = self.members
+        if self._index is None or self._index_members is not members:
+            self._index = {}
+            self._index_members = members
+            self._index_size = 0
+
+        # members are only ever appended, so we index just the new ones
+        for member in members[self._index_size :]:
+            self._index.setdefault(os.path.basename(member), member)
+        self._index_size = len(members)
+        return self._index
 
     def get_member(self, identifier):
         """returns DataStoreMember"""
         identifier = self.get_relative_identifier(identifier)
-        for member in self.members:
-            if identifier in member:
-                return member
-        return None
+        return self._get_index().get(os.path.basename(identifier), None)
 
     def get_relative_identifier(self, identifier):
         """returns the identifier relative to store root path
@@ -259,6 +323,7 @@ class ReadOnlyDataStoreBase:
         data = source.read()
         if self._md5:
             self._checksums[identifier] = get_text_hexdigest(data)
+            self._set_manifest_md5(identifier, self._checksums[identifier])
         source.close()
         return data
 
@@ -293,6 +358,11 @@ class ReadOnlyDataStoreBase:
         """
         md5_setting = self._md5  # for restoring automatic md5 calc setting
         absoluteid = self.get_absolute_identifier(identifier)
+        if absoluteid not in self._checksums:
+            checksum = self._get_manifest_md5(absoluteid)
+            if checksum is not None:
+                self._checksums[absoluteid] = checksum
+
         if force and absoluteid not in self._checksums:
             self._md5 = True
             _ = self.read(absoluteid)
@@ -301,13 +371,144 @@ class ReadOnlyDataStoreBase:
         self._md5 = md5_setting
         return result
 
+    @property
+    def manifest_path(self):
+        """path of the manifest file, which is next to source"""
+        return f"{self.source}.manifest.json"
+
+    def _load_manifest(self):
+        """returns the records for this suffix from the manifest file"""
+        if self._manifest is not None:
+            self._manifest.finish.detach()
+        self._manifest = _Manifest(self.manifest_path)
+        # input stores are rarely closed, so unsaved md5s are also written
+        # when this store is garbage collected or at exit
+        self._manifest.finish = weakref.finalize(self, self._manifest.save, True)
+        return self._manifest.data.get(self.suffix, {})
+
+    def _update_manifest(self, section):
+        """sets the records for this suffix, saving if they changed"""
+        if section != self._manifest.data.get(self.suffix):
+            self._manifest.data[self.suffix] = section
+            self._manifest.dirty = True
+            self.save_manifest()
+
+    def save_manifest(self):
+        """writes the manifest, if it has changed"""
+        if self._manifest is not None:
+            self._manifest.save()
+
+    def _manifest_record(self, identifier):
+        """returns the up-to-date manifest record for identifier, or None"""
+        return None  # override in subclasses
+
+    def _get_manifest_md5(self, identifier):
+        """returns the md5 recorded in the manifest or None"""
+        if self._manifest_records is None:
+            return None
+        record = self._manifest_record(identifier)
+        return None if record is None else record[2]
+
+    def _set_manifest_md5(self, identifier, checksum):
+        """records the md5 of identifier in the manifest"""
+        if self._manifest_records is None:
+            return
+        record = self._manifest_record(identifier)
+        if record is not None and record[2] != checksum:
+            record[2] = checksum
+            self._manifest.dirty = True
+            self._manifest.unsaved += 1
+            if self._manifest.unsaved >= MANIFEST_SAVE_EVERY:
+                self.save_manifest()
+
+    def close(self):
+        """saves the manifest, if in use"""
+        self.save_manifest()
+
 
 class ReadOnlyDirectoryDataStore(ReadOnlyDataStoreBase):
+    def _scan_manifest(self):
+        """returns paths of members, updating the manifest
+
+        Only directories whose modification time differs from that in the
+        manifest are listed.
+        """
+        section = self._load_manifest()
+        old_dirs = section.get("dirs", {})
+        old_files = section.get("files", {})
+        # group previous records by their directory
+        subdirs = defaultdict(list)
+        for rel_dir in old_dirs:
+            if rel_dir:
+                subdirs[os.path.dirname(rel_dir)].append(rel_dir)
+        dir_files = defaultdict(list)
+        for rel_path in old_files:
+            dir_files[os.path.dirname(rel_path)].append(rel_path)
+
+        pattern = f"*.{self.suffix}"
+        dirs = {}
+        files = {}
+        todo = [""]
+        while todo:
+            rel_dir = todo.pop()
+            path = os.path.join(self.source, rel_dir)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+
+            dirs[rel_dir] = mtime
+            if old_dirs.get(rel_dir) == mtime:
+                # directory listing unchanged
+                files.update((p, old_files[p]) for p in dir_files[rel_dir])
+                todo.extend(subdirs[rel_dir])
+                continue
+
+            for entry in os.scandir(path):
+                if entry.name.startswith("."):
+                    # as for glob
+                    continue
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir():
+                    todo.append(rel_path)
+                elif fnmatch(entry.name, pattern):
+                    stat = entry.stat()
+                    record = [stat.st_size, stat.st_mtime_ns, None]
+                    old = old_files.get(rel_path)
+                    if old and old[:2] == record[:2]:
+                        record[2] = old[2]
+                    files[rel_path] = record
+
+        self._update_manifest(dict(dirs=dirs, files=files))
+        # records are keyed by member name
+        self._manifest_records = {os.path.basename(p): p for p in files}
+        return [os.path.join(self.source, p) for p in sorted(files)]
+
+    def _manifest_record(self, identifier):
+        rel_path = self._manifest_records.get(os.path.basename(identifier))
+        if rel_path is None:
+            return None
+
+        record = self._manifest.data[self.suffix]["files"][rel_path]
+        try:
+            stat = os.stat(os.path.join(self.source, rel_path))
+        except FileNotFoundError:
+            return None
+
+        if record[:2] != [stat.st_size, stat.st_mtime_ns]:
+            # modified since recorded
+            record[:] = [stat.st_size, stat.st_mtime_ns, None]
+            self._manifest.dirty = True
+        return record
+
     @property
     def members(self):
         if not self._members:
-            pattern = "%s/**/*.%s" % (self.source, self.suffix)
-            paths = glob.iglob(pattern, recursive=True)
+            if self._use_manifest:
+                paths = self._scan_manifest()
+            else:
+                pattern = "%s/**/*.%s" % (self.source, self.suffix)
+                paths = glob.iglob(pattern, recursive=True)
             members = []
             for i, path in enumerate(paths):
                 if self.limit and i >= self.limit:
@@ -350,9 +551,60 @@ class SingleReadDataStore(ReadOnlyDirectoryDataStore):
 class ReadOnlyZippedDataStore(ReadOnlyDataStoreBase):
     store_suffix = "zip"
 
+    def _scan_manifest(self):
+        """returns archive names of members, updating the manifest
+
+        The archive is only read if its size or modification time differ from
+        those in the manifest.
+        """
+        section = self._load_manifest()
+        stat = os.stat(self.source)
+        archive_stat = [stat.st_size, stat.st_mtime_ns]
+        if section.get("archive") != archive_stat:
+            pattern = "*.%s" % self.suffix
+            old_files = section.get("files", {})
+            files = {}
+            with zipfile.ZipFile(self.source) as archive:
+                for info in archive.infolist():
+                    if not fnmatch(os.path.basename(info.filename), pattern):
+                        continue
+                    record = [info.file_size, info.CRC, None]
+                    old = old_files.get(info.filename)
+                    if old and old[:2] == record[:2]:
+                        record[2] = old[2]
+                    files[info.filename] = record
+            section = dict(archive=archive_stat, files=files)
+            self._update_manifest(section)
+
+        files = section["files"]
+        self._manifest_records = {os.path.basename(n): n for n in files}
+        return list(files)
+
+    def _manifest_record(self, identifier):
+        name = self._manifest_records.get(os.path.basename(identifier))
+        if name is None:
+            return None
+
+        stat = os.stat(self.source)
+        section = self._manifest.data[self.suffix]
+        if section["archive"] != [stat.st_size, stat.st_mtime_ns]:
+            # archive modified since recorded
+            return None
+        return section["files"][name]
+
     @property
     def members(self):
-        if os.path.exists(self.source) and not self._members:
+        if os.path.exists(self.source) and not self._members and self._use_manifest:
+            source_path = self.source.replace(Path(self.source).suffix, "")
+            members = []
+            for name in self._scan_manifest():
+                name = os.path.basename(name)
+                member = DataStoreMember(os.path.join(source_path, name), self)
+                members.append(member)
+                if self.limit and len(members) >= self.limit:
+                    break
+            self._members = members
+        elif os.path.exists(self.source) and not self._members:
             source_path = self.source.replace(Path(self.source).suffix, "")
             pattern = "*.%s" % self.suffix
             members = []
@@ -525,6 +777,24 @@ class WritableDataStoreBase:
         """
         raise NotImplementedError
 
+    def write_many(self, records):
+        """
+        Parameters
+        ----------
+        records
+            series of (identifier, data) pairs
+
+        Returns
+        -------
+        list of DataStoreMember instances
+
+        Notes
+        -----
+        Subclasses where a single commit of many records is cheaper than
+        separate commits override this.
+        """
+        return [self.write(identifier, data) for identifier, data in records]
+
     def close(self):
         pass
 
@@ -692,6 +962,33 @@ class WritableZippedDataStore(ReadOnlyZippedDataStore, WritableDataStoreBase):
 
         return member
 
+    @extend_docstring_from(WritableDataStoreBase.write_many)
+    def write_many(self, records):
+        # resolve membership before the archive is modified
+        new_records = []
+        for identifier, data in records:
+            relative_id = self.get_relative_identifier(identifier)
+            is_new = relative_id not in self and relative_id.endswith(self.suffix)
+            new_records.append((relative_id, data, is_new))
+
+        members = []
+        # the archive is opened once for all records
+        with zipfile.ZipFile(self.source, "a") as archive:
+            for relative_id, data, is_new in new_records:
+                if self._md5:
+                    absolute_id = self.get_absolute_identifier(
+                        relative_id, from_relative=True
+                    )
+                    self._checksums[absolute_id] = get_text_hexdigest(data)
+
+                archive.writestr(str(relative_id), data)
+                member = DataStoreMember(relative_id, self)
+                if is_new:
+                    self._members.append(member)
+                members.append(member)
+
+        return members
+
 
 def _db_lockid(path):
     """returns value for pid in LOCK record or None"""
@@ -782,7 +1079,11 @@ class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
     @property
     def locked(self):
         """returns lock pid or None if unlocked or pid matches self"""
-        return _db_lockid(self.source) is not None
+        return self._get_lock_id() is not None
+
+    def _get_lock_id(self):
+        """returns value for pid in LOCK record or None"""
+        return _db_lockid(self.source)
 
     def unlock(self, force=False):
         """remove a lock if pid matches. If force, ignores pid."""
@@ -947,7 +1248,7 @@ class ReadOnlyTinyDbDataStore(ReadOnlyDataStoreBase):
     @property
     def describe(self):
         """returns tables describing content types"""
-        lock_id = _db_lockid(self.source)
+        lock_id = self._get_lock_id()
         if lock_id:
             title = (
                 f"Locked db store. Locked to pid={lock_id}, current pid={os.getpid()}"
@@ -1012,6 +1313,39 @@ class WritableTinyDbDataStore(ReadOnlyTinyDbDataStore, WritableDataStoreBase):
 
         return member
 
+    @extend_docstring_from(WritableDataStoreBase.write_many)
+    def write_many(self, records):
+        members = [None] * len(records)
+        new_ids = {}
+        new_records = []
+        for i, (identifier, data) in enumerate(records):
+            matches = self.filtered(identifier)
+            relative_id = self.get_relative_identifier(identifier)
+            if matches or relative_id in new_ids:
+                members[i] = matches[0] if matches else relative_id
+                continue
+
+            members[i] = new_ids[relative_id] = relative_id
+            new_records.append(make_record_for_json(relative_id, data, True))
+
+        # a single insertion for all new records
+        doc_ids = self.db.insert_multiple(new_records) if new_records else []
+        for relative_id, doc_id in zip(new_ids, doc_ids):
+            member = DataStoreMember(relative_id, self, id=doc_id)
+            if relative_id.endswith(self.suffix):
+                self._members.append(member)
+            new_ids[relative_id] = member
+
+        # repeated identifiers get the first member
+        return [
+            m if isinstance(m, DataStoreMember) else new_ids[m] for m in members
+        ]
+
+    def _count_identifiers(self, pattern):
+        """returns number of records whose identifier matches pattern"""
+        query = Query().identifier.matches(pattern)
+        return self.db.count(query)
+
     def write_incomplete(self, identifier, not_completed):
         """stores an incomplete result object"""
         from .composable import NotCompleted
@@ -1056,8 +1390,7 @@ class WritableTinyDbDataStore(ReadOnlyTinyDbDataStore, WritableDataStoreBase):
         else:
             name_wo_suffix = relativeid
         suffixes = "".join(relativeid.suffixes)
-        query = Query().identifier.matches(f"{name_wo_suffix}*")
-        num = self.db.count(query)
+        num = self._count_identifiers(f"{name_wo_suffix}*")
         if num:
             num += 1
             relativeid = str(relativeid).replace(suffixes, f"-{num}{suffixes}")
@@ -1070,3 +1403,414 @@ class WritableTinyDbDataStore(ReadOnlyTinyDbDataStore, WritableDataStoreBase):
             path.unlink()
 
         return m
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    identifier TEXT NOT NULL,
+    data TEXT NOT NULL,
+    completed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_identifier ON records (identifier, completed);
+CREATE TABLE IF NOT EXISTS lock (pid INTEGER NOT NULL);
+"""
+
+
+def _sqlite_lockid(path):
+    """returns value for pid in lock table or None"""
+    if not os.path.exists(path):
+        return None
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        got = db.execute("SELECT pid FROM lock").fetchone()
+    except sqlite3.OperationalError:
+        # lock table not yet created
+        got = None
+    db.close()
+    return None if got is None else got[0]
+
+
+class ReadOnlySqliteDataStore(ReadOnlyTinyDbDataStore):
+    """An SQLite based json data store
+
+    Records are indexed by identifier, so membership tests, member lookups
+    and queries for incomplete records or logs do not scan all records.
+    """
+
+    store_suffix = "sqlitedb"
+
+    def __contains__(self, identifier):
+        """whether identifier has been stored here"""
+        if isinstance(identifier, DataStoreMember):
+            return identifier.parent is self
+
+        identifier = self.get_relative_identifier(identifier)
+        sql = "SELECT 1 FROM records WHERE identifier = ? LIMIT 1"
+        return self.db.execute(sql, (identifier,)).fetchone() is not None
+
+    def __repr__(self):
+        txt = ReadOnlyDataStoreBase.__repr__(self)
+        sql = "SELECT COUNT(*) FROM records WHERE completed = 0"
+        num = self.db.execute(sql).fetchone()[0]
+        if num > 0:
+            txt = f"{txt}, {num}x incomplete"
+        return txt
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self._connect()
+            self._finish = weakref.finalize(self, self._close, self._db)
+
+        return self._db
+
+    def _connect(self):
+        """returns a connection to the database"""
+        return sqlite3.connect(
+            f"file:{self.source}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    @classmethod
+    def _close(cls, db):
+        try:
+            db.commit()
+            db.close()
+        except sqlite3.ProgrammingError:
+            # connection probably already closed
+            pass
+
+    def close(self):
+        """closes the data store"""
+        if self._db is None or not self._finish.alive:
+            # never opened, or already closed
+            self._db = None
+            return
+
+        self.unlock()
+        self._finish()
+        self._finish.detach()
+        self._db = None
+
+    def lock(self):
+        """if writable, and not locked, locks the database to this pid
+        """
+        if not self.locked:
+            with self._db:
+                self._db.execute("INSERT INTO lock (pid) VALUES (?)", (os.getpid(),))
+
+    def _get_lock_id(self):
+        """returns value for pid in lock table or None"""
+        return _sqlite_lockid(self.source)
+
+    def unlock(self, force=False):
+        """remove a lock if pid matches. If force, ignores pid."""
+        if "readonly" in self.__class__.__name__.lower():
+            # not allowed to touch a lock
+            return
+
+        got = self.db.execute("SELECT pid FROM lock").fetchone()
+        if not got:
+            return
+
+        lock_id = got[0]
+        if lock_id == os.getpid() or force:
+            with self.db:
+                self.db.execute("DELETE FROM lock")
+
+        return lock_id
+
+    def _make_members(self, sql, args=()):
+        return [
+            DataStoreMember(identifier, self, id=id_)
+            for id_, identifier in self.db.execute(sql, args)
+        ]
+
+    @property
+    def incomplete(self):
+        """returns database records with completed=False"""
+        sql = "SELECT id, identifier FROM records WHERE completed = 0 ORDER BY id"
+        return self._make_members(sql)
+
+    @property
+    def members(self):
+        if not self._members:
+            pattern = f"*.{self.suffix}" if self.suffix else "*"
+            sql = (
+                "SELECT id, identifier FROM records "
+                "WHERE completed = 1 AND identifier GLOB ? ORDER BY id"
+            )
+            args = (pattern,)
+            if self.limit:
+                sql = f"{sql} LIMIT ?"
+                args = (pattern, self.limit)
+            self._members = self._make_members(sql, args)
+
+        return self._members
+
+    def get_member(self, identifier):
+        """returns DataStoreMember"""
+        identifier = self.get_relative_identifier(identifier)
+        sql = (
+            "SELECT id, identifier FROM records "
+            "WHERE identifier = ? AND completed = 1 LIMIT 1"
+        )
+        got = self._make_members(sql, (identifier,))
+        return got[0] if got else None
+
+    def open(self, identifier):
+        if getattr(identifier, "parent", None) is not self:
+            member = self.get_member(identifier)
+        else:
+            member = identifier
+
+        sql = "SELECT data FROM records WHERE id = ?"
+        data = self.db.execute(sql, (member.id,)).fetchone()[0]
+        return json.loads(data)
+
+    @property
+    def logs(self):
+        """returns all records with a .log suffix"""
+        sql = "SELECT id, identifier FROM records WHERE identifier GLOB ? ORDER BY id"
+        return self._make_members(sql, ("*.log",))
+
+    def _count_identifiers(self, pattern):
+        """returns number of records whose identifier matches pattern"""
+        sql = "SELECT COUNT(*) FROM records WHERE identifier GLOB ?"
+        return self.db.execute(sql, (pattern,)).fetchone()[0]
+
+
+class WritableSqliteDataStore(ReadOnlySqliteDataStore, WritableTinyDbDataStore):
+    def _connect(self):
+        db = sqlite3.connect(self.source, check_same_thread=False)
+        # write ahead logging allows reading while writing
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        with db:
+            db.executescript(_SQLITE_SCHEMA)
+        self._db = db
+        self.lock()
+        return db
+
+    def _source_create_delete(self, if_exists, create):
+        if _sqlite_lockid(self.source):
+            return
+
+        exists = os.path.exists(self.source)
+        dirname = os.path.dirname(self.source)
+        if exists and if_exists == RAISE:
+            raise RuntimeError(f"'{self.source}' exists")
+        elif exists and if_exists == OVERWRITE:
+            try:
+                os.remove(self.source)
+            except (IsADirectoryError, PermissionError):
+                # probably user accidentally created a directory
+                shutil.rmtree(self.source)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(self.source + suffix):
+                    os.remove(self.source + suffix)
+        elif dirname and not os.path.exists(dirname) and not create:
+            raise RuntimeError(f"'{dirname}' does not exist")
+
+        if create and dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+    def _completed_member(self, identifier):
+        """returns the completed member matching identifier, or None"""
+        sql = (
+            "SELECT id, identifier FROM records "
+            "WHERE identifier = ? AND completed = 1 LIMIT 1"
+        )
+        got = self._make_members(sql, (identifier,))
+        return got[0] if got else None
+
+    def _insert(self, identifier, data, completed):
+        """inserts record, returns DataStoreMember. Caller commits."""
+        record = make_record_for_json(identifier, data, completed)
+        cursor = self.db.execute(
+            "INSERT INTO records (identifier, data, completed) VALUES (?, ?, ?)",
+            (identifier, record["data"], int(completed)),
+        )
+        return DataStoreMember(identifier, self, id=cursor.lastrowid)
+
+    @extend_docstring_from(WritableDataStoreBase.write)
+    def write(self, identifier, data):
+        return self.write_many([(identifier, data)])[0]
+
+    @extend_docstring_from(WritableDataStoreBase.write_many)
+    def write_many(self, records):
+        members = []
+        new = {}
+        # all records are inserted in a single transaction
+        with self.db:
+            for identifier, data in records:
+                relative_id = self.get_relative_identifier(identifier)
+                member = new.get(relative_id) or self._completed_member(relative_id)
+                if member is None:
+                    member = new[relative_id] = self._insert(relative_id, data, True)
+                    if self._members and relative_id.endswith(self.suffix):
+                        self._members.append(member)
+                members.append(member)
+
+        return members
+
+    def write_incomplete(self, identifier, not_completed):
+        """stores an incomplete result object"""
+        relative_id = self.get_relative_identifier(identifier)
+        member = self._completed_member(relative_id)
+        if member is not None:
+            return member
+
+        with self.db:
+            member = self._insert(relative_id, not_completed, False)
+
+        return member
+
+
+class BackgroundWriter:
+    """writes to a data store from a dedicated thread
+
+    Writes are queued and committed in batches using the data store
+    write_many() method. Operations are applied in the order submitted.
+    Data stores are not thread safe, so other threads must hold lock while
+    accessing the data store.
+    """
+
+    def __init__(self, data_store, max_queue=100, batch_size=50):
+        """
+        Parameters
+        ----------
+        data_store
+            a writable data store
+        max_queue : int
+            maximum number of pending operations, submitting more blocks
+            until the writer catches up
+        batch_size : int
+            maximum number of records committed together
+        """
+        self.data_store = data_store
+        self._batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._closed = False
+        # held by the writer thread while it applies a batch
+        self.lock = threading.RLock()
+        # time submitters were blocked by a full queue and time spent writing
+        self.wait_time = 0.0
+        self.write_time = 0.0
+        self.num_written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        if self._error is not None:
+            self._raise_error()
+        if self._closed:
+            raise RuntimeError("BackgroundWriter is closed")
+
+        start = time.perf_counter()
+        self._queue.put(item)
+        self.wait_time += time.perf_counter() - start
+
+    def write(self, identifier, data, callback=None):
+        """queues data for writing to identifier
+
+        If provided, callback is called with the resulting DataStoreMember.
+        """
+        self._put(("write", (identifier, data), callback))
+
+    def write_incomplete(self, identifier, not_completed, callback=None):
+        """queues a NotCompleted for writing to identifier"""
+        self._put(("incomplete", (identifier, not_completed), callback))
+
+    def call(self, func, *args):
+        """queues func(*args), called once preceding writes are complete"""
+        self._put(("call", args, func))
+
+    def _next_batch(self):
+        """blocks until an item is available, returns up to batch_size items"""
+        batch = [self._queue.get()]
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            if stop:
+                batch.pop(-1)
+
+            try:
+                if self._error is None:
+                    with self.lock:
+                        self._apply(batch)
+            except Exception as err:
+                # reported to the submitting thread, later items are discarded
+                self._error = err
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+
+            if stop:
+                break
+
+    def _apply(self, batch):
+        start = time.perf_counter()
+        records = []
+        callbacks = []
+        for kind, args, func in batch:
+            if kind == "write":
+                records.append(args)
+                callbacks.append(func)
+                continue
+
+            # commit writes preceding this operation
+            self._commit(records, callbacks)
+            records, callbacks = [], []
+            if kind == "incomplete":
+                member = self.data_store.write_incomplete(*args)
+                if func is not None:
+                    func(member)
+            else:
+                func(*args)
+
+        self._commit(records, callbacks)
+        self.write_time += time.perf_counter() - start
+
+    def _commit(self, records, callbacks):
+        if not records:
+            return
+
+        members = self.data_store.write_many(records)
+        self.num_written += len(records)
+        for func, member in zip(callbacks, members):
+            if func is not None:
+                func(member)
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        raise error
+
+    def flush(self):
+        """blocks until all queued operations are complete
+
+        Raises any exception that occurred in the writer thread.
+        """
+        self._queue.join()
+        if self._error is not None:
+            self._raise_error()
+
+    def close(self):
+        """flushes the queue and stops the writer thread"""
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            self._raise_error()
@@ -1,5 +1,7 @@
 import os
 
+import numpy
+
 from tqdm import tqdm
 
 from cogent3 import load_tree, make_tree
@@ -308,6 +310,44 @@ class hypothesis(ComposableHypothesis):
         return result
 
 
+class _simulate_and_fit:
+    """fits a hypothesis to an alignment simulated from a null model
+
+    Instances are sent once to each worker process by bootstrap, and called
+    with (replicate number, seed) pairs.
+    """
+
+    def __init__(self, null, hyp, source):
+        self._null = null
+        self._hyp = hyp
+        self._source = source
+
+    def __call__(self, rep):
+        rep_num, seed = rep
+        sim_aln = self._null.simulate_alignment(seed=seed)
+        sim_aln.info.source = "%s - simalign %d" % (self._source, rep_num)
+
+        try:
+            sym_result = self._hyp(sim_aln)
+        except ValueError:
+            sym_result = None
+        return sym_result
+
+
+def _in_order(indexed_results):
+    """yields results from (index, result) pairs in index order
+
+    Results that complete early are held only until those preceding them
+    have been yielded."""
+    pending = {}
+    next_index = 0
+    for (index, result) in indexed_results:
+        pending[index] = result
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
+
+
 class bootstrap(ComposableHypothesis):
     """Parametric bootstrap for a provided hypothesis. Returns a bootstrap_result."""
 
@@ -315,7 +355,24 @@ class bootstrap(ComposableHypothesis):
     _output_types = (RESULT_TYPE, BOOTSTRAP_RESULT_TYPE, SERIALISABLE_TYPE)
     _data_types = ("ArrayAlignment", "Alignment")
 
-    def __init__(self, hyp, num_reps, parallel=False, verbose=False):
+    def __init__(self, hyp, num_reps, parallel=False, verbose=False, seed=None):
+        """
+        Parameters
+        ----------
+        hyp
+            a hypothesis app
+        num_reps : int
+            number of alignments to simulate from the fitted null
+        parallel : bool
+            fit the simulated alignments in parallel. The fitted null and
+            hyp are sent once to each worker process.
+        verbose : bool
+            not used
+        seed : int or None
+            seed from which the random number generator of each replicate
+            is seeded, so the replicates are reproducible irrespective of
+            the order they are computed in. None for a random seed.
+        """
         super(bootstrap, self).__init__(
             input_types=self._input_types,
             output_types=self._output_types,
@@ -326,17 +383,13 @@ class bootstrap(ComposableHypothesis):
         self._num_reps = num_reps
         self._verbose = verbose
         self._parallel = parallel
+        self._seed = seed
         self.func = self.run
 
-    def _fit_sim(self, rep_num):
-        sim_aln = self._null.simulate_alignment()
-        sim_aln.info.source = "%s - simalign %d" % (self._inpath, rep_num)
-
-        try:
-            sym_result = self._hyp(sim_aln)
-        except ValueError:
-            sym_result = None
-        return sym_result
+    def _replicate_seeds(self):
+        """one seed per replicate, derived from self._seed"""
+        seeds = numpy.random.SeedSequence(self._seed).spawn(self._num_reps)
+        return [int(s.generate_state(1)[0]) for s in seeds]
 
     def run(self, aln):
         result = bootstrap_result(aln.info.source)
@@ -346,11 +399,14 @@ class bootstrap(ComposableHypothesis):
             result = NotCompleted("ERROR", str(self._hyp), err.args[0])
             return result
         result.observed = obs
-        self._null = obs.null
-        self._inpath = aln.info.source
 
-        map_fun = map if not self._parallel else parallel.imap
-        sym_results = [r for r in map_fun(self._fit_sim, range(self._num_reps)) if r]
+        fit = _simulate_and_fit(obs.null, self._hyp, aln.info.source)
+        reps = list(enumerate(self._replicate_seeds()))
+        if self._parallel:
+            sym_results = _in_order(parallel.as_completed(fit, reps, batched=True))
+        else:
+            sym_results = map(fit, reps)
+
         for sym_result in sym_results:
             if not sym_result:
                 continue
@@ -40,9 +40,11 @@ from .data_store import (
     RAISE,
     SKIP,
     ReadOnlyDirectoryDataStore,
+    ReadOnlySqliteDataStore,
     ReadOnlyTinyDbDataStore,
     ReadOnlyZippedDataStore,
     SingleReadDataStore,
+    WritableSqliteDataStore,
     WritableTinyDbDataStore,
     load_record_from_json,
     make_record_for_json,
@@ -80,7 +82,7 @@ def findall(base_path, suffix="fa", limit=None, verbose=False):
     return data_store.members
 
 
-def get_data_store(base_path, suffix=None, limit=None, verbose=False):
+def get_data_store(base_path, suffix=None, limit=None, verbose=False, manifest=False):
     """returns DataStore containing glob matches to suffix in base_path
 
     Parameters
@@ -91,11 +93,15 @@ def get_data_store(base_path, suffix=None, limit=None, verbose=False):
         suffix of filenames
     limit : int or None
         the number of matches to return
+    manifest : bool
+        cache members and their checksums in a manifest file next to
+        base_path, only rescanning what has changed (applies only to
+        directories and zipped archives)
     Returns
     -------
     ReadOnlyDirectoryDataStore or ReadOnlyZippedDataStore
     """
-    if base_path.endswith("tinydb"):
+    if base_path.endswith(("tinydb", "sqlitedb")):
         suffix = "json"
 
     if suffix is None:
@@ -109,11 +115,16 @@ def get_data_store(base_path, suffix=None, limit=None, verbose=False):
     zipped = zipfile.is_zipfile(base_path)
     if base_path.endswith("tinydb"):
         klass = ReadOnlyTinyDbDataStore
+    elif base_path.endswith("sqlitedb"):
+        klass = ReadOnlySqliteDataStore
     elif zipped:
         klass = ReadOnlyZippedDataStore
     else:
         klass = ReadOnlyDirectoryDataStore
-    data_store = klass(base_path, suffix=suffix, limit=limit, verbose=verbose)
+    kwargs = dict(suffix=suffix, limit=limit, verbose=verbose)
+    if manifest and klass in (ReadOnlyDirectoryDataStore, ReadOnlyZippedDataStore):
+        kwargs["manifest"] = manifest
+    data_store = klass(base_path, **kwargs)
     return data_store
 
 
@@ -371,7 +382,7 @@ class write_tabular(_checkpointable, ComposableTabular):
         if identifier is None:
             identifier = self._make_output_identifier(data)
         output = data.to_string(format=self._format)
-        self.data_store.write(identifier, output)
+        self._write(identifier, output)
         return identifier
 
 
@@ -432,7 +443,7 @@ class write_seqs(_checkpointable):
     def write(self, data, identifier=None):
         if identifier is None:
             identifier = self._make_output_identifier(data)
-        data.info.stored = self.data_store.write(identifier, data.to_fasta())
+        data.info.stored = self._write(identifier, data.to_fasta())
         return identifier
 
 
@@ -501,7 +512,7 @@ class write_json(_checkpointable):
             identifier = self._make_output_identifier(data)
         out = make_record_for_json(os.path.basename(identifier), data, True)
         out = json.dumps(out)
-        stored = self.data_store.write(identifier, out)
+        stored = self._write(identifier, out)
         # todo is anything actually using this stored attriubte? if not, delete this
         #  code and all other cases
         if hasattr(data, "info"):
@@ -515,7 +526,7 @@ class write_json(_checkpointable):
 
 
 class load_db(Composable):
-    """Loads json serialised cogent3 objects from a TinyDB file. 
+    """Loads json serialised cogent3 objects from a TinyDB or SQLite file. 
     Returns whatever object type was stored."""
 
     _type = "output"
@@ -553,7 +564,8 @@ class load_db(Composable):
 
 
 class write_db(_checkpointable):
-    """Writes json serialised objects to a TinyDB instance."""
+    """Writes json serialised objects to a TinyDB instance, or an SQLite
+    database if data_path ends with .sqlitedb."""
 
     _type = "output"
 
@@ -571,7 +583,11 @@ class write_db(_checkpointable):
             create=create,
             if_exists=if_exists,
             suffix=suffix,
-            writer_class=WritableTinyDbDataStore,
+            writer_class=(
+                WritableSqliteDataStore
+                if data_path.endswith(".sqlitedb")
+                else WritableTinyDbDataStore
+            ),
         )
         self.func = self.write
 
@@ -586,7 +602,7 @@ class write_db(_checkpointable):
             out = data.to_json()
         except AttributeError:
             out = json.dumps(data)
-        stored = self.data_store.write(identifier, out)
+        stored = self._write(identifier, out)
         # todo is anything actually using this stored attriubte? if not, delete this
         #  code and all other cases
         if hasattr(data, "info"):
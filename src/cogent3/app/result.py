@@ -1,4 +1,5 @@
 import json
+import random
 
 from collections import OrderedDict
 from collections.abc import MutableMapping
@@ -210,15 +211,23 @@ class model_result(generic_result):
     def name(self):
         return self._name
 
-    def simulate_alignment(self):
+    def simulate_alignment(self, seed=None):
+        """returns an alignment simulated from the fitted likelihood function(s)
+
+        Parameters
+        ----------
+        seed
+            seed for the random number generator, None for a random seed
+        """
+        random_series = random.Random(seed)
         if len(self) == 1:
-            aln = self.lf.simulate_alignment()
+            aln = self.lf.simulate_alignment(random_series=random_series)
             return aln
         # assume we have results from 3 codon positions
         sim = []
         seqnames = None
         for i in sorted(self):
-            aln = self[i].simulate_alignment()
+            aln = self[i].simulate_alignment(random_series=random_series)
             sim.append(aln.to_dict())
             if seqnames is None:
                 seqnames = list(sim[-1].keys())
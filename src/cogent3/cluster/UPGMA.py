@@ -1,12 +1,16 @@
 # usr/bin/env python
 """Functions to cluster using UPGMA
 
-upgma takes an dictionary of pair tuples mapped to distances as input.
+upgma takes an dictionary of pair tuples mapped to distances, or a
+DistanceMatrix, as input.
 
 UPGMA_cluster takes an array and a list of PhyloNode objects corresponding
 to the array as input. Can also generate this type of input from a DictArray using
 inputs_from_dict_array function.
 
+UPGMA_cluster_condensed takes the condensed upper triangle of a distance
+matrix and a list of PhyloNode objects corresponding to its rows.
+
 Both return a PhyloNode object of the UPGMA cluster
 """
 
@@ -15,6 +19,7 @@ import numpy
 from numpy import argmin, array, average, diag, ma, ravel, sum, take
 
 from cogent3.core.tree import PhyloNode
+from cogent3.evolve.fast_distance import DistanceMatrix, _condensed_index
 from cogent3.util.dict_array import DictArray
 
 
@@ -31,17 +36,40 @@ __status__ = "Production"
 numerictypes = numpy.core.numerictypes.sctype2char
 Float = numerictypes(float)
 BIG_NUM = 1e305
+# maximum number of distances compared at once when rescanning rows
+SCAN_BLOCK_ELEMENTS = 2 ** 18
 
 
-def upgma(pairwise_distances):
+def upgma(pairwise_distances, engine="condensed"):
     """Uses the UPGMA algorithm to cluster sequences
 
-    pairwise_distances: a dictionary with pair tuples mapped to a distance
-    returns a PhyloNode object of the UPGMA cluster
+    Parameters
+    ----------
+    pairwise_distances
+        a dictionary with pair tuples mapped to a distance, or a
+        DistanceMatrix (whose condensed storage is used directly)
+    engine : str
+        'condensed' clusters on the condensed upper triangle using cached
+        row minima, requiring ~n^2/2 memory. A merge is typically O(n), but
+        O(n^2) in the worst case, so the total is O(n^3) in the worst case.
+        'matrix' uses the original full matrix implementation, which is
+        always O(n^3).
+
+    Returns
+    -------
+    PhyloNode object of the UPGMA cluster
     """
-    darr = DictArray(pairwise_distances)
-    matrix_a, node_order = inputs_from_dict_array(darr)
-    tree = UPGMA_cluster(matrix_a, node_order, BIG_NUM)
+    engine = engine.lower()
+    if engine == "matrix":
+        darr = DictArray(pairwise_distances)
+        matrix_a, node_order = inputs_from_dict_array(darr)
+        tree = UPGMA_cluster(matrix_a, node_order, BIG_NUM)
+    elif engine == "condensed":
+        condensed, node_order = inputs_from_distances(pairwise_distances)
+        tree = UPGMA_cluster_condensed(condensed, node_order)
+    else:
+        raise ValueError(f"unknown engine '{engine}', use 'condensed' or 'matrix'")
+
     index = 0
     for node in tree.traverse():
         if not node.parent:
@@ -105,9 +133,20 @@ def condense_node_order(matrix, smallest_index, node_order):
     index1, index2 = smallest_index
     node1 = node_order[index1]
     node2 = node_order[index2]
-    # get the distance between the nodes and assign 1/2 the distance to the
-    # lengthproperty of each node
+    # get the distance between the nodes
     distance = matrix[index1, index2]
+    # replace the object at index1 with the combined node
+    node_order[index1] = _join_nodes(node1, node2, distance)
+    # replace the object at index2 with None
+    node_order[index2] = None
+    return node_order
+
+
+def _join_nodes(node1, node2, distance):
+    """returns a PhyloNode with node1 and node2 as children
+
+    Assigns 1/2 the distance between the nodes to the tip length of each
+    node."""
     nodes = [node1, node2]
     d = distance / 2.0
     for n in nodes:
@@ -122,11 +161,7 @@ def condense_node_order(matrix, smallest_index, node_order):
     new_node.children.append(node2)
     node1.parent = new_node
     node2.parent = new_node
-    # replace the object at index1 with the combined node
-    node_order[index1] = new_node
-    # replace the object at index2 with None
-    node_order[index2] = None
-    return node_order
+    return new_node
 
 
 def UPGMA_cluster(matrix, node_order, large_number):
@@ -162,3 +197,123 @@ def inputs_from_dict_array(darr):
     darr.array += numpy.eye(darr.shape[0]) * BIG_NUM
     nodes = list(map(PhyloNode, darr.keys()))
     return darr.array, nodes
+
+
+def inputs_from_distances(pairwise_distances):
+    """makes inputs for UPGMA_cluster_condensed
+
+    Parameters
+    ----------
+    pairwise_distances
+        a DistanceMatrix, DictArray or a dictionary with pair tuples mapped
+        to a distance
+
+    Returns
+    -------
+    the condensed upper triangle and a list of PhyloNode objects
+    """
+    if isinstance(pairwise_distances, DistanceMatrix):
+        names = pairwise_distances.names
+        condensed = pairwise_distances.to_condensed()
+    else:
+        darr = DictArray(pairwise_distances)
+        names = darr.keys()
+        condensed = darr.array[numpy.triu_indices(darr.shape[0], k=1)]
+
+    nodes = list(map(PhyloNode, names))
+    return numpy.array(condensed, dtype=float), nodes
+
+
+def _row_indices(num, row, others):
+    """indices in a condensed upper triangle of (row, k) for k in others"""
+    return _condensed_index(
+        num, numpy.minimum(others, row), numpy.maximum(others, row)
+    )
+
+
+def UPGMA_cluster_condensed(condensed, node_order):
+    """cluster with UPGMA using the condensed upper triangle
+
+    Merges are identical to those of UPGMA_cluster, but the smallest
+    distance is found from a cache of the minimum of each row. Each merge
+    updates the cache in O(n), then rescans the rows whose cached minimum
+    was to a merged node, at O(n) per row. Typically few rows are
+    rescanned, but in the worst case (e.g. many rows closest to the same
+    node) a merge is O(n^2). Rows are rescanned in blocks of array
+    operations.
+
+    condensed is a 1D numpy array of the upper triangle in row-major
+    order, i.e. d[0, 1], d[0, 2], .. d[1, 2], ..
+    node_order is a list of PhyloNode objects corresponding to the rows.
+
+    WARNING: Changes condensed and node_order in-place.
+    """
+    num = len(node_order)
+    active = numpy.arange(num)
+    row_min = numpy.full(num, numpy.inf)
+    row_arg = numpy.zeros(num, dtype=int)
+
+    def scan_row(row, others):
+        if len(others) == 0:
+            row_min[row] = numpy.inf
+            return
+        values = condensed[_row_indices(num, row, others)]
+        index = argmin(values)
+        row_min[row] = values[index]
+        row_arg[row] = others[index]
+
+    def scan_rows(rows):
+        """rescans rows against all active nodes"""
+        if len(rows) == 0:
+            return
+        if len(active) == 1:
+            row_min[rows] = numpy.inf
+            return
+        # blocks of rows bound the size of the temporary arrays
+        cols = active[None, :]
+        block_size = max(1, SCAN_BLOCK_ELEMENTS // len(active))
+        for start in range(0, len(rows), block_size):
+            block = rows[start : start + block_size]
+            values = condensed[_row_indices(num, block[:, None], cols)]
+            values[block[:, None] == cols] = numpy.inf
+            index = values.argmin(axis=1)
+            row_min[block] = values[numpy.arange(len(block)), index]
+            row_arg[block] = active[index]
+
+    for row in range(num):
+        scan_row(row, active[active != row])
+
+    tree = None
+    for _ in range(num - 1):
+        # the first smallest row, and its first smallest column, match the
+        # row-major search of find_smallest_index, so index1 < index2
+        index1 = argmin(row_min)
+        index2 = row_arg[index1]
+        node_order[index1] = _join_nodes(
+            node_order[index1], node_order[index2], row_min[index1]
+        )
+        node_order[index2] = None
+        tree = node_order[index1]
+
+        active = active[active != index2]
+        row_min[index2] = numpy.inf
+        others = active[active != index1]
+        indices1 = _row_indices(num, index1, others)
+        new_values = condensed[indices1]
+        new_values += condensed[_row_indices(num, index2, others)]
+        new_values /= 2
+        condensed[indices1] = new_values
+        scan_row(index1, others)
+
+        # rows whose minimum is now the merged node
+        current = row_min[others]
+        better = (new_values < current) | (
+            (new_values == current) & (index1 < row_arg[others])
+        )
+        row_min[others[better]] = new_values[better]
+        row_arg[others[better]] = index1
+        # rows whose minimum involved a merged node have to be rescanned
+        merged = (row_arg[others] == index1) | (row_arg[others] == index2)
+        scan_rows(others[merged & ~better])
+
+    return tree
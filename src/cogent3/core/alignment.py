@@ -70,6 +70,7 @@ from cogent3.util.dict_array import DictArrayTemplate
 from cogent3.util.misc import (
     bytes_to_string,
     extend_docstring_from,
+    get_format_suffixes,
     get_object_provenance,
 )
 from cogent3.util.union_dict import UnionDict
@@ -2423,7 +2424,11 @@ class AlignmentI(object):
             alpha = self.moltype.alphabet.gapped
 
         if is_array:
+            # motifs where every element is an allowed character
             chars = list(map(alpha.index, chars))
+            counts = self._motif_state_counts(chars, motif_length)
+            keep = counts == self.num_seqs * motif_length
+            return self._take_motifs(keep, motif_length)
 
         predicate = AllowedCharacters(chars, is_array=is_array)
         new = self.filtered(predicate, motif_length=motif_length)
@@ -2454,6 +2459,9 @@ class AlignmentI(object):
         gaps = list(self.moltype.gaps)
         if is_array:
             gaps = list(map(alpha.index, gaps))
+            counts = self._motif_state_counts(gaps, motif_length)
+            gap_frac = counts / (self.num_seqs * motif_length)
+            return self._take_motifs(gap_frac <= allowed_gap_frac, motif_length)
 
         gaps_ok = GapsOk(
             gaps, allowed_gap_frac, is_array=is_array, motif_length=motif_length
@@ -3042,7 +3050,14 @@ class AlignmentI(object):
         new = klass(data=data, moltype=moltype, info=self.info, names=self.names)
         return new
 
-    def distance_matrix(self, calc="percent", show_progress=False, drop_invalid=False):
+    def distance_matrix(
+        self,
+        calc="percent",
+        show_progress=False,
+        drop_invalid=False,
+        parallel=False,
+        par_kw=None,
+    ):
         """Returns pairwise distances between sequences.
 
         Parameters
@@ -3056,6 +3071,11 @@ class AlignmentI(object):
             If True, sequences for which a pairwise distance could not be
             calculated are excluded. If False, an ArithmeticError is raised if
             a distance could not be computed on observed data.
+        parallel : bool
+            If True, pairwise distances are computed in parallel.
+        par_kw
+            dict of values for configuring parallel execution, e.g.
+            max_workers, use_mpi
         """
         from cogent3.evolve.fast_distance import get_distance_calculator
 
@@ -3066,7 +3086,9 @@ class AlignmentI(object):
                 alignment=self,
                 invalid_raises=not drop_invalid,
             )
-            calculator.run(show_progress=show_progress)
+            calculator.run(
+                show_progress=show_progress, parallel=parallel, par_kw=par_kw
+            )
         except ArithmeticError:
             msg = "not all pairwise distances could be computed, try drop_invalid=True"
             raise ArithmeticError(msg)
@@ -3401,6 +3423,18 @@ def aln_from_array(a, array_type=None, alphabet=None):
     return transpose(result), None
 
 
+def aln_from_seq_array(a, array_type=None, alphabet=None):
+    """Alignment from array of seq x pos: names are integers.
+
+    This is an InputHandler for Alignment. Unlike aln_from_array, the input
+    is used without copying if it already has data type array_type, so a
+    numpy.memmap remains backed by its file.
+    """
+    if array_type is not None:
+        a = a.astype(array_type, copy=False)
+    return a, None
+
+
 def aln_from_array_seqs(seqs, array_type=None, alphabet=None):
     """Alignment from ArraySequence objects: seqs -> array, names from seqs.
 
@@ -3539,6 +3573,30 @@ def aln_from_empty(obj, *args, **kwargs):
 # Implementation of Alignment base class
 
 
+def _counts_per_position(codes, num_states):
+    """returns [position, state] counts of the [position, sequence] array codes
+
+    Negative codes are not counted."""
+    num_pos = codes.shape[0]
+    offsets = codes + (arange(num_pos) * num_states)[:, None]
+    offsets = offsets[codes >= 0]
+    counts = numpy.bincount(offsets, minlength=num_pos * num_states)
+    return counts.reshape(num_pos, num_states)
+
+
+def _read_only_view(data):
+    """returns a view of the array data that cannot be written to"""
+    data = data.view()
+    data.flags.writeable = False
+    return data
+
+
+# k-mers with more possible states than this are counted as strings
+MAX_PACKED_STATES = 2 ** 24
+# maximum number of alignment elements counted at a time per sequence
+COUNTS_CHUNK_SIZE = 2 ** 22
+
+
 class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
     """Holds a dense array representing a multiple sequence alignment.
 
@@ -3589,6 +3647,10 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
     Creating a new array will always result in a new object unless you use
     the force_same_object=True parameter.
 
+    Slices of an ArrayAlignment, including those from sliding_windows, share
+    its array as a read only view, so no sequence data is copied. Use copy()
+    for an alignment that can be modified.
+
     WARNING: Rebinding the names attribute in a ArrayAlignment is not
     recommended because not all methods will use the updated name order. This
     is because the original sequence and name order are used to produce data
@@ -3620,7 +3682,9 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
         """
         kwargs["suppress_named_seqs"] = True
         super(ArrayAlignment, self).__init__(*args, **kwargs)
-        self.array_positions = transpose(self.seq_data.astype(self.alphabet.array_type))
+        self.array_positions = transpose(
+            self.seq_data.astype(self.alphabet.array_type, copy=False)
+        )
         self.array_seqs = transpose(self.array_positions)
         self.seq_data = self.array_seqs
         self.seq_len = len(self.array_positions)
@@ -3631,7 +3695,7 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
         if isinstance(data, ArrayAlignment):
             data = data._positions
         self.array_positions = data
-        self.names = names or self._make_names(len(data[0]))
+        self.names = names if names is not None else self._make_names(len(data[0]))
 
     def _get_positions(self):
         """Override superclass positions to return positions as symbols."""
@@ -3662,11 +3726,11 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
         return iter(self.positions)
 
     def __getitem__(self, item):
-        if not isinstance(item, slice):
-            data = self.array_seqs[:, item]
-            data = vstack(data)
-        else:
-            data = self.array_seqs[:, item]
+        if isinstance(item, slice):
+            data = _read_only_view(self.array_seqs[:, item])
+            return self._from_seq_array(data, list(map(str, self.names)))
+
+        data = vstack(self.array_seqs[:, item])
         return self.__class__(
             data.T,
             list(map(str, self.names)),
@@ -3675,6 +3739,22 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
             info=self.info,
         )
 
+    def _from_seq_array(self, array_seqs, names, **kwargs):
+        """returns a new alignment of the [sequence, position] array_seqs
+
+        array_seqs and names are used as is, without validation or copying,
+        with the moltype, alphabet and info of self.
+        """
+        kwargs["info"] = kwargs.get("info", self.info)
+        return self.__class__(
+            array_seqs,
+            names=names,
+            alphabet=self.alphabet,
+            moltype=self.moltype,
+            force_same_data=True,
+            **kwargs,
+        )
+
     def _coerce_seqs(self, seqs, is_array):
         """Controls how seqs are coerced in _names_seqs_order.
 
@@ -3682,6 +3762,41 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
         """
         return seqs
 
+    def take_seqs(self, seqs, negate=False, **kwargs):
+        """Returns new ArrayAlignment containing only specified seqs.
+
+        The sequences are taken as rows of the array, so only those rows
+        are copied, and consecutive sequences are not copied at all.
+        """
+        # named_seqs, once created, fixes the name of each row even if names
+        # is rebound
+        if (
+            hasattr(self, "_named_seqs")
+            or kwargs.get("moltype", self.moltype) is not self.moltype
+        ):
+            return super(ArrayAlignment, self).take_seqs(seqs, negate=negate, **kwargs)
+
+        if type(seqs) == str:
+            seqs = [seqs]
+        if negate:
+            exclude = set(seqs)
+            seqs = [n for n in self.names if n not in exclude]
+        else:
+            seqs = list(seqs)
+        if not seqs:
+            return {}  # safe value; can't construct empty alignment
+
+        index = {n: i for (i, n) in enumerate(self.names)}
+        rows = [index[n] for n in seqs]
+        start = rows[0]
+        if rows == list(range(start, start + len(rows))):
+            # consecutive sequences are a view
+            data = _read_only_view(self.array_seqs[start : start + len(rows)])
+        else:
+            data = self.array_seqs[rows]
+        kwargs.pop("moltype", None)
+        return self._from_seq_array(data, seqs, **kwargs)
+
     def get_sub_alignment(
         self, seqs=None, pos=None, invert_seqs=False, invert_pos=False
     ):
@@ -3719,13 +3834,9 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
             names = [self.names[i] for i in seqs]
         else:
             names = self.names
-        return self.__class__(
-            data,
-            list(map(str, names)),
-            self.alphabet,
-            conversion_f=aln_from_array,
-            info=self.info,
-        )
+        if data is self.array_positions:
+            data = data.copy()
+        return self._from_seq_array(data.T, list(map(str, names)))
 
     def __str__(self):
         """Returns FASTA-format string.
@@ -3740,6 +3851,32 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
             result.append(">" + str(l) + "\n" + "".join(seq2str(s)))
         return "\n".join(result) + "\n"
 
+    def write(self, filename=None, format=None, **kwargs):
+        """Write the alignment to a file, preserving order of sequences.
+
+        Parameters
+        ----------
+        filename
+            name of the sequence file
+        format
+            format of the sequence file
+
+        Notes
+        -----
+
+        If format is None, will attempt to infer format from the filename
+        suffix. The 'c3aln' format is the binary format opened as a memory
+        mapped ArrayAlignment by load_aligned_seqs.
+        """
+        suffix = get_format_suffixes(filename)[0] if filename else None
+        if format == "c3aln" or (format is None and suffix == "c3aln"):
+            from cogent3.core.mmap_alignment import write_mmap_alignment
+
+            write_mmap_alignment(filename, self, **kwargs)
+            return
+
+        super(ArrayAlignment, self).write(filename=filename, format=format, **kwargs)
+
     def __repr__(self):
         seqs = []
         limit = 10
@@ -3748,7 +3885,7 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
             if count == 3:
                 seqs.append("...")
                 break
-            elts = list(str(self.named_seqs[name])[: limit + 1])
+            elts = list(self.alphabet.to_string(self.array_seqs[count, : limit + 1]))
             if len(elts) > limit:
                 elts.append("...")
             seqs.append("%s[%s]" % (name, delimiter.join(elts)))
@@ -3766,12 +3903,230 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
         """
         if alphabet is None:
             alphabet = self.moltype
-        consensus = []
         degen = alphabet.degenerate_from_seq
-        for col in self.positions:
-            col = alphabet.make_array_seq(col, alphabet=alphabet.alphabets.degen_gapped)
-            consensus.append(degen(str(col)))
-        return coerce_to_string(consensus)
+        states = alphabet.alphabets.degen_gapped
+        if len(states) < len(self.alphabet):
+            consensus = []
+            for col in self.positions:
+                col = alphabet.make_array_seq(col, alphabet=states)
+                consensus.append(degen(str(col)))
+            return coerce_to_string(consensus)
+
+        # each distinct set of states is looked up once
+        present = self._state_counts_per_pos() > 0
+        if present.shape[1] < 63:
+            # each set of states as the bits of an integer
+            keys = present.dot(1 << arange(present.shape[1], dtype=numpy.int64))
+            (keys, first, index) = numpy.unique(
+                keys, return_index=True, return_inverse=True
+            )
+            uniq = present[first]
+        else:
+            (uniq, index) = numpy.unique(present, axis=0, return_inverse=True)
+        symbols = [degen("".join(states[i] for i in nonzero(row)[0])) for row in uniq]
+        return "".join(array(symbols)[index.ravel()]) if len(index) else ""
+
+    def _has_char_alphabet(self):
+        """whether every state of self.alphabet is a single character"""
+        return all(len(c) == 1 for c in self.alphabet)
+
+    def _state_counts_per_pos(self):
+        """returns [position, state] counts of the states of self.alphabet"""
+        return _counts_per_position(self.array_positions, len(self.alphabet))
+
+    def _motif_coder(self, motif_length, motifs, exclude=()):
+        """returns a function converting a [position, sequence] array of
+        self.alphabet indices into the indices in motifs of its non-overlapping
+        k-mers, -1 for k-mers not in motifs or containing a character in exclude
+
+        None if the k-mers cannot be packed into integer codes."""
+        if not self._has_char_alphabet():
+            return None
+
+        chars = list(self.alphabet)
+        recode = None
+        if len(chars) ** motif_length > MAX_PACKED_STATES:
+            # pack canonical states, with one extra state for all others
+            canonical = list(self.moltype.alphabet)
+            recode = [canonical.index(c) if c in canonical else -1 for c in chars]
+            recode = array(recode) % (len(canonical) + 1)
+            chars = canonical + [None]
+        num_states = len(chars)
+        if num_states ** motif_length > MAX_PACKED_STATES:
+            return None
+
+        # k-mers packed with the first character most significant
+        index = {c: i for (i, c) in enumerate(chars)}
+        radix = num_states ** arange(motif_length - 1, -1, -1)
+        lookup = numpy.full(num_states ** motif_length, -1, int)
+        for (i, motif) in enumerate(motifs):
+            if all(c in index and c not in exclude for c in motif):
+                lookup[sum(index[c] * r for (c, r) in zip(motif, radix))] = i
+
+        def coder(data):
+            num_pos = len(data) // motif_length
+            data = data[: num_pos * motif_length]
+            if recode is not None:
+                data = recode[data]
+            data = data.reshape(num_pos, motif_length, -1)
+            packed = data[:, 0]
+            for j in range(1, motif_length):
+                packed = packed.astype(int) * num_states + data[:, j]
+            return lookup[packed]
+
+        return coder
+
+    def counts_per_pos(
+        self, motif_length=1, include_ambiguity=False, allow_gap=False, alert=False
+    ):
+        """return DictArray of counts per position
+
+        Parameters
+        ----------
+
+        alert
+            warns if motif_length > 1 and alignment trimmed to produce
+            motif columns
+        """
+        alpha = self.moltype.alphabet.get_word_alphabet(motif_length)
+        coder = None
+        if not (include_ambiguity or allow_gap):
+            coder = self._motif_coder(motif_length, alpha)
+        if coder is None:
+            return super(ArrayAlignment, self).counts_per_pos(
+                motif_length=motif_length,
+                include_ambiguity=include_ambiguity,
+                allow_gap=allow_gap,
+                alert=alert,
+            )
+
+        length = (len(self) // motif_length) * motif_length
+        if alert and len(self) != length:
+            warnings.warn(f"trimmed {len(self) - length}", UserWarning)
+
+        counts = _counts_per_position(coder(self.array_positions), len(alpha))
+        if not counts.any():
+            # MotifCountsArray rejects an all zero array, but not nested lists
+            counts = counts.tolist()
+        return MotifCountsArray(counts, alpha)
+
+    def counts_per_seq(
+        self,
+        motif_length=1,
+        include_ambiguity=False,
+        allow_gap=False,
+        exclude_unobserved=False,
+        alert=False,
+    ):
+        """returns dict of counts of non-overlapping motifs per sequence
+
+        Parameters
+        ----------
+        motif_length
+            number of elements per character.
+        include_ambiguity
+            if True, motifs containing ambiguous characters
+            from the seq moltype are included. No expansion of those is attempted.
+        allow_gaps
+            if True, motifs containing a gap character are included.
+        exclude_unobserved
+            if False, all canonical states included
+        alert
+            warns if motif_length > 1 and alignment trimmed to produce
+            motif columns
+
+        Notes
+        -----
+        Positions are counted in blocks of at most COUNTS_CHUNK_SIZE elements,
+        so memory use does not grow with the alignment length.
+        """
+        alpha = self.moltype.alphabet.get_word_alphabet(motif_length)
+        coder = None
+        if not (include_ambiguity or allow_gap):
+            # sequence counts also exclude canonical gap or ambiguity states
+            is_gap = self.moltype.is_gapped
+            is_degen = self.moltype.is_degenerate
+            exclude = [c for c in self.moltype.alphabet if is_gap(c) or is_degen(c)]
+            coder = self._motif_coder(motif_length, alpha, exclude=exclude)
+        if coder is None:
+            return super(ArrayAlignment, self).counts_per_seq(
+                motif_length=motif_length,
+                include_ambiguity=include_ambiguity,
+                allow_gap=allow_gap,
+                exclude_unobserved=exclude_unobserved,
+                alert=alert,
+            )
+
+        length = (len(self) // motif_length) * motif_length
+        if alert and len(self) != length:
+            warnings.warn(f"trimmed {len(self) - length}", UserWarning)
+
+        num_seqs = len(self.names)
+        step = (COUNTS_CHUNK_SIZE // (num_seqs * motif_length) or 1) * motif_length
+        # motifs not counted are tallied in an extra, discarded, column, and
+        # codes are offset so each sequence has its own row of counts
+        num_cols = len(alpha) + 1
+        offsets = arange(num_seqs) * num_cols
+        counts = zeros(num_seqs * num_cols, int)
+        for start in range(0, length, step):
+            codes = coder(self.array_positions[start : min(start + step, length)])
+            codes %= num_cols
+            codes += offsets
+            counts += numpy.bincount(codes.ravel("K"), minlength=len(counts))
+        counts = counts.reshape(num_seqs, num_cols)[:, :-1]
+
+        motifs = array(list(alpha), dtype=object)
+        if exclude_unobserved:
+            observed = counts.any(axis=0)
+            (motifs, counts) = (motifs[observed], counts[:, observed])
+
+        if not len(motifs):
+            return None
+
+        order = numpy.argsort(motifs)
+        counts = counts[:, order]
+        if not counts.any():
+            counts = counts.tolist()
+        return MotifCountsArray(counts, motifs[order].tolist(), row_indices=self.names)
+
+    def majority_consensus(self):
+        """Returns list containing most frequent item at each position.
+
+        Optional parameter transform gives constructor for type to which result
+        will be converted (useful when consensus should be same type as
+        originals).
+        """
+        if not self._has_char_alphabet():
+            return super(ArrayAlignment, self).majority_consensus()
+
+        # ties go to the greatest character
+        order = numpy.argsort(list(self.alphabet))[::-1]
+        counts = self._state_counts_per_pos()[:, order]
+        chars = array(list(self.alphabet))[order]
+        states = chars[counts.argmax(axis=1)]
+        return self.moltype.make_seq("".join(states))
+
+    def variable_positions(self, include_gap_motif=True):
+        """Return a list of variable position indexes.
+
+        Parameters
+        ----------
+        include_gap_motif
+            if False, sequences with a gap motif in a
+            column are ignored.
+
+        """
+        if not self._has_char_alphabet():
+            return super(ArrayAlignment, self).variable_positions(
+                include_gap_motif=include_gap_motif
+            )
+
+        data = self.array_seqs
+        differ = data[1:] != data[0]
+        if not include_gap_motif and "-" in self.alphabet:
+            gap = self.alphabet.index("-")
+            differ &= (data[1:] != gap) & (data[0] != gap)
+        return nonzero(differ.any(axis=0))[0].tolist()
 
     def sample(
         self,
@@ -3849,32 +4204,61 @@ class ArrayAlignment(AlignmentI, _SequenceCollectionBase):
             )
 
         num_motifs = length // motif_length
-        shaped = self.array_seqs
-        if motif_length != 1:
-            shaped = shaped[:, : num_motifs * motif_length]
-
+        shaped = self.array_seqs[:, : num_motifs * motif_length]
         shaped = shaped.reshape((self.num_seqs, num_motifs, motif_length))
-        indices = []
-        elements = arange(motif_length)
-        for i in range(num_motifs):
-            if not predicate(shaped[:, i]):
-                continue
+        keep = array([bool(predicate(shaped[:, i])) for i in range(num_motifs)])
+        return self._take_motifs(keep, motif_length)
 
-            start = motif_length * i
-            indices.extend(elements + start)
+    def _motif_state_counts(self, states, motif_length):
+        """returns, for each complete motif, the number of its elements across
+        all sequences that are in states, a series of self.alphabet indices
 
-        if not indices:
+        Positions are processed in blocks of at most COUNTS_CHUNK_SIZE elements.
+        """
+        is_state = zeros(len(self.alphabet), bool)
+        is_state[list(states)] = True
+        length = (self.seq_len // motif_length) * motif_length
+        width = self.num_seqs * motif_length
+        step = (COUNTS_CHUNK_SIZE // width or 1) * motif_length
+        counts = [zeros(0, int)]
+        for start in range(0, length, step):
+            block = is_state[self.array_positions[start : min(start + step, length)]]
+            # the elements of each motif are consecutive rows of block
+            counts.append(numpy.count_nonzero(block.reshape(-1, width), axis=1))
+        return numpy.concatenate(counts)
+
+    def _take_motifs(self, keep, motif_length):
+        """returns alignment of the motifs for which the bool array keep is
+        True, None if there are none"""
+        if not keep.any():
             return None
 
-        positions = self.array_seqs.take(indices, axis=1)
-        result = self.__class__(
-            positions,
-            force_same_data=True,
-            moltype=self.moltype,
-            info=self.info,
-            names=self.names,
-        )
-        return result
+        mask = zeros(self.seq_len, bool)
+        mask[: len(keep) * motif_length] = keep.repeat(motif_length)
+        return self.take_positions(mask)
+
+    def take_positions(self, cols, negate=False):
+        """Returns new ArrayAlignment containing only specified positions.
+
+        Parameters
+        ----------
+        cols
+            position indices, or a bool array with an element per position
+        negate
+            if True, all positions except cols are returned
+        """
+        cols = numpy.asarray(cols)
+        if cols.dtype == bool:
+            if len(cols) != self.seq_len:
+                raise ValueError("bool cols must have an element per position")
+            data = self.array_seqs[:, logical_not(cols) if negate else cols]
+        elif negate:
+            keep = ones(self.seq_len, bool)
+            keep[cols.astype(int)] = False
+            data = self.array_seqs[:, keep]
+        else:
+            data = self.array_seqs.take(cols.astype(int), axis=1)
+        return self._from_seq_array(data, list(self.names))
 
     def get_gapped_seq(self, seq_name, recode_gaps=False, moltype=None):
         """Return a gapped Sequence object for the specified seqname.
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""A binary alignment format that is opened as a memory mapped ArrayAlignment.
+
+The file consists of a fixed size header, the alignment as a row-major
+(sequence x position) uint8 matrix and a JSON table of the sequence names,
+the moltype label and the characters of the alphabet the matrix indexes.
+The table is written last so alignments can be written one sequence at a
+time, without knowing the number of sequences in advance.
+"""
+import json
+import struct
+
+import numpy
+
+from cogent3.core.alignment import ArrayAlignment, aln_from_seq_array
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Alpha"
+
+MAGIC = b"C3ARRALN"
+VERSION = 1
+# magic, version, num_seqs, seq_len, table_offset, table_nbytes
+_HEADER = struct.Struct("<8sIQQQQ")
+HEADER_SIZE = 64
+# maximum number of bytes encoded or copied at a time when writing
+CHUNK_SIZE = 2 ** 24
+
+
+def _get_alphabet(moltype):
+    """the alphabet ArrayAlignment uses for moltype"""
+    try:
+        return moltype.alphabets.degen_gapped
+    except AttributeError:
+        return moltype.alphabet
+
+
+def _char_lookup(alphabet):
+    """returns array mapping byte values to indices of alphabet, -1 if absent
+
+    Lower case characters are mapped to their upper case equivalent when the
+    alphabet lacks them."""
+    chars = list(alphabet)
+    lookup = numpy.full(256, -1, dtype=numpy.int16)
+    for (i, char) in enumerate(chars):
+        lookup[ord(char)] = i
+    for (i, char) in enumerate(chars):
+        lower = char.lower()
+        if lower != char and lower not in chars and ord(lower) < 256:
+            lookup[ord(lower)] = i
+    return lookup
+
+
+def _encode(seq, lookup, name):
+    """returns uint8 alphabet indices of the str seq"""
+    data = numpy.frombuffer(seq.encode("latin-1"), dtype=numpy.uint8)
+    result = lookup[data]
+    if (result < 0).any():
+        char = chr(data[result < 0][0])
+        raise ValueError(f"{char!r} in sequence {name!r} not in alphabet")
+    return result.astype(numpy.uint8)
+
+
+def _write_array_alignment(outfile, aln, chunk_size):
+    """writes rows of aln, returns the names and alignment length"""
+    if len(aln.alphabet) > 256 or aln.alphabet != _get_alphabet(aln.moltype):
+        raise ValueError(f"cannot write alignment with alphabet {aln.alphabet}")
+
+    num_rows = max(1, chunk_size // max(aln.seq_len, 1))
+    for start in range(0, len(aln.names), num_rows):
+        rows = aln.array_seqs[start : start + num_rows]
+        outfile.write(numpy.ascontiguousarray(rows, dtype=numpy.uint8).tobytes())
+    return list(map(str, aln.names)), aln.seq_len
+
+
+def _write_named_seqs(outfile, data, alphabet, chunk_size):
+    """writes encoded (name, seq) pairs, returns the names and alignment
+    length"""
+    lookup = _char_lookup(alphabet)
+    names = []
+    seq_len = None
+    for (name, seq) in data:
+        seq = str(seq)
+        if seq_len is None:
+            seq_len = len(seq)
+        elif len(seq) != seq_len:
+            raise ValueError("not all sequences have same length")
+        for start in range(0, seq_len, chunk_size):
+            encoded = _encode(seq[start : start + chunk_size], lookup, name)
+            outfile.write(encoded.tobytes())
+        names.append(str(name))
+    return names, seq_len or 0
+
+
+def write_mmap_alignment(filename, data, moltype=None, chunk_size=CHUNK_SIZE):
+    """writes an alignment in the memory mappable format
+
+    Parameters
+    ----------
+    filename : str
+        path to write to
+    data
+        an ArrayAlignment, or an iterable of (name, sequence) pairs, e.g. a
+        MinimalFastaParser instance, which are encoded one at a time
+    moltype
+        the moltype for (name, sequence) pairs, ignored for an ArrayAlignment.
+        Defaults to 'bytes'.
+    chunk_size : int
+        maximum number of bytes encoded, or copied, at a time
+    """
+    from cogent3.core.moltype import get_moltype
+
+    if isinstance(data, ArrayAlignment):
+        moltype = data.moltype
+    else:
+        moltype = get_moltype(moltype or "bytes")
+    alphabet = _get_alphabet(moltype)
+
+    with open(filename, "wb") as outfile:
+        outfile.write(b"\0" * HEADER_SIZE)
+        if isinstance(data, ArrayAlignment):
+            names, seq_len = _write_array_alignment(outfile, data, chunk_size)
+        else:
+            names, seq_len = _write_named_seqs(outfile, data, alphabet, chunk_size)
+
+        if len(set(names)) != len(names):
+            raise ValueError("sequence names are not unique")
+
+        table = dict(names=names, moltype=moltype.label, alphabet=list(alphabet))
+        table = json.dumps(table).encode("utf-8")
+        table_offset = outfile.tell()
+        outfile.write(table)
+        outfile.seek(0)
+        outfile.write(
+            _HEADER.pack(
+                MAGIC, VERSION, len(names), seq_len, table_offset, len(table)
+            )
+        )
+
+
+def load_mmap_alignment(filename, info=None):
+    """returns an ArrayAlignment backed by a read-only numpy.memmap of filename
+
+    Parameters
+    ----------
+    filename : str
+        path to a file written by write_mmap_alignment
+    info
+        info object attached to the alignment
+    """
+    from cogent3.core.moltype import get_moltype
+
+    with open(filename, "rb") as infile:
+        header = infile.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+            raise ValueError(f"{filename!r} is not a memory mappable alignment")
+        (_, version, num_seqs, seq_len, table_offset, table_nbytes) = _HEADER.unpack(
+            header[: _HEADER.size]
+        )
+        if version != VERSION:
+            raise ValueError(f"unsupported version {version} in {filename!r}")
+        infile.seek(table_offset)
+        table = json.loads(infile.read(table_nbytes).decode("utf-8"))
+
+    moltype = get_moltype(table["moltype"])
+    alphabet = _get_alphabet(moltype)
+    if list(alphabet) != table["alphabet"]:
+        raise ValueError(f"alphabet in {filename!r} does not match {moltype}")
+
+    if num_seqs * seq_len == 0:
+        raise ValueError("Cannot create empty alignment.")
+
+    data = numpy.memmap(
+        filename,
+        dtype=numpy.uint8,
+        mode="r",
+        offset=HEADER_SIZE,
+        shape=(num_seqs, seq_len),
+    )
+    return ArrayAlignment(
+        data,
+        names=table["names"],
+        alphabet=alphabet,
+        moltype=moltype,
+        conversion_f=aln_from_seq_array,
+        info=info,
+    )
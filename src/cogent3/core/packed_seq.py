@@ -0,0 +1,522 @@
+#!/usr/bin/env python
+"""2-bit packed storage of DNA and RNA sequences.
+
+The canonical nucleotides are stored as their index in the moltype alphabet,
+four to a byte, with the first position in the lowest bits. Any other
+character (ambiguity codes, gaps, missing data) is recorded in a side-table
+of runs ``[start, end, char]`` and its packed code is 0. Because non-canonical
+characters are usually rare and clustered, this is close to a quarter of the
+memory of one byte per base.
+
+Comparisons operate on the packed bytes. A validity mask, in which the low
+bit of each 2-bit field is set for canonical positions, is derived from the
+side-table when required.
+"""
+import json
+
+from base64 import b64decode, b64encode
+
+import numpy
+
+from cogent3.core.moltype import get_moltype
+from cogent3.util.misc import get_object_provenance
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Alpha"
+
+BASES_PER_BYTE = 4
+WORD_BYTES = 8
+_SHIFTS = numpy.arange(0, 8, 2, dtype=numpy.uint8)
+# number of set bits in each byte value
+_POPCOUNT = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint8)
+# lookup values for characters that are valid but not canonical, or invalid
+_NON_CANONICAL = -1
+_INVALID = -2
+_UPPER = numpy.array([ord(chr(i).upper()) for i in range(128)], dtype=numpy.uint8)
+_UPPER = numpy.append(_UPPER, numpy.arange(128, 256, dtype=numpy.uint8))
+_M1 = numpy.uint64(0x5555555555555555)
+_M2 = numpy.uint64(0x3333333333333333)
+_M4 = numpy.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = numpy.uint64(0x0101010101010101)
+
+
+def _get_nucleic_moltype(moltype):
+    """returns the moltype, which must be DNA or RNA"""
+    moltype = get_moltype(moltype)
+    if moltype.label not in ("dna", "rna"):
+        raise ValueError(f"cannot pack '{moltype.label}' sequences, only dna or rna")
+    return moltype
+
+
+def _char_lookup(moltype):
+    """returns int8 array mapping ASCII codes to the canonical index"""
+    lookup = numpy.full(256, _INVALID, dtype=numpy.int8)
+    for char in moltype.All:
+        for c in {char.upper(), char.lower()}:
+            lookup[ord(c)] = _NON_CANONICAL
+    for index, char in enumerate(moltype):
+        for c in {char.upper(), char.lower()}:
+            lookup[ord(c)] = index
+    return lookup
+
+
+def _canonical_chars(moltype):
+    """returns uint8 array of the ASCII codes of the canonical states"""
+    return numpy.array([ord(c) for c in moltype], dtype=numpy.uint8)
+
+
+def _num_bytes(length):
+    return -(-length // BASES_PER_BYTE)
+
+
+def pack_indices(indices):
+    """packs canonical state indices, 4 to a byte
+
+    Parameters
+    ----------
+    indices : array
+        integer array of canonical state indices, the last axis being
+        sequence positions. Negative values are non-canonical.
+
+    Returns
+    -------
+    packed, valid uint8 arrays with the last axis of length ceil(length / 4).
+    valid has the low bit of a 2-bit field set where the state is canonical.
+    """
+    indices = numpy.asarray(indices)
+    length = indices.shape[-1]
+    shape = indices.shape[:-1] + (_num_bytes(length), BASES_PER_BYTE)
+    codes = numpy.zeros(shape, dtype=numpy.uint8).reshape(indices.shape[:-1] + (-1,))
+    is_valid = numpy.zeros(codes.shape, dtype=numpy.uint8)
+    valid = indices >= 0
+    codes[..., :length] = numpy.where(valid, indices, 0)
+    is_valid[..., :length] = valid
+    codes = codes.reshape(shape) << _SHIFTS
+    is_valid = is_valid.reshape(shape) << _SHIFTS
+    return (
+        numpy.bitwise_or.reduce(codes, axis=-1),
+        numpy.bitwise_or.reduce(is_valid, axis=-1),
+    )
+
+
+def unpack_indices(packed, length):
+    """returns the uint8 canonical state indices of packed data"""
+    packed = numpy.asarray(packed, dtype=numpy.uint8)
+    codes = (packed[..., None] >> _SHIFTS) & 3
+    codes = codes.reshape(packed.shape[:-1] + (-1,))
+    return codes[..., :length]
+
+
+def pad_to_words(data):
+    """returns packed data with the last axis zero padded to a multiple of 8
+    bytes, allowing bits to be counted in 64-bit words"""
+    data = numpy.asarray(data, dtype=numpy.uint8)
+    extra = -data.shape[-1] % WORD_BYTES
+    if extra:
+        padding = [(0, 0)] * (data.ndim - 1) + [(0, extra)]
+        data = numpy.pad(data, padding)
+    return numpy.ascontiguousarray(data)
+
+
+def _count_bits(data):
+    """returns the number of set bits along the last axis"""
+    if data.shape[-1] % WORD_BYTES:
+        return _POPCOUNT.take(data).sum(axis=-1, dtype=numpy.int64)
+
+    # parallel bit count within each 64-bit word
+    words = numpy.ascontiguousarray(data).view(numpy.uint64)
+    words = words - ((words >> numpy.uint64(1)) & _M1)
+    words = (words & _M2) + ((words >> numpy.uint64(2)) & _M2)
+    words = (words + (words >> numpy.uint64(4))) & _M4
+    words = (words * _H01) >> numpy.uint64(56)
+    return words.sum(axis=-1, dtype=numpy.int64)
+
+
+def packed_hamming(packed1, valid1, packed2, valid2):
+    """returns the number of comparable and differing positions
+
+    Parameters
+    ----------
+    packed1, valid1, packed2, valid2
+        packed states and validity masks from pack_indices. Leading
+        dimensions are broadcast, so one sequence can be compared to many.
+        Bits are counted in 64-bit words if the arrays are padded with
+        pad_to_words.
+
+    Returns
+    -------
+    total, diffs integer arrays. Only positions that are canonical in both
+    sequences are counted.
+    """
+    both = valid1 & valid2
+    xor = packed1 ^ packed2
+    # a 2-bit field differs if either of its bits differ
+    diffs = (xor | (xor >> 1)) & both
+    return _count_bits(both), _count_bits(diffs)
+
+
+def _encode(chars, moltype):
+    """returns canonical indices of the ASCII codes, non-canonical are -1"""
+    indices = _char_lookup(moltype).take(chars)
+    if (indices == _INVALID).any():
+        bad = sorted({chr(c) for c in chars[indices == _INVALID].tolist()})
+        raise ValueError(f"invalid characters for {moltype.label}: {bad}")
+    return indices
+
+
+def _find_runs(chars, indices):
+    """returns [[start, end, char], ..] of runs of a non-canonical char"""
+    positions = numpy.flatnonzero(indices < 0)
+    if not len(positions):
+        return []
+
+    values = _UPPER.take(chars.take(positions))
+    is_start = numpy.ones(len(positions), dtype=bool)
+    is_start[1:] = (numpy.diff(positions) != 1) | (values[1:] != values[:-1])
+    starts = numpy.flatnonzero(is_start)
+    ends = numpy.append(starts[1:], len(positions))
+    return [
+        [int(positions[s]), int(positions[e - 1]) + 1, chr(values[s])]
+        for s, e in zip(starts.tolist(), ends.tolist())
+    ]
+
+
+def _valid_mask(length, runs):
+    """returns the packed validity mask for a sequence"""
+    valid = numpy.ones(length, dtype=numpy.int8)
+    for start, end, _ in runs:
+        valid[start:end] = -1
+    return pack_indices(valid)[1]
+
+
+def _decode(packed, length, runs, moltype):
+    """returns the sequence string"""
+    chars = _canonical_chars(moltype).take(unpack_indices(packed, length))
+    for start, end, char in runs:
+        chars[start:end] = ord(char)
+    return chars.tobytes().decode("ascii")
+
+
+def _to_bytes(data):
+    return b64encode(numpy.ascontiguousarray(data).tobytes()).decode("ascii")
+
+
+def _from_bytes(data, shape):
+    data = numpy.frombuffer(b64decode(data), dtype=numpy.uint8)
+    return data.reshape(shape)
+
+
+class PackedSeq:
+    """a DNA or RNA sequence stored with 2 bits per canonical base
+
+    Non-canonical characters are stored as runs in a side-table.
+    """
+
+    def __init__(self, packed, length, moltype="dna", runs=None, name=None):
+        """
+        Parameters
+        ----------
+        packed
+            uint8 array of packed canonical state indices
+        length : int
+            the sequence length
+        moltype
+            'dna' or 'rna'
+        runs
+            [[start, end, char], ..] for non-canonical characters
+        name
+            name of the sequence
+        """
+        self.moltype = _get_nucleic_moltype(moltype)
+        packed = numpy.asarray(packed, dtype=numpy.uint8)
+        if packed.shape != (_num_bytes(length),):
+            raise ValueError(f"packed data has wrong shape for length {length}")
+        self._packed = packed
+        self._length = length
+        self._runs = [list(run) for run in runs or []]
+        self.name = name
+
+    @classmethod
+    def from_seq(cls, seq, moltype=None, name=None):
+        """packs a sequence
+
+        Parameters
+        ----------
+        seq
+            a string or cogent3 sequence
+        moltype
+            'dna' or 'rna', defaults to the moltype of seq or 'dna'
+        name
+            defaults to the name of seq
+        """
+        if moltype is None:
+            moltype = getattr(seq, "moltype", "dna")
+        moltype = _get_nucleic_moltype(moltype)
+        name = getattr(seq, "name", None) if name is None else name
+        chars = numpy.frombuffer(str(seq).encode("ascii"), dtype=numpy.uint8)
+        indices = _encode(chars, moltype)
+        packed, _ = pack_indices(indices)
+        runs = _find_runs(chars, indices)
+        return cls(packed, len(chars), moltype=moltype, runs=runs, name=name)
+
+    @property
+    def packed(self):
+        """uint8 array of packed canonical state indices"""
+        return self._packed
+
+    @property
+    def runs(self):
+        """[[start, end, char], ..] of non-canonical characters"""
+        return [list(run) for run in self._runs]
+
+    @property
+    def nbytes(self):
+        """number of bytes used by the packed data"""
+        return self._packed.nbytes
+
+    def valid_mask(self):
+        """packed mask with a bit set for each canonical position"""
+        return _valid_mask(self._length, self._runs)
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        return _decode(self._packed, self._length, self._runs, self.moltype)
+
+    def __repr__(self):
+        seq = str(self)
+        seq = f"{seq[:10]}...{seq[-5:]}" if len(seq) > 20 else seq
+        return f"{self.__class__.__name__}({seq}; moltype={self.moltype.label!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, PackedSeq):
+            return str(self) == str(other)
+        return (
+            self.moltype.label == other.moltype.label
+            and self._length == other._length
+            and self._runs == other._runs
+            and numpy.array_equal(self._packed, other._packed)
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        runs = tuple(map(tuple, self._runs))
+        return hash((self.moltype.label, self._length, self._packed.tobytes(), runs))
+
+    def unpack(self):
+        """returns the sequence as a moltype sequence"""
+        return self.moltype.make_seq(str(self), name=self.name)
+
+    def hamming(self, other):
+        """returns the number of comparable and differing positions
+
+        Only positions that are canonical in both sequences are counted.
+        """
+        if len(self) != len(other):
+            raise ValueError("sequences must have the same length")
+        return tuple(
+            int(v)
+            for v in packed_hamming(
+                self._packed, self.valid_mask(), other._packed, other.valid_mask()
+            )
+        )
+
+    def to_rich_dict(self):
+        """returns a dict suitable for json serialisation"""
+        return dict(
+            name=self.name,
+            packed=_to_bytes(self._packed),
+            length=self._length,
+            runs=self.runs,
+            moltype=self.moltype.label,
+            type=get_object_provenance(self),
+            version=__version__,
+        )
+
+    def to_json(self):
+        """returns a json formatted string"""
+        return json.dumps(self.to_rich_dict())
+
+    @classmethod
+    def from_rich_dict(cls, data):
+        """returns an instance from the result of to_rich_dict"""
+        data = dict(data)
+        data.pop("type", None)
+        data.pop("version", None)
+        data["packed"] = _from_bytes(data["packed"], (_num_bytes(data["length"]),))
+        return cls(**data)
+
+
+class PackedAlignment:
+    """an alignment of DNA or RNA sequences stored with 2 bits per canonical
+    base
+
+    The packed sequences form a (num_seqs, ceil(length / 4)) uint8 array.
+    Non-canonical characters are stored as runs in a side-table per sequence.
+    """
+
+    def __init__(self, packed, length, names, moltype="dna", runs=None):
+        """
+        Parameters
+        ----------
+        packed
+            2D uint8 array of packed canonical state indices
+        length : int
+            the alignment length
+        names
+            sequence names, in the order of the rows of packed
+        moltype
+            'dna' or 'rna'
+        runs
+            {name: [[start, end, char], ..], ..} for non-canonical characters
+        """
+        self.moltype = _get_nucleic_moltype(moltype)
+        names = list(names)
+        packed = numpy.asarray(packed, dtype=numpy.uint8)
+        if packed.shape != (len(names), _num_bytes(length)):
+            raise ValueError(
+                f"packed data has wrong shape for {len(names)} seqs of "
+                f"length {length}"
+            )
+        runs = runs or {}
+        self._packed = packed
+        self._length = length
+        self._runs = {n: [list(r) for r in runs.get(n, [])] for n in names}
+        self.names = names
+
+    @classmethod
+    def from_alignment(cls, aln, moltype=None):
+        """packs an alignment
+
+        Parameters
+        ----------
+        aln
+            a cogent3 alignment or a {name: seq, ..} dict of equal length
+            sequences
+        moltype
+            'dna' or 'rna', defaults to the moltype of aln or 'dna'
+        """
+        if moltype is None:
+            moltype = getattr(aln, "moltype", "dna")
+        moltype = _get_nucleic_moltype(moltype)
+        if hasattr(aln, "array_seqs"):
+            # avoid creating a string per sequence
+            names = list(aln.names)
+            alphabet_chars = [ord(c) for c in aln.alphabet]
+            chars = numpy.array(alphabet_chars, dtype=numpy.uint8)
+            chars = chars.take(aln.array_seqs)
+        else:
+            data = aln if isinstance(aln, dict) else aln.to_dict()
+            names = list(data)
+            seqs = [str(data[n]).encode("ascii") for n in names]
+            if len(set(map(len, seqs))) > 1:
+                raise ValueError("sequences must have the same length")
+            length = len(seqs[0]) if seqs else 0
+            chars = numpy.frombuffer(b"".join(seqs), dtype=numpy.uint8)
+            chars = chars.reshape(len(seqs), length)
+
+        indices = _encode(chars, moltype)
+        packed, _ = pack_indices(indices)
+        runs = {n: _find_runs(chars[i], indices[i]) for i, n in enumerate(names)}
+        return cls(packed, chars.shape[1], names, moltype=moltype, runs=runs)
+
+    @property
+    def packed(self):
+        """2D uint8 array of packed canonical state indices"""
+        return self._packed
+
+    @property
+    def num_seqs(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        """number of bytes used by the packed data"""
+        return self._packed.nbytes
+
+    def valid_mask(self):
+        """2D packed mask with a bit set for each canonical position"""
+        valid = numpy.empty(self._packed.shape, dtype=numpy.uint8)
+        for i, name in enumerate(self.names):
+            valid[i] = _valid_mask(self._length, self._runs[name])
+        return valid
+
+    def to_indices(self, invalid=-9):
+        """returns int32 canonical state indices, with invalid for
+        non-canonical characters"""
+        indices = unpack_indices(self._packed, self._length).astype(numpy.int32)
+        for i, name in enumerate(self.names):
+            for start, end, _ in self._runs[name]:
+                indices[i, start:end] = invalid
+        return indices
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return (
+            f"{self.num_seqs} x {self._length} {self.__class__.__name__} "
+            f"(moltype={self.moltype.label!r})"
+        )
+
+    def get_seq(self, name):
+        """returns the named PackedSeq, which shares the packed data"""
+        index = self.names.index(name)
+        return PackedSeq(
+            self._packed[index],
+            self._length,
+            moltype=self.moltype,
+            runs=self._runs[name],
+            name=name,
+        )
+
+    def to_dict(self):
+        """returns {name: seq string, ..}"""
+        return {
+            name: _decode(self._packed[i], self._length, self._runs[name], self.moltype)
+            for i, name in enumerate(self.names)
+        }
+
+    def unpack(self, array_align=True):
+        """returns the sequences as a cogent3 alignment"""
+        from cogent3 import make_aligned_seqs
+
+        return make_aligned_seqs(
+            self.to_dict(), moltype=self.moltype, array_align=array_align
+        )
+
+    def to_rich_dict(self):
+        """returns a dict suitable for json serialisation"""
+        return dict(
+            packed=_to_bytes(self._packed),
+            length=self._length,
+            names=self.names,
+            runs={n: r for n, r in self._runs.items() if r},
+            moltype=self.moltype.label,
+            type=get_object_provenance(self),
+            version=__version__,
+        )
+
+    def to_json(self):
+        """returns a json formatted string"""
+        return json.dumps(self.to_rich_dict())
+
+    @classmethod
+    def from_rich_dict(cls, data):
+        """returns an instance from the result of to_rich_dict"""
+        data = dict(data)
+        data.pop("type", None)
+        data.pop("version", None)
+        shape = (len(data["names"]), _num_bytes(data["length"]))
+        data["packed"] = _from_bytes(data["packed"], shape)
+        return cls(**data)
@@ -216,7 +216,7 @@ class MotifCountsArray(_MotifNumberArray):
         if pseudocount:
             data = data + pseudocount
         row_sum = data.sum(axis=1)
-        freqs = data / numpy.vstack(row_sum)
+        freqs = data / row_sum[:, None]
         return freqs
 
     def to_freq_array(self, pseudocount=0):
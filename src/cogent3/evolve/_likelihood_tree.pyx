@@ -2,15 +2,39 @@
 #cython: wraparound=False
 
 include "../../include/numerical_pyrex.pyx"
-version_info = (2, 2)
+version_info = (2, 3)
 __version__ = "('2019', '12', '6a')"
 
+from cython.parallel cimport prange
+
 cdef extern from "math.h":
-    double log (double x)
+    double log (double x) nogil
+
+# Site patterns are split across this many OpenMP threads. Has no effect
+# if the module was compiled without OpenMP.
+cdef int num_threads = 1
+# fewer patterns than this are not worth the cost of starting threads
+cdef int MIN_PARALLEL_PATTERNS = 1000
+
+
+def set_num_threads(int n):
+    """set the number of threads used by the kernels"""
+    global num_threads
+    if n < 1:
+        raise ValueError("number of threads must be >= 1, not %s" % n)
+    num_threads = n
+
+def get_num_threads():
+    return num_threads
+
+cdef int _threads_for(int S):
+    if S < MIN_PARALLEL_PATTERNS:
+        return 1
+    return num_threads
 
 
 def sum_input_likelihoods(child_indexes, Double2D result, likelihoods):
-    cdef int M, S, U, C, motif, parent_col, child_col, child
+    cdef int M, S, U, C, motif, parent_col, child_col, child, threads
     cdef Double2D plhs
     cdef Long1D index
 
@@ -19,7 +43,8 @@ def sum_input_likelihoods(child_indexes, Double2D result, likelihoods):
     C = len(child_indexes)
     M = S = 0
     checkArray2D(result, &S, &M)
-    
+    threads = _threads_for(S)
+
     for child in range(C):
         index = child_indexes[child]
         plhs = likelihoods[child]
@@ -27,19 +52,21 @@ def sum_input_likelihoods(child_indexes, Double2D result, likelihoods):
         checkArray1D(index, &S)
         checkArray2D(plhs, &U, &M)
         if child == 0:
-            for parent_col in range(S):
+            for parent_col in prange(S, nogil=True, num_threads=threads,
+                                     schedule="static"):
                 child_col = index[parent_col]
                 for motif in range(M):
                     result[parent_col, motif] = plhs[child_col, motif]
         else:
-            for parent_col in range(S):
+            for parent_col in prange(S, nogil=True, num_threads=threads,
+                                     schedule="static"):
                 child_col = index[parent_col]
                 for motif in range(M):
                     result[parent_col, motif] *= plhs[child_col, motif]
     return result
     
 def get_total_log_likelihood(Double1D counts, Double2D input_likelihoods, Double1D mprobs):
-    cdef int S, M, col, motif
+    cdef int S, M, col, motif, threads
     cdef double posn, total
     
     # M is size of alphabet, S is seq length
@@ -47,25 +74,27 @@ def get_total_log_likelihood(Double1D counts, Double2D input_likelihoods, Double
     checkArray1D(mprobs, &M)
     checkArray1D(counts, &S)
     checkArray2D(input_likelihoods, &S, &M)
-    
+    threads = _threads_for(S)
+
     total = 0.0
-    for col in range(S):
+    for col in prange(S, nogil=True, num_threads=threads, schedule="static"):
         posn = 0.0
         for motif in range(M):
-            posn += input_likelihoods[col, motif] * mprobs[motif]
+            posn = posn + input_likelihoods[col, motif] * mprobs[motif]
         total += log(posn)*counts[col]
     return total
 
 def get_log_sum_across_sites(Double1D counts, Double1D input_likelihoods):
-    cdef int S, col
+    cdef int S, col, threads
     cdef double total
     
     S = 0
     checkArray1D(counts, &S)
     checkArray1D(input_likelihoods, &S)
-    
+    threads = _threads_for(S)
+
     total = 0.0
-    for col in range(S):
+    for col in prange(S, nogil=True, num_threads=threads, schedule="static"):
         total += log(input_likelihoods[col])*counts[col]
     return total
 
@@ -90,26 +119,32 @@ def log_dot_reduce(Long1D index, object patch_probs, Double2D switch_probs, Doub
     checkArray2D(plhs, &U, &N)
     checkArray1D(index, &S)
     
-    exponent = 0
     for site in range(S):
         col = index[site]
         if col >= U:
             raise ValueError((col, U))
-        tmp = prev
-        prev = state
-        state = tmp
-        most_probable_state = 0
-        for i in range(N):
-            state[i] = 0
-            for j in range(N):
-                state[i] += prev[j] * switch_probs[j, i]
-            state[i] *= plhs[col, i]
-            if state[i] > state[most_probable_state]:
-                most_probable_state = i
-        while state[most_probable_state] < 1.0:
-            for i from 0 <= i < N:
-                state[i] *= BASE
-            exponent += -1
+
+    # each site depends on the previous, so this is serial but need not
+    # hold the GIL
+    exponent = 0
+    with nogil:
+        for site in range(S):
+            col = index[site]
+            tmp = prev
+            prev = state
+            state = tmp
+            most_probable_state = 0
+            for i in range(N):
+                state[i] = 0
+                for j in range(N):
+                    state[i] += prev[j] * switch_probs[j, i]
+                state[i] *= plhs[col, i]
+                if state[i] > state[most_probable_state]:
+                    most_probable_state = i
+            while state[most_probable_state] < 1.0:
+                for i in range(N):
+                    state[i] *= BASE
+                exponent += -1
     result = 0.0
     for i in range(N):
         result += state[i]
@@ -7,7 +7,13 @@ from numpy import array, diag, dot, eye, float64, int32, log, sqrt, zeros
 from numpy.linalg import LinAlgError, det, inv, norm
 
 from cogent3 import DNA, RNA, get_moltype
-from cogent3.util.dict_array import DictArray
+from cogent3.core.packed_seq import (
+    PackedAlignment,
+    pack_indices,
+    packed_hamming,
+    pad_to_words,
+)
+from cogent3.util.dict_array import DictArray, DictArrayTemplate
 from cogent3.util.misc import get_object_provenance
 from cogent3.util.progress_display import display_wrap
 
@@ -268,6 +274,387 @@ def _logdet(matrix, use_tk_adjustment=True):
     return total, p, d_xy, var
 
 
+# maximum number of sequence elements combined in one batch of diversity
+# matrices, bounds the memory of the intermediate integer arrays
+_MAX_BATCH_ELEMENTS = 2 ** 22
+# maximum number of sequences along each side of a tile of pairs
+_TILE_SIZE = 256
+
+
+def _fill_diversity_matrices(seq1, seqs, dim):
+    """returns diversity matrices between seq1 and every sequence in seqs
+
+    Parameters
+    ----------
+    seq1 : array
+        1D array of sequence indices
+    seqs : array
+        2D array of sequence indices, one row per sequence
+    dim : int
+        number of valid states
+
+    Returns
+    -------
+    float64 array with shape (len(seqs), dim, dim)
+
+    Notes
+    -----
+    Assumes the provided sequences have been converted to indices with
+    invalid characters being negative numbers (use get_moltype_index_array
+    plus seq_to_indices)."""
+    num = seqs.shape[0]
+    size = dim * dim
+    dtype = int32 if num * size < 2 ** 31 else numpy.int64
+    # each pair gets its own block of size codes, so a single bincount
+    # produces all the matrices
+    combined = seq1.astype(dtype) * dim + seqs
+    combined += numpy.arange(num, dtype=dtype)[:, None] * size
+    valid = (seqs >= 0) & (seq1 >= 0)
+    combined = combined[valid] if not valid.all() else combined.ravel()
+    counts = numpy.bincount(combined, minlength=num * size)
+    return counts.reshape(num, dim, dim).astype(float64)
+
+
+def _batch_totals(matrices):
+    """returns the totals and number of differences for each matrix"""
+    total = matrices.sum(axis=(1, 2))
+    diffs = total - numpy.trace(matrices, axis1=1, axis2=2)
+    return total, diffs
+
+
+def _hamming_from_counts(total, diffs):
+    """(total, p, diffs, var) from the numbers of valid and differing
+    positions, invalid values are nan"""
+    total = numpy.asarray(total, dtype=float64)
+    diffs = numpy.asarray(diffs, dtype=float64)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        p = diffs / total
+    invalid = total == 0
+    diffs[invalid] = numpy.nan
+    p[invalid] = numpy.nan
+    total[invalid] = numpy.nan
+    var = numpy.full(total.shape, numpy.nan)
+    return total, p, diffs, var
+
+
+def _hamming_batch(matrices):
+    """vectorised _hamming, invalid values are nan"""
+    return _hamming_from_counts(*_batch_totals(matrices))
+
+
+def _jc69_from_matrices(matrices):
+    """vectorised _jc69_from_matrix, invalid values are nan"""
+    total, diffs = _batch_totals(matrices)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        p = diffs / total
+        factor = 1 - (4 / 3) * p
+        dist = -3.0 * log(factor) / 4
+        var = p * (1 - p) / (factor * factor * total)
+
+    invalid = (total == 0) | ~(p < 0.75)
+    for value in (total, p, dist, var):
+        value[invalid] = numpy.nan
+    return total, p, dist, var
+
+
+def _tn93_from_matrices(
+    matrices, freqs, pur_indices, pyr_indices, pur_coords, pyr_coords, tv_coords
+):
+    """vectorised _tn93_from_matrix, invalid values are nan"""
+    num = matrices.shape[0]
+    total, _ = _batch_totals(matrices)
+    flat = matrices.reshape(num, -1)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        freqs = matrices.sum(axis=1) + matrices.sum(axis=2)
+        freqs /= 2 * total[:, None]
+
+        p = flat.take(pur_coords + pyr_coords + tv_coords, axis=1).sum(axis=1)
+        p /= total
+
+        freq_purs = freqs.take(pur_indices, axis=1).sum(axis=1)
+        prod_purs = freqs.take(pur_indices, axis=1).prod(axis=1)
+        freq_pyrs = freqs.take(pyr_indices, axis=1).sum(axis=1)
+        prod_pyrs = freqs.take(pyr_indices, axis=1).prod(axis=1)
+
+        pur_ts_diffs = flat.take(pur_coords, axis=1).sum(axis=1) / total
+        pyr_ts_diffs = flat.take(pyr_coords, axis=1).sum(axis=1) / total
+        tv_diffs = flat.take(tv_coords, axis=1).sum(axis=1) / total
+
+        coeff1 = 2 * prod_purs / freq_purs
+        coeff2 = 2 * prod_pyrs / freq_pyrs
+        coeff3 = 2 * (
+            freq_purs * freq_pyrs
+            - (prod_purs * freq_pyrs / freq_purs)
+            - (prod_pyrs * freq_purs / freq_pyrs)
+        )
+
+        term1 = 1 - pur_ts_diffs / coeff1 - tv_diffs / (2 * freq_purs)
+        term2 = 1 - pyr_ts_diffs / coeff2 - tv_diffs / (2 * freq_pyrs)
+        term3 = 1 - tv_diffs / (2 * freq_purs * freq_pyrs)
+
+        dist = -coeff1 * log(term1) - coeff2 * log(term2) - coeff3 * log(term3)
+        v1 = 1 / term1
+        v2 = 1 / term2
+        v3 = 1 / term3
+        v4 = (
+            (coeff1 * v1 / (2 * freq_purs))
+            + (coeff2 * v2 / (2 * freq_pyrs))
+            + (coeff3 * v3 / (2 * freq_purs * freq_pyrs))
+        )
+        var = (
+            v1 ** 2 * pur_ts_diffs
+            + v2 ** 2 * pyr_ts_diffs
+            + v4 ** 2 * tv_diffs
+            - (v1 * pur_ts_diffs + v2 * pyr_ts_diffs + v4 * tv_diffs) ** 2
+        )
+        var /= total
+
+    invalid = (total == 0) | ~(term1 > 0) | ~(term2 > 0) | ~(term3 > 0)
+    for value in (total, p, dist, var):
+        value[invalid] = numpy.nan
+    return total, p, dist, var
+
+
+def _logdetcommon_batch(matrices):
+    """vectorised _logdetcommon
+
+    Returns
+    -------
+    total, p, frequency, freqs, var_term, valid where valid is a boolean
+    array indicating matrices for which the statistics can be computed
+    """
+    total, diffs = _batch_totals(matrices)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        p = diffs / total
+
+    dim = matrices.shape[1]
+    diag = numpy.arange(dim)
+    # we replace the missing diagonal states with a frequency of 0.5,
+    # then normalise
+    frequency = matrices.copy()
+    states = frequency[:, diag, diag]
+    states[states == 0] = 0.5
+    frequency[:, diag, diag] = states
+    frequency /= frequency.sum(axis=(1, 2))[:, None, None]
+
+    valid = (total > 0) & (diffs > 0)
+    dets = numpy.zeros(total.shape, dtype=float64)
+    dets[valid] = det(frequency[valid])
+    valid &= dets > 0
+
+    freqs = [frequency.sum(axis=axis) for axis in (1, 2)]
+    var_term = numpy.full(total.shape, numpy.nan)
+    if valid.any():
+        # the inverse matrix of frequency, every element is squared
+        M_matrix = inv(frequency[valid]) ** 2
+        var_term[valid] = numpy.einsum("nij,nji->n", M_matrix, frequency[valid])
+
+    return total, p, dets, freqs, var_term, valid
+
+
+def _paralinear_batch(matrices):
+    """vectorised _paralinear, invalid values are nan"""
+    total, p, dets, freqs, var_term, valid = _logdetcommon_batch(matrices)
+    r = matrices.shape[1]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        prod = freqs[0] * freqs[1]
+        d_xy = -log(dets / sqrt(prod.prod(axis=1))) / r
+        var = (var_term - (1 / sqrt(prod)).sum(axis=1)) / (r ** 2 * total)
+
+    for value in (total, p, d_xy, var):
+        value[~valid] = numpy.nan
+    return total, p, d_xy, var
+
+
+def _logdet_batch(matrices, use_tk_adjustment=True):
+    """vectorised _logdet, invalid values are nan"""
+    total, p, dets, freqs, var_term, valid = _logdetcommon_batch(matrices)
+    r = matrices.shape[1]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        if use_tk_adjustment:
+            coeff = (((freqs[0] + freqs[1]) ** 2).sum(axis=1) / 4 - 1) / (r - 1)
+            prod = (freqs[0] * freqs[1]).prod(axis=1)
+            d_xy = coeff * log(dets / sqrt(prod))
+            var = numpy.full(total.shape, numpy.nan)
+        else:
+            d_xy = -log(dets) / r - log(r)
+            var = (var_term / r ** 2 - 1) / total
+
+    for value in (total, p, d_xy, var):
+        value[~valid] = numpy.nan
+    return total, p, d_xy, var
+
+
+def _calc_stats(matrices, func, batch_func, func_args):
+    """returns (total, p, dist, var) for a stack of diversity matrices
+
+    Returns
+    -------
+    float64 array with shape (4, len(matrices)), invalid values are nan
+    """
+    num = len(matrices)
+    if batch_func is not None:
+        stats = batch_func(matrices, *func_args)
+        return numpy.array(stats, dtype=float64).reshape(4, num)
+
+    stats = [
+        [numpy.nan if v is None else v for v in func(matrix, *func_args)]
+        for matrix in matrices
+    ]
+    return numpy.array(stats, dtype=float64).reshape(num, 4).T
+
+
+def _condensed_index(num, i, j):
+    """index of (i, j), i < j, in a condensed upper triangle of num x num"""
+    return num * i - i * (i + 1) // 2 + (j - i - 1)
+
+
+def _take_condensed(condensed, num, rows):
+    """returns the condensed upper triangle for a subset of rows
+
+    Parameters
+    ----------
+    condensed : array
+        condensed upper triangle of a num x num matrix
+    num : int
+        number of rows in the matrix
+    rows : array
+        sorted row indices to retain
+    """
+    parts = [
+        condensed[_condensed_index(num, rows[i], rows[i + 1 :])]
+        for i in range(len(rows) - 1)
+    ]
+    return numpy.concatenate(parts) if parts else zeros(0, float64)
+
+
+def _condensed_to_square(condensed, num):
+    """returns the symmetric num x num matrix with a zero diagonal"""
+    square = zeros((num, num), float64)
+    start = 0
+    for i in range(num - 1):
+        end = start + num - i - 1
+        square[i, i + 1 :] = condensed[start:end]
+        square[i + 1 :, i] = condensed[start:end]
+        start = end
+    return square
+
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+class _SharedIndexedSeqs:
+    """indexed sequences placed in shared memory by the master process
+
+    Instances pickle as the segment name, shape and dtype only, so workers
+    attach to the same memory rather than receiving a copy of the data."""
+
+    def __init__(self, indexed_seqs):
+        self._shm = shared_memory.SharedMemory(create=True, size=indexed_seqs.nbytes)
+        self.name = self._shm.name
+        self.shape = indexed_seqs.shape
+        self.dtype = indexed_seqs.dtype.str
+        data = numpy.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        data[:] = indexed_seqs
+
+    def __getstate__(self):
+        return dict(name=self.name, shape=self.shape, dtype=self.dtype)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = None
+
+    def attach(self):
+        """returns a SharedMemory attached to the segment
+
+        The caller closes it once views of its buffer are released. Worker
+        processes share the master's resource tracker, so the segment is
+        unlinked only by the master."""
+        return shared_memory.SharedMemory(name=self.name)
+
+    def as_array(self, shm):
+        """the sequences as a view of an attached SharedMemory"""
+        return numpy.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    def close(self):
+        """releases the shared memory, only valid in the master process"""
+        if self._shm is None:
+            return
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+
+class _TileCalculator:
+    """computes statistics for a tile of the upper triangle of sequence pairs
+
+    Calling with (row_start, row_end, col_start, col_end) returns the tile
+    origin, a (4, rows, cols) array of (total, p, dist, var) and a boolean
+    (rows, cols) array indicating identical pairs. Cells on or below the
+    diagonal are nan."""
+
+    def __init__(self, seqs, dim, func, batch_func, func_args):
+        # seqs is either a numpy array or a _SharedIndexedSeqs instance
+        self._seqs = seqs
+        self._dim = dim
+        self._func = func
+        self._batch_func = batch_func
+        self._func_args = func_args
+
+    def __call__(self, tile):
+        if isinstance(self._seqs, numpy.ndarray):
+            return self._calc_tile(self._seqs, tile)
+
+        # attached only for the duration of the tile, so a long-lived worker
+        # does not retain segments the master has since unlinked
+        shm = self._seqs.attach()
+        try:
+            return self._calc_tile(self._seqs.as_array(shm), tile)
+        finally:
+            try:
+                shm.close()
+            except BufferError:
+                # a traceback still references the array, it's released
+                # when shm is garbage collected
+                pass
+
+    def _calc_tile(self, seqs, tile):
+        row_start, row_end, col_start, col_end = tile
+        shape = (row_end - row_start, col_end - col_start)
+        stats = numpy.full((4,) + shape, numpy.nan)
+        is_dupe = numpy.zeros(shape, dtype=bool)
+        for i in range(row_start, row_end):
+            start = max(i + 1, col_start)
+            if start >= col_end:
+                continue
+            matrices = _fill_diversity_matrices(
+                seqs[i], seqs[start:col_end], self._dim
+            )
+            _, diffs = _batch_totals(matrices)
+            row = i - row_start
+            cols = slice(start - col_start, col_end - col_start)
+            is_dupe[row, cols] = diffs == 0
+            stats[:, row, cols] = _calc_stats(
+                matrices, self._func, self._batch_func, self._func_args
+            )
+        return row_start, col_start, stats, is_dupe
+
+
+def _get_tiles(num, tile_size):
+    """returns tiles covering the upper triangle of a num x num matrix"""
+    bounds = list(range(0, num, tile_size)) + [num]
+    tiles = []
+    for r in range(len(bounds) - 1):
+        for c in range(r, len(bounds) - 1):
+            if bounds[r] >= bounds[c + 1] - 1:
+                continue
+            tiles.append((bounds[r], bounds[r + 1], bounds[c], bounds[c + 1]))
+    return tiles
+
+
 try:
     from ._pairwise_distance import _fill_diversity_matrix as fill_diversity_matrix
 
@@ -316,6 +703,9 @@ class _PairwiseDistance(object):
     """base class for computing pairwise distances"""
 
     valid_moltypes = ()
+    # whether distances derive from the number of differences alone, so
+    # can be computed from 2-bit packed nucleotides
+    _packed_counts = False
 
     def __init__(self, moltype, invalid=-9, alignment=None, invalid_raises=False):
         super(_PairwiseDistance, self).__init__()
@@ -331,26 +721,39 @@ class _PairwiseDistance(object):
         self.moltype = moltype
         self.char_to_indices = get_moltype_index_array(moltype, invalid=invalid)
         self._dim = len(list(moltype))
-        self._dists = None
+        # condensed upper triangle of (length, fraction_variable, dist,
+        # variance) for all sequence pairs, has shape (4, num pairs)
+        self._stats = None
         self._dupes = None
         self._duped = None
         self._invalid_raises = invalid_raises
 
         self.names = None
         self.indexed_seqs = None
+        # (packed, valid) arrays of the indexed seqs, see pack_indices
+        self._packed = None
 
         if alignment is not None:
             self._convert_seqs_to_indices(alignment)
 
         self._func_args = []
+        # vectorised counterpart of func, operating on a stack of matrices
+        self._batch_func = None
 
     def _convert_seqs_to_indices(self, alignment):
         assert isinstance(
             alignment.moltype, type(self.moltype)
         ), "Alignment does not have correct MolType"
 
-        self._dists = {}
+        self._stats = None
+        self._packed = None
         self.names = alignment.names[:]
+        if isinstance(alignment, PackedAlignment):
+            self.indexed_seqs = alignment.to_indices()
+            packed = alignment.packed, alignment.valid_mask()
+            self._packed = tuple(map(pad_to_words, packed))
+            return
+
         indexed_seqs = []
         for name in self.names:
             seq = alignment.get_gapped_seq(name)
@@ -358,6 +761,9 @@ class _PairwiseDistance(object):
             indexed_seqs.append(indexed)
 
         self.indexed_seqs = array(indexed_seqs)
+        if self._packed_counts and self._dim == 4:
+            packed = pack_indices(self.indexed_seqs)
+            self._packed = tuple(map(pad_to_words, packed))
 
     @property
     def duplicated(self):
@@ -369,56 +775,185 @@ class _PairwiseDistance(object):
     def func():
         pass  # over ride in subclasses
 
-    @display_wrap
-    def run(self, alignment=None, ui=None):
-        """computes the pairwise distances"""
-        self._dupes = None
-        self._duped = None
+    def _run_serial(self, ui):
+        """computes distances row by row, skipping duplicated sequences
 
+        Returns
+        -------
+        set of duplicate indices, {index: [indices of duplicates], ..}
+        """
         dupes = set()
         duped = defaultdict(list)
 
-        if alignment is not None:
-            self._convert_seqs_to_indices(alignment)
-
         names = self.names[:]
-        matrix = zeros((self._dim, self._dim), float64)
-        off_diag = [
-            (i, j) for i in range(self._dim) for j in range(self._dim) if i != j
-        ]
-        off_diag = tuple([tuple(a) for a in zip(*off_diag)])
+        num_seqs = len(names)
+        # number of pairs whose diversity matrices are computed together
+        seq_len = max(self.indexed_seqs.shape[1], 1)
+        batch_size = max(1, _MAX_BATCH_ELEMENTS // seq_len)
 
         done = 0.0
-        to_do = (len(names) * len(names) - 1) / 2
-        for i in range(len(names) - 1):
+        to_do = (num_seqs * num_seqs - 1) / 2
+        for i in range(num_seqs - 1):
             if i in dupes:
                 continue
 
             name_1 = names[i]
             s1 = self.indexed_seqs[i]
-            for j in range(i + 1, len(names)):
-                if j in dupes:
-                    continue
-
-                name_2 = names[j]
-                ui.display("%s vs %s" % (name_1, name_2), done / to_do)
-                done += 1
-                matrix.fill(0)
-                s2 = self.indexed_seqs[j]
-                fill_diversity_matrix(matrix, s1, s2)
-                if not (matrix[off_diag] > 0).any():
-                    # j is a duplicate of i
+            others = array([j for j in range(i + 1, num_seqs) if j not in dupes])
+            for start in range(0, len(others), batch_size):
+                ui.display("%s vs others" % name_1, done / to_do)
+                block = others[start : start + batch_size]
+                done += len(block)
+                if self._packed is None:
+                    matrices = _fill_diversity_matrices(
+                        s1, self.indexed_seqs.take(block, axis=0), self._dim
+                    )
+                    total, diffs = _batch_totals(matrices)
+                else:
+                    matrices = None
+                    packed, valid = self._packed
+                    total, diffs = packed_hamming(
+                        packed[i],
+                        valid[i],
+                        packed.take(block, axis=0),
+                        valid.take(block, axis=0),
+                    )
+                # j is a duplicate of i
+                is_dupe = diffs == 0
+                for j in block[is_dupe].tolist():
                     dupes.update([j])
                     duped[i].append(j)
-                    continue
 
-                total, p, dist, var = self.func(matrix, *self._func_args)
-                if self._invalid_raises and not isinstance(dist, Number):
-                    msg = f"distance could not be calculated for {name_1} - {name_2}"
+                block = block[~is_dupe]
+                if matrices is None:
+                    stats = numpy.array(
+                        _hamming_from_counts(total[~is_dupe], diffs[~is_dupe])
+                    )
+                else:
+                    stats = _calc_stats(
+                        matrices[~is_dupe],
+                        self.func,
+                        self._batch_func,
+                        self._func_args,
+                    )
+                invalid = numpy.isnan(stats[2])
+                if self._invalid_raises and invalid.any():
+                    name_2 = names[block[invalid][0]]
+                    msg = (
+                        f"distance could not be calculated for "
+                        f"{name_1} - {name_2}"
+                    )
+                    raise ArithmeticError(msg)
+                self._stats[:, _condensed_index(num_seqs, i, block)] = stats
+
+        return dupes, duped
+
+    def _run_parallel(self, par_kw, ui):
+        """computes distances for tiles of sequence pairs in parallel
+
+        Returns
+        -------
+        set of duplicate indices, {index: [indices of duplicates], ..}
+        """
+        from cogent3.util import parallel
+
+        names = self.names[:]
+        num_seqs = len(names)
+        num_pairs = num_seqs * (num_seqs - 1) // 2
+        seq_len = max(self.indexed_seqs.shape[1], 1)
+        tile_size = max(1, min(_TILE_SIZE, _MAX_BATCH_ELEMENTS // seq_len))
+        tiles = _get_tiles(num_seqs, tile_size)
+
+        stats = self._stats
+        is_dupe = numpy.zeros(num_pairs, dtype=bool)
+
+        use_shared = shared_memory is not None and not par_kw.get("use_mpi", False)
+        if use_shared:
+            seqs = _SharedIndexedSeqs(self.indexed_seqs)
+        else:
+            seqs = self.indexed_seqs
+        calc = _TileCalculator(
+            seqs, self._dim, self.func, self._batch_func, self._func_args
+        )
+        try:
+            results = parallel.imap(calc, tiles, **par_kw)
+            for done, result in enumerate(results):
+                ui.display("tile %d / %d" % (done + 1, len(tiles)), done / len(tiles))
+                row_start, col_start, tile_stats, tile_dupes = result
+                rows, cols = numpy.indices(tile_dupes.shape)
+                rows += row_start
+                cols += col_start
+                upper = rows < cols
+                rows, cols = rows[upper], cols[upper]
+                indices = _condensed_index(num_seqs, rows, cols)
+                stats[:, indices] = tile_stats[:, upper]
+                is_dupe[indices] = tile_dupes[upper]
+        finally:
+            if use_shared:
+                seqs.close()
+
+        # replay the serial duplicate detection, a sequence is a duplicate of
+        # the first non-duplicate sequence it is identical to
+        owner = numpy.full(num_seqs, num_seqs)
+        duped = defaultdict(list)
+        for i in range(num_seqs - 1):
+            if owner[i] < num_seqs:
+                continue
+            start = _condensed_index(num_seqs, i, i + 1)
+            row = is_dupe[start : start + num_seqs - i - 1]
+            found = numpy.flatnonzero(row) + i + 1
+            found = found[owner[found] == num_seqs]
+            owner[found] = i
+            duped[i].extend(found.tolist())
+
+        dupes = set(numpy.flatnonzero(owner < num_seqs).tolist())
+        duped = {k: v for k, v in duped.items() if v}
+        if self._invalid_raises:
+            for i in range(num_seqs - 1):
+                if i in dupes:
+                    continue
+                js = numpy.arange(i + 1, num_seqs)
+                # pairs the serial algorithm computes
+                js = js[owner[js] > i]
+                invalid = numpy.isnan(stats[2, _condensed_index(num_seqs, i, js)])
+                if invalid.any():
+                    msg = (
+                        f"distance could not be calculated for "
+                        f"{names[i]} - {names[js[invalid][0]]}"
+                    )
                     raise ArithmeticError(msg)
-                result = Stats(total, p, dist, var)
-                self._dists[(name_1, name_2)] = result
-                self._dists[(name_2, name_1)] = result
+
+        return dupes, duped
+
+    @display_wrap
+    def run(self, alignment=None, parallel=False, par_kw=None, ui=None):
+        """computes the pairwise distances
+
+        Parameters
+        ----------
+        alignment
+            if provided, replaces the sequences the calculator was created
+            with. Can be a PackedAlignment.
+        parallel : bool
+            compute tiles of sequence pairs in parallel. Sequences are shared
+            with worker processes via shared memory when possible.
+        par_kw
+            dict of arguments for cogent3.util.parallel.imap, e.g.
+            max_workers, use_mpi
+        """
+        self._dupes = None
+        self._duped = None
+
+        if alignment is not None:
+            self._convert_seqs_to_indices(alignment)
+
+        names = self.names[:]
+        num_seqs = len(names)
+        self._stats = numpy.full((4, num_seqs * (num_seqs - 1) // 2), numpy.nan)
+        if parallel:
+            dupes, duped = self._run_parallel(par_kw or {}, ui)
+        else:
+            dupes, duped = self._run_serial(ui)
 
         self._dupes = [names[i] for i in dupes] or None
         if duped:
@@ -428,83 +963,79 @@ class _PairwiseDistance(object):
                 vals = [names[i] for i in v]
                 self._duped[key] = vals
 
-            # clean the distances so only unique seqs included
-            remove = set(self._dupes)
-            keys = list(self._dists.keys())
-            for key in keys:
-                if set(key) & remove:
-                    del self._dists[key]
-
     __call__ = run
 
-    def get_pairwise_distances(self, include_duplicates=True):
-        """returns a matrix of pairwise distances.
+    def _get_stat_matrix(self, stat, include_duplicates=True):
+        """returns DistanceMatrix of a statistic, backed by the condensed data
 
         Parameters
         ----------
+        stat : int
+            index of the statistic (see Stats)
         include_duplicates : bool
-            all seqs included in the distances, otherwise only unique sequences
-            are included.
+            all seqs included, otherwise only unique sequences are included.
+            Duplicates share the values of the sequence they duplicate.
         """
-        if self._dists is None:
-            return None
+        names = self.names[:]
+        row_index = {n: i for i, n in enumerate(names)}
+        redundants = {}
+        for k in self.duplicated or {}:
+            for r in self.duplicated[k]:
+                redundants[r] = k
 
-        dists = {k: self._dists[k].dist for k in self._dists}
-        if include_duplicates:
-            dists = self._expand(dists)
+        names = sorted(names)
+        if not include_duplicates:
+            names = [n for n in names if n not in redundants]
+        rows = [row_index[redundants.get(n, n)] for n in names]
 
-        result = DistanceMatrix(dists)
-        return result
+        return DistanceMatrix.from_condensed(
+            self._stats[stat], names, row_index=rows, num_rows=len(self.names)
+        )
 
-    def _expand(self, pwise):
-        """returns a pwise statistic dict that includes duplicates"""
-        if not self.duplicated:
-            # no duplicates, nothing to do
-            return pwise
+    def _get_stat_dict(self, stat):
+        """returns {(name1, name2): value, ..} of a statistic for all names,
+        invalid values are None"""
+        dists = self._get_stat_matrix(stat, include_duplicates=True).to_dict()
+        return {k: None if numpy.isnan(v) else v for k, v in dists.items()}
 
-        redundants = {}
-        for k in self.duplicated:
-            for r in self.duplicated[k]:
-                redundants[r] = k
+    def get_pairwise_distances(self, include_duplicates=True):
+        """returns a matrix of pairwise distances.
 
-        names = self.names[:]
-        for add, alias in redundants.items():
-            for name in names:
-                if name == add:
-                    continue
-                if name == alias:
-                    val = 0
-                else:
-                    val = pwise.get((alias, name), None)
-                pwise[(add, name)] = pwise[(name, add)] = val
+        Parameters
+        ----------
+        include_duplicates : bool
+            all seqs included in the distances, otherwise only unique sequences
+            are included.
+        """
+        if self._stats is None:
+            return None
 
-        return pwise
+        return self._get_stat_matrix(2, include_duplicates=include_duplicates)
 
     @property
     def dists(self):
-        if self._dists is None:
+        if self._stats is None:
             return None
 
         return self.get_pairwise_distances(include_duplicates=True)
 
     @property
     def stderr(self):
-        if self._dists is None:
+        if self._stats is None:
             return None
 
-        stats = {k: sqrt(self._dists[k].variance) for k in self._dists}
-        stats = self._expand(stats)
+        stats = self._get_stat_dict(3)
+        stats = {k: None if v is None else sqrt(v) for k, v in stats.items()}
         kwargs = dict(title="Standard Error of Pairwise Distances", digits=4)
         t = _make_stat_table(stats, self.names, **kwargs)
         return t
 
     @property
     def variances(self):
-        if self._dists is None:
+        if self._stats is None:
             return None
 
-        stats = {k: self._dists[k].variance for k in self._dists}
-        stats = self._expand(stats)
+        stats = self._get_stat_dict(3)
         kwargs = dict(title="Variances of Pairwise Distances", digits=4)
         t = _make_stat_table(stats, self.names, **kwargs)
         var_formatter = _number_formatter("%.2e")
@@ -514,22 +1045,20 @@ class _PairwiseDistance(object):
 
     @property
     def proportions(self):
-        if self._dists is None:
+        if self._stats is None:
             return None
 
-        stats = {k: self._dists[k].fraction_variable for k in self._dists}
-        stats = self._expand(stats)
+        stats = self._get_stat_dict(1)
         kwargs = dict(title="Proportion variable sites", digits=4)
         t = _make_stat_table(stats, self.names, **kwargs)
         return t
 
     @property
     def lengths(self):
-        if self._dists is None:
+        if self._stats is None:
             return None
 
-        stats = {k: self._dists[k].length for k in self._dists}
-        stats = self._expand(stats)
+        stats = self._get_stat_dict(0)
         kwargs = dict(title="Pairwise Aligned Lengths", digits=0)
         t = _make_stat_table(stats, self.names, **kwargs)
         return t
@@ -539,22 +1068,26 @@ class HammingPair(_PairwiseDistance):
     """Hamming distance calculator for pairwise alignments"""
 
     valid_moltypes = ("dna", "rna", "protein", "text")
+    _packed_counts = True
 
     def __init__(self, moltype="text", *args, **kwargs):
         """states: the valid sequence states"""
         super(HammingPair, self).__init__(moltype, *args, **kwargs)
         self.func = _hamming
+        self._batch_func = _hamming_batch
 
 
 class PercentIdentityPair(_PairwiseDistance):
     """Percent identity distance calculator for pairwise alignments"""
 
     valid_moltypes = ("dna", "rna", "protein", "text")
+    _packed_counts = True
 
     def __init__(self, moltype="text", *args, **kwargs):
         """states: the valid sequence states"""
         super(PercentIdentityPair, self).__init__(moltype, *args, **kwargs)
         self.func = _hamming
+        self._batch_func = _hamming_batch
 
     def get_pairwise_distances(self, include_duplicates=True):
         """returns a matrix of pairwise distances.
@@ -565,15 +1098,10 @@ class PercentIdentityPair(_PairwiseDistance):
             all seqs included in the distances, otherwise only unique sequences
             are included.
         """
-        if self._dists is None:
+        if self._stats is None:
             return None
 
-        dists = {k: self._dists[k].fraction_variable for k in self._dists}
-        if include_duplicates:
-            dists = self._expand(dists)
-
-        result = DistanceMatrix(dists)
-        return result
+        return self._get_stat_matrix(1, include_duplicates=include_duplicates)
 
 
 class _NucleicSeqPair(_PairwiseDistance):
@@ -596,6 +1124,7 @@ class JC69Pair(_NucleicSeqPair):
         """states: the valid sequence states"""
         super(JC69Pair, self).__init__(moltype, *args, **kwargs)
         self.func = _jc69_from_matrix
+        self._batch_func = _jc69_from_matrices
 
 
 class TN93Pair(_NucleicSeqPair):
@@ -622,6 +1151,7 @@ class TN93Pair(_NucleicSeqPair):
         self.tv_coords = [i * 4 + j for i, j in self.tv_coords]
 
         self.func = _tn93_from_matrix
+        self._batch_func = _tn93_from_matrices
         self._func_args = [
             self._freqs,
             self.pur_indices,
@@ -644,6 +1174,7 @@ class LogDetPair(_PairwiseDistance):
         """
         super(LogDetPair, self).__init__(moltype, *args, **kwargs)
         self.func = _logdet
+        self._batch_func = _logdet_batch
         self._func_args = [use_tk_adjustment]
 
     def run(self, use_tk_adjustment=None, *args, **kwargs):
@@ -661,6 +1192,7 @@ class ParalinearPair(_PairwiseDistance):
     def __init__(self, moltype="dna", *args, **kwargs):
         super(ParalinearPair, self).__init__(moltype, *args, **kwargs)
         self.func = _paralinear
+        self._batch_func = _paralinear_batch
 
 
 _calculators = {
@@ -712,20 +1244,130 @@ def available_distances():
 
 
 class DistanceMatrix(DictArray):
-    """pairwise distance matrix"""
+    """pairwise distance matrix
+
+    Notes
+    -----
+    Instances created by from_condensed store only the condensed upper
+    triangle and a mapping of names to its rows. The full 2D array is
+    created only when accessed.
+    """
+
+    # condensed storage, None when the 2D array is the storage
+    _condensed = None
+    _row_index = None
+    _num_rows = None
+    _array = None
 
     def __init__(self, dists, invalid=None):
         super(DistanceMatrix, self).__init__(dists, dtype=float)
 
         self._invalid = invalid
 
+    @classmethod
+    def from_condensed(
+        cls, condensed, names, row_index=None, num_rows=None, invalid=None
+    ):
+        """returns a DistanceMatrix backed by a condensed upper triangle
+
+        Parameters
+        ----------
+        condensed
+            1D float64 array of the upper triangle, row-major order, i.e.
+            d[0, 1], d[0, 2], .. d[1, 2], ..
+        names
+            series of names
+        row_index
+            the row of condensed corresponding to each name. Names sharing a
+            row have a distance of 0. Defaults to the order of names.
+        num_rows : int
+            the number of rows in condensed, defaults to the number of names
+        invalid
+            as for the constructor
+        """
+        names = list(names)
+        if row_index is None:
+            row_index = numpy.arange(len(names))
+        num_rows = len(names) if num_rows is None else num_rows
+        condensed = numpy.asarray(condensed, dtype=float64)
+        if len(condensed) != num_rows * (num_rows - 1) // 2:
+            raise ValueError(
+                f"condensed length {len(condensed)} inconsistent with "
+                f"{num_rows} rows"
+            )
+
+        result = cls.__new__(cls)
+        result._condensed = condensed
+        result._row_index = numpy.asarray(row_index, dtype=int)
+        result._num_rows = num_rows
+        result._invalid = invalid
+        result.template = DictArrayTemplate(names, names)
+        result.shape = (len(names), len(names))
+        return result
+
+    @property
+    def array(self):
+        if self._array is None and self._condensed is not None:
+            self._array = self._expand_condensed()
+        return self._array
+
+    @array.setter
+    def array(self, value):
+        self._array = value
+
+    def _expand_condensed(self):
+        """returns the 2D array from the condensed storage"""
+        used, inverse = numpy.unique(self._row_index, return_inverse=True)
+        if len(used) == self._num_rows:
+            condensed = self._condensed
+        else:
+            condensed = _take_condensed(self._condensed, self._num_rows, used)
+        square = _condensed_to_square(condensed, len(used))
+        return square[numpy.ix_(inverse, inverse)]
+
+    def to_condensed(self):
+        """returns the upper triangle, row-major, for the order of names
+
+        Notes
+        -----
+        The result is a new array and can be modified by the caller.
+        """
+        num = len(self.names)
+        if self._condensed is not None and self._array is None:
+            rows = self._row_index
+            if num == self._num_rows and (rows == numpy.arange(num)).all():
+                return self._condensed.copy()
+            if len(set(rows)) == num and (numpy.diff(rows) > 0).all():
+                return _take_condensed(self._condensed, self._num_rows, rows)
+        return self.array[numpy.triu_indices(num, k=1)]
+
+    def _condensed_value(self, i, j):
+        """returns the distance between names at indices i and j"""
+        row_i, row_j = self._row_index[i], self._row_index[j]
+        if row_i == row_j:
+            return float64(0.0)
+        if row_i > row_j:
+            row_i, row_j = row_j, row_i
+        return self._condensed[_condensed_index(self._num_rows, row_i, row_j)]
+
     def __setitem__(self, names, value):
         (index, remaining) = self.template.interpret_index(names)
-        self.array[index] = value
+        # modification requires the 2D array, which becomes the storage
+        data = self.array
+        self._condensed = None
+        data[index] = value
         return
 
     def __getitem__(self, names):
         (index, remaining) = self.template.interpret_index(names)
+        if (
+            self._condensed is not None
+            and remaining is None
+            and len(index) == 2
+            and self._array is None
+        ):
+            return self._condensed_value(*index)
+
         result = self.array[index]
         if remaining is not None:
             result = self.__class__(result, remaining)
@@ -778,6 +1420,18 @@ class DistanceMatrix(DictArray):
         else:
             keep = [i for i, n in enumerate(current_names) if n in names]
 
+        if self._condensed is not None:
+            if len(keep) < 2:
+                return None
+            # shares the condensed storage
+            return self.from_condensed(
+                self._condensed,
+                current_names.take(keep).tolist(),
+                row_index=self._row_index.take(keep),
+                num_rows=self._num_rows,
+                invalid=self._invalid,
+            )
+
         data = self.array.take(keep, axis=0)
         data = data.take(keep, axis=1)
         names = current_names.take(keep)
@@ -795,6 +1449,9 @@ class DistanceMatrix(DictArray):
 
     def drop_invalid(self):
         """drops all rows / columns with an invalid entry"""
+        if self._condensed is not None:
+            return self._drop_invalid_condensed()
+
         if (
             self.shape[0] != self.shape[1]
             or self.template.names[0] != self.template.names[1]
@@ -811,6 +1468,28 @@ class DistanceMatrix(DictArray):
         result = self.take_dists(keep)
         return result
 
+    def _drop_invalid_condensed(self):
+        """drop_invalid for condensed storage"""
+        used, inverse = numpy.unique(self._row_index, return_inverse=True)
+        if len(used) == self._num_rows:
+            condensed = self._condensed
+        else:
+            condensed = _take_condensed(self._condensed, self._num_rows, used)
+
+        num = len(used)
+        invalid = zeros(num, dtype=bool)
+        start = 0
+        for i in range(num - 1):
+            end = start + num - i - 1
+            row = numpy.isnan(condensed[start:end])
+            if row.any():
+                invalid[i] = True
+                invalid[i + 1 :] |= row
+            start = end
+
+        keep = [n for n, r in zip(self.names, inverse) if not invalid[r]]
+        return self.take_dists(keep)
+
     def quick_tree(self, show_progress=False):
         """returns a neighbour joining tree
         Returns
@@ -823,5 +1502,4 @@ class DistanceMatrix(DictArray):
         dists = self.drop_invalid()
         if not dists or dists.shape[0] == 1:
             raise ValueError("Too few distances to build a treenj")
-        dists = dists.to_dict()
         return nj(dists, show_progress=show_progress)
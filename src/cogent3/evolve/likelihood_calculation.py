@@ -10,7 +10,13 @@ in addition to binary trees.
 """
 import numpy
 
-from cogent3.evolve.likelihood_tree import LikelihoodTreeEdge
+from cogent3.evolve.likelihood_tree import (
+    LikelihoodTreeEdge,
+    get_exponents,
+    scaled,
+    scaled_inner,
+    with_common_scale,
+)
 from cogent3.evolve.simulate import argpick
 from cogent3.maths.markov import SiteClassTransitionMatrix
 from cogent3.recalculation.definition import (
@@ -19,9 +25,11 @@ from cogent3.recalculation.definition import (
     CallDefn,
     NonParamDefn,
     ProbabilityParamDefn,
+    SelectForDimension,
     SumDefn,
     _FuncDefn,
 )
+from cogent3.recalculation.scope import Undefined
 
 
 Float = numpy.core.numerictypes.sctype2char(float)
@@ -72,6 +80,76 @@ class PartialLikelihoodProductDefnFixedMotif(PartialLikelihoodProductDefn):
         return result
 
 
+class BinnedPartialLikelihoodProductDefn(PartialLikelihoodProductDefn):
+    """partial likelihoods of all bins as a single [bin, site, motif] array"""
+
+    def calc(self, recycled_result, fixed_motif, lh_edge, *child_likelihoods):
+        if recycled_result is None:
+            num_bins = child_likelihoods[0].shape[0]
+            recycled_result = lh_edge.make_partial_likelihoods_array(num_bins)
+        result = lh_edge.sum_binned_input_likelihoodsR(
+            recycled_result, *child_likelihoods
+        )
+        if fixed_motif not in [None, -1]:
+            for motif in range(result.shape[-1]):
+                if motif != fixed_motif:
+                    result[..., motif] = 0.0
+        return result
+
+
+class BinnedRootLikelihoodDefn(CalculationDefn):
+    """[bin, site] likelihoods from [bin, site, motif] root partial
+    likelihoods and [bin, motif] motif probabilities"""
+
+    name = "bin_lhs"
+
+    def setup(self, bin_names):
+        # required by SelectForDimension
+        self.bin_names = bin_names
+
+    def calc(self, plhs, mprobs):
+        result = numpy.matmul(numpy.asarray(plhs), mprobs[..., numpy.newaxis])
+        return scaled(result[..., 0], get_exponents(plhs))
+
+
+class _BinLikelihoodDefn(SelectForDimension):
+    """selects one bin from the BinnedRootLikelihoodDefn result"""
+
+    user_param = False
+
+    def update(self):
+        # input is undefined until there is an alignment
+        values = self.arg.values
+        self.arg.values = [
+            [v] * len(self.arg.bin_names) if isinstance(v, Undefined) else v
+            for v in values
+        ]
+        try:
+            super(_BinLikelihoodDefn, self).update()
+        finally:
+            self.arg.values = values
+
+
+def stack_bins(*values):
+    """returns the per bin values as a single array, bin first"""
+    return numpy.array(values)
+
+
+def binned_inner(plhs, psubs):
+    """returns [bin, site, motif] likelihoods for the parent end of an edge
+
+    Parameters
+    ----------
+    plhs
+        partial likelihoods for the child end of the edge, either
+        [bin, site, motif] or, for a leaf, [site, motif]
+    psubs
+        [bin, motif, motif] substitution probability matrices
+    """
+    result = numpy.matmul(numpy.asarray(plhs), numpy.swapaxes(psubs, -1, -2))
+    return scaled(result, get_exponents(plhs))
+
+
 class LhtEdgeLookupDefn(CalculationDefn):
     name = "col_index"
 
@@ -85,7 +163,13 @@ class LhtEdgeLookupDefn(CalculationDefn):
         return lht.get_edge(self.edge_name)
 
 
-def make_partial_likelihood_defns(edge, lht, psubs, fixed_motifs):
+def make_partial_likelihood_defns(edge, lht, psubs, fixed_motifs, bin_names=None):
+    """returns the partial likelihoods defn for edge
+
+    If bin_names is provided, the partial likelihoods of all bins are
+    computed together as [bin, site, motif] arrays, with one stacked
+    matrix product per edge.
+    """
     kw = {"edge_name": edge.name}
 
     if edge.istip():
@@ -94,12 +178,25 @@ def make_partial_likelihood_defns(edge, lht, psubs, fixed_motifs):
         lht_edge = LhtEdgeLookupDefn(lht, **kw)
         children = []
         for child in edge.children:
-            child_plh = make_partial_likelihood_defns(child, lht, psubs, fixed_motifs)
+            child_plh = make_partial_likelihood_defns(
+                child, lht, psubs, fixed_motifs, bin_names
+            )
             psub = psubs.select_from_dimension("edge", child.name)
-            child_plh = CalcDefn(numpy.inner)(child_plh, psub)
+            if bin_names:
+                psub = CalcDefn(stack_bins, name="psub_bins")(
+                    *psub.across_dimension("bin", bin_names)
+                )
+                child_plh = CalcDefn(binned_inner)(child_plh, psub)
+            else:
+                child_plh = CalcDefn(scaled_inner, name="inner")(child_plh, psub)
             children.append(child_plh)
 
-        if fixed_motifs:
+        if bin_names:
+            fixed_motif = fixed_motifs.select_from_dimension("edge", edge.name)
+            plh = BinnedPartialLikelihoodProductDefn(
+                fixed_motif, lht_edge, *children, **kw
+            )
+        elif fixed_motifs:
             fixed_motif = fixed_motifs.select_from_dimension("edge", edge.name)
             plh = PartialLikelihoodProductDefnFixedMotif(
                 fixed_motif, lht_edge, *children, **kw
@@ -110,15 +207,15 @@ def make_partial_likelihood_defns(edge, lht, psubs, fixed_motifs):
     return plh
 
 
-def recursive_lht_build(edge, leaves):
+def recursive_lht_build(edge, leaves, scaled=False):
     if edge.istip():
         lhe = leaves[edge.name]
     else:
         lht_children = []
         for child in edge.children:
-            lht = recursive_lht_build(child, leaves)
+            lht = recursive_lht_build(child, leaves, scaled=scaled)
             lht_children.append(lht)
-        lhe = LikelihoodTreeEdge(lht_children, edge_name=edge.name)
+        lhe = LikelihoodTreeEdge(lht_children, edge_name=edge.name, scaled=scaled)
     return lhe
 
 
@@ -129,16 +226,48 @@ class LikelihoodTreeDefn(CalculationDefn):
         self.tree = tree
 
     def calc(self, leaves):
+        # edges are rescaled to prevent underflow only when it occurs
         return recursive_lht_build(self.tree, leaves)
 
 
 def make_total_loglikelihood_defn(
-    tree, leaves, psubs, mprobs, bprobs, bin_names, locus_names, sites_independent
+    tree,
+    leaves,
+    psubs,
+    mprobs,
+    bprobs,
+    bin_names,
+    locus_names,
+    sites_independent,
+    fused_bins=True,
 ):
-
+    """returns the defn of the total log-likelihood
+
+    Parameters
+    ----------
+    fused_bins : bool
+        if sites are independent and there are multiple bins, the partial
+        likelihoods of all bins are calculated in a single tree traversal.
+        Otherwise, each bin has a separate traversal.
+    """
     fixed_motifs = NonParamDefn("fixed_motif", ["edge"])
 
     lht = LikelihoodTreeDefn(leaves, tree=tree)
+    root_mprobs = mprobs.select_from_dimension("edge", "root")
+    if fused_bins and sites_independent and len(bin_names) > 1:
+        plh = make_partial_likelihood_defns(
+            tree, lht, psubs, fixed_motifs, bin_names=bin_names
+        )
+        root_mprobs = CalcDefn(stack_bins, name="mprob_bins")(
+            *root_mprobs.across_dimension("bin", bin_names)
+        )
+        bin_lhs = BinnedRootLikelihoodDefn(plh, root_mprobs, bin_names=bin_names)
+        site_pattern = CalcDefn(BinnedSiteDistribution, name="bdist")(bprobs)
+        blh = CallDefn(site_pattern, lht, name="bindex")
+        lh = _BinLikelihoodDefn(bin_lhs, "bin", name="lh")
+        tll = CallDefn(blh, *lh.across_dimension("bin", bin_names), **dict(name="tll"))
+        return _sum_across_loci(tll, locus_names)
+
     plh = make_partial_likelihood_defns(tree, lht, psubs, fixed_motifs)
 
     # After the root partial likelihoods have been calculated it remains to
@@ -148,8 +277,7 @@ def make_total_loglikelihood_defn(
     # be interleaved first, otherwise summing over the CPUs is done last to
     # minimise inter-CPU communicaton.
 
-    root_mprobs = mprobs.select_from_dimension("edge", "root")
-    lh = CalcDefn(numpy.inner, name="lh")(plh, root_mprobs)
+    lh = CalcDefn(scaled_inner, name="lh")(plh, root_mprobs)
     if len(bin_names) > 1:
         if sites_independent:
             site_pattern = CalcDefn(BinnedSiteDistribution, name="bdist")(bprobs)
@@ -162,6 +290,10 @@ def make_total_loglikelihood_defn(
         lh = lh.select_from_dimension("bin", bin_names[0])
         tll = CalcDefn(log_sum_across_sites, name="logsum")(lht, lh)
 
+    return _sum_across_loci(tll, locus_names)
+
+
+def _sum_across_loci(tll, locus_names):
     if len(locus_names) > 1:
         # currently has no .make_likelihood_function() method.
         tll = SumDefn(*tll.across_dimension("locus", locus_names))
@@ -180,13 +312,14 @@ class BinnedSiteDistribution(object):
         self.bprobs = bprobs
 
     def get_weighted_sum_lh(self, lhs):
+        lhs, exponents = with_common_scale(lhs)
         result = numpy.zeros(lhs[0].shape, lhs[0].dtype.char)
         temp = numpy.empty(result.shape, result.dtype.char)
         for (bprob, lh) in zip(self.bprobs, lhs):
             temp[:] = lh
             temp *= bprob
             result += temp
-        return result
+        return scaled(result, exponents)
 
     def __call__(self, root):
         return BinnedLikelihood(self, root)
@@ -211,13 +344,14 @@ class PatchSiteDistribution(object):
         self.transition_matrix = SiteClassTransitionMatrix(switch, pprobs)
 
     def get_weighted_sum_lhs(self, lhs):
+        lhs, exponents = with_common_scale(lhs)
         result = numpy.zeros((2,) + lhs[0].shape, lhs[0].dtype.char)
         temp = numpy.empty(lhs[0].shape, result.dtype.char)
         for (patch, weight, lh) in zip(self.alloc, self.bprobs, lhs):
             temp[:] = lh
             temp *= weight
             result[patch] += temp
-        return result
+        return scaled(result, exponents)
 
     def __call__(self, root):
         return SiteHmm(self, root)
@@ -247,6 +381,8 @@ class BinnedLikelihood(object):
     def get_posterior_probs(self, *lhs):
         # posterior bin probs, not motif probs
         assert len(lhs) == len(self.distrib.bprobs)
+        # a common scale cancels
+        lhs, _ = with_common_scale(lhs)
         result = numpy.array(
             [
                 b * self.root.get_full_length_likelihoods(p)
@@ -264,14 +400,18 @@ class SiteHmm(object):
 
     def __call__(self, *lhs):
         plhs = self.distrib.get_weighted_sum_lhs(lhs)
+        exponents = get_exponents(plhs)
         plhs = numpy.ascontiguousarray(numpy.transpose(plhs))
+        plhs = scaled(plhs, exponents)
         matrix = self.distrib.transition_matrix
         return self.root.log_dot_reduce(matrix.StationaryProbs, matrix.Matrix, plhs)
 
     def get_posterior_probs(self, *lhs):
+        # a common scale for each site cancels
+        lhs, _ = with_common_scale(lhs)
         plhs = [
             self.root.get_full_length_likelihoods(lh)
-            for lh in self.distrib.get_weighted_sum_lhs(lhs)
+            for lh in numpy.asarray(self.distrib.get_weighted_sum_lhs(lhs))
         ]
         plhs = numpy.transpose(plhs)
         pprobs = self.distrib.transition_matrix.get_posterior_probs(plhs)
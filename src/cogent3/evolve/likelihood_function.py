@@ -10,6 +10,7 @@ import numpy
 
 from cogent3.core.alignment import ArrayAlignment
 from cogent3.evolve import substitution_model
+from cogent3.evolve.likelihood_tree import scaled, with_common_scale
 from cogent3.evolve.simulate import AlignmentEvolver, random_sequence
 from cogent3.maths.matrix_exponential_integration import expected_number_subs
 from cogent3.maths.matrix_logarithm import is_generator_unique
@@ -386,7 +387,8 @@ class LikelihoodFunction(ParameterController):
                 for bin in self.bin_names
             ]
             bprobs = self.get_param_value("bprobs")
-            root_lh = bprobs.dot(root_lhs)
+            root_lhs, exponents = with_common_scale(root_lhs)
+            root_lh = scaled(bprobs.dot(root_lhs), exponents)
         else:
             root_lh = self.get_param_value("lh", locus=locus)
         return root_lh
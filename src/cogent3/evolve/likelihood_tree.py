@@ -30,10 +30,116 @@ except ImportError:
     pyrex = None
 
 
+# a product of more children is rescaled in steps
+CHILDREN_PER_RESCALE = 3
+SCALE_BITS = 256
+SCALE_BASE = 2.0 ** SCALE_BITS
+LOG_SCALE_BASE = numpy.log(SCALE_BASE)
+
+
+class ScaledLikelihoods(numpy.ndarray):
+    """likelihoods multiplied by SCALE_BASE ** exponents to avoid underflow
+
+    The exponents attribute has one integer per site pattern.
+    """
+
+    def __array_finalize__(self, obj):
+        self.exponents = getattr(obj, "exponents", None)
+
+
+def scaled(likelihoods, exponents):
+    """returns likelihoods as ScaledLikelihoods, a plain array if exponents
+    is None"""
+    if exponents is None:
+        return numpy.asarray(likelihoods)
+    result = numpy.asarray(likelihoods).view(ScaledLikelihoods)
+    result.exponents = exponents
+    return result
+
+
+def get_exponents(likelihoods):
+    """returns the per pattern scale exponents of likelihoods, or None"""
+    return getattr(likelihoods, "exponents", None)
+
+
+def unscaled(likelihoods):
+    """returns [..., site pattern] likelihoods as a plain array"""
+    exponents = get_exponents(likelihoods)
+    likelihoods = numpy.asarray(likelihoods)
+    if exponents is None:
+        return likelihoods
+    return likelihoods * numpy.exp(-exponents * LOG_SCALE_BASE)
+
+
+def with_common_scale(likelihoods):
+    """returns [..., site pattern] likelihoods as plain arrays sharing exponents
+
+    Returns
+    -------
+    list of arrays, and the exponents (None if none were scaled)
+    """
+    exponents = [get_exponents(lh) for lh in likelihoods]
+    if all(e is None for e in exponents):
+        return [numpy.asarray(lh) for lh in likelihoods], None
+
+    num = likelihoods[0].shape[-1]
+    exponents = [numpy.zeros(num, int) if e is None else e for e in exponents]
+    common = numpy.min(exponents, axis=0)
+    result = [
+        numpy.asarray(lh) * numpy.exp((common - e) * LOG_SCALE_BASE)
+        for (lh, e) in zip(likelihoods, exponents)
+    ]
+    return result, common
+
+
+def _add_exponents(exponents, other):
+    if exponents is None:
+        return other
+    if other is None:
+        return exponents
+    return exponents + other
+
+
+def _site_totals(likelihoods):
+    """the sum over bins and motifs of [bin,] site, motif likelihoods"""
+    # a matrix product is much faster than a reduction along the short axis
+    totals = likelihoods.dot(numpy.ones(likelihoods.shape[-1]))
+    if totals.ndim > 1:
+        totals = totals.sum(axis=0)
+    return totals
+
+
+def _rescale(likelihoods, exponents):
+    """rescales in place the site patterns of [bin,] site, motif likelihoods
+    whose total is less than 1 / SCALE_BASE, returning updated exponents"""
+    totals = _site_totals(likelihoods)
+    if totals.min() >= 1 / SCALE_BASE:
+        return exponents
+
+    # number of SCALE_BASE multiples below 1, capped to avoid overflow
+    steps = -numpy.frexp(totals)[1] // SCALE_BITS
+    # numpy.clip is comparatively slow
+    numpy.maximum(steps, 0, out=steps)
+    numpy.minimum(steps, 3, out=steps)
+    if steps.any():
+        likelihoods *= numpy.ldexp(1.0, steps * SCALE_BITS)[..., numpy.newaxis]
+        exponents = _add_exponents(exponents, steps)
+    return exponents
+
+
+def scaled_inner(likelihoods, other):
+    """numpy.inner, retaining the scale of likelihoods"""
+    result = numpy.inner(numpy.asarray(likelihoods), other)
+    return scaled(result, get_exponents(likelihoods))
+
+
 class _LikelihoodTreeEdge(object):
-    def __init__(self, children, edge_name, alignment=None):
+    def __init__(self, children, edge_name, alignment=None, scaled=False):
         self.edge_name = edge_name
         self.alphabet = children[0].alphabet
+        # whether partial likelihoods are rescaled to avoid underflow, set
+        # once an unscaled product is too small
+        self.scaled = scaled
 
         M = children[0].shape[-1]
         for child in children:
@@ -64,7 +170,7 @@ class _LikelihoodTreeEdge(object):
                         )
                     a.append(u)
                 assignments.append(a)
-        (uniq, counts, self.index) = _indexed(list(zip(*assignments)))
+        (uniq, counts, self.index) = _indexed(numpy.transpose(assignments))
 
         # extra column for gap
         uniq.append(tuple([len(c.uniq) - 1 for c in children]))
@@ -109,10 +215,10 @@ class _LikelihoodTreeEdge(object):
         for (index, child) in self._indexed_children:
             child = child.select_columns(cols)
             children.append(child)
-        return self.__class__(children, self.edge_name)
+        return self.__class__(children, self.edge_name, scaled=self.scaled)
 
     def get_full_length_likelihoods(self, likelihoods):
-        return likelihoods[self.index]
+        return unscaled(likelihoods)[self.index]
 
     def calc_G_statistic(self, likelihoods, return_table=False):
         # A Goodness-of-fit statistic
@@ -120,7 +226,7 @@ class _LikelihoodTreeEdge(object):
 
         unambig = (self.ambig == 1.0).nonzero()[0]
         observed = self.counts[unambig].astype(int)
-        expected = likelihoods[unambig] * observed.sum()
+        expected = unscaled(likelihoods)[unambig] * observed.sum()
         # chisq = ((observed-expected)**2 / expected).sum()
         G = 2 * observed.dot(numpy.log(observed / expected))
 
@@ -145,13 +251,173 @@ class _LikelihoodTreeEdge(object):
                     return r
         return None
 
-    def make_partial_likelihoods_array(self):
-        return numpy.ones(self.shape, self.float_type)
+    def make_partial_likelihoods_array(self, num_bins=None):
+        shape = self.shape if num_bins is None else [num_bins] + self.shape
+        return numpy.ones(shape, self.float_type)
 
     def sum_input_likelihoods(self, *likelihoods):
         result = numpy.ones(self.shape, self.float_type)
-        self.sum_input_likelihoodsR(result, *likelihoods)
-        return result
+        return self.sum_input_likelihoodsR(result, *likelihoods)
+
+    def sum_input_likelihoodsR(self, result, *likelihoods):
+        return self._scaled_product(self._product, result, likelihoods)
+
+    def sum_binned_input_likelihoodsR(self, result, *likelihoods):
+        # arrays are [bin, site, motif]
+        return self._scaled_product(self._binned_product, result, likelihoods)
+
+    def _scaled_product(self, product, result, likelihoods):
+        """product of the child likelihoods, rescaled if self.scaled
+
+        The exponents of the result are those of the children plus the
+        number of times a site pattern is rescaled here. An unscaled edge
+        becomes scaled when a child is scaled or the product of unscaled
+        children is at risk of underflow."""
+        if not self.scaled:
+            if not any(get_exponents(lh) is not None for lh in likelihoods):
+                product(result, self.indexes, likelihoods)
+                if _site_totals(numpy.asarray(result)).min() >= 1 / SCALE_BASE:
+                    return result
+            self.scaled = True
+
+        # multiplying a few children at a time prevents underflow at polytomies
+        result = numpy.asarray(result)
+        exponents = None
+        for start in range(0, len(likelihoods), CHILDREN_PER_RESCALE):
+            end = start + CHILDREN_PER_RESCALE
+            indexes = self.indexes[start:end]
+            lhs = likelihoods[start:end]
+            part = result if start == 0 else numpy.empty_like(result)
+            product(part, indexes, lhs)
+            part_exponents = _rescale(part, self._child_exponents(indexes, lhs))
+            if start:
+                result *= part
+                exponents = _add_exponents(exponents, part_exponents)
+                exponents = _rescale(result, exponents)
+            else:
+                exponents = part_exponents
+        return scaled(result, exponents)
+
+    def _child_exponents(self, indexes, likelihoods):
+        """the sum of child exponents for each site pattern, or None"""
+        exponents = None
+        for (index, lh) in zip(indexes, likelihoods):
+            child_exponents = get_exponents(lh)
+            if child_exponents is not None:
+                exponents = _add_exponents(exponents, child_exponents[index])
+        return exponents
+
+    def _log_scale_correction(self, likelihoods):
+        exponents = get_exponents(likelihoods)
+        if exponents is None:
+            return 0.0
+        return -LOG_SCALE_BASE * numpy.inner(exponents, self.counts)
+
+    def traverse_edges(self, psubs, mprobs, visit):
+        """visits every edge below this root in pre-order with the conditional
+        likelihoods on either side of it
+
+        Parameters
+        ----------
+        psubs : dict
+            {edge name: P matrix} for every edge below this root
+        mprobs : array
+            motif probabilities at this root
+        visit : callable
+            visit(edge name, EdgeLikelihood) may return a new P matrix for the
+            edge, used for the rest of the traversal, or None
+
+        Returns
+        -------
+        {edge name: P matrix} as of the end of the traversal
+
+        Notes
+        -----
+        A post-order pass computes the partial likelihoods of each subtree,
+        then a pre-order pass computes the likelihood of everything outside
+        each edge. The partials of a subtree are recomputed once it has been
+        visited, so replacing the P matrix of an edge does not invalidate the
+        conditional likelihoods of the edges visited after it. All arrays are
+        indexed by the site patterns of this root and normalised per site.
+        """
+        psubs = dict(psubs)
+        partials = {}
+
+        def normalised(likelihoods, log_scale):
+            top = likelihoods.max(axis=-1)
+            top = numpy.where(top > 0, top, 1.0)
+            return (likelihoods / top[:, None], log_scale + numpy.log(top))
+
+        def up(child):
+            (likelihoods, log_scale) = partials[child.edge_name]
+            return (likelihoods.dot(psubs[child.edge_name].T), log_scale)
+
+        def product(children, likelihoods, log_scale):
+            for child in children:
+                (child_up, child_scale) = up(child)
+                likelihoods = likelihoods * child_up
+                log_scale = log_scale + child_scale
+            return normalised(likelihoods, log_scale)
+
+        ones = numpy.ones(self.shape, self.float_type)
+        zeros = numpy.zeros(len(self.counts), self.float_type)
+
+        def post_order(edge, patterns):
+            if isinstance(edge, LikelihoodTreeLeaf):
+                likelihoods = numpy.asarray(edge.input_likelihoods)[patterns]
+                partials[edge.edge_name] = (likelihoods, zeros)
+                return
+            for (index, child) in edge._indexed_children:
+                post_order(child, index[patterns])
+            children = [child for (_, child) in edge._indexed_children]
+            partials[edge.edge_name] = product(children, ones, zeros)
+
+        def pre_order(edge, outside, outside_scale):
+            children = [child for (_, child) in edge._indexed_children]
+            for child in children:
+                # the likelihood of everything but this child's subtree
+                siblings = [c for c in children if c is not child]
+                (top, top_scale) = product(siblings, outside, outside_scale)
+                (inside, inside_scale) = partials[child.edge_name]
+                psub = visit(
+                    child.edge_name,
+                    EdgeLikelihood(self.counts, top, inside, top_scale + inside_scale),
+                )
+                if psub is not None:
+                    psubs[child.edge_name] = psub
+                if not isinstance(child, LikelihoodTreeLeaf):
+                    (down, down_scale) = normalised(
+                        top.dot(psubs[child.edge_name]), top_scale
+                    )
+                    pre_order(child, down, down_scale)
+            partials[edge.edge_name] = product(children, ones, zeros)
+
+        post_order(self, numpy.arange(len(self.counts)))
+        pre_order(self, ones * mprobs, zeros)
+        return psubs
+
+    def get_log_likelihood_gradient(self, psubs, dpsubs, mprobs):
+        """returns {key: derivative of the total log-likelihood}
+
+        Parameters
+        ----------
+        psubs : dict
+            {edge name: P matrix} for every edge below this root
+        dpsubs : dict
+            {edge name: [(key, dP), ...]}, dP the derivative of the edge's P
+            with respect to the parameter identified by key
+        mprobs : array
+            motif probabilities at this root
+        """
+        gradient = {}
+
+        def visit(name, edge_lnL):
+            for (key, dP) in dpsubs.get(name, []):
+                value = edge_lnL.derivative(psubs[name], dP)
+                gradient[key] = gradient.get(key, 0.0) + value
+
+        self.traverse_edges(psubs, mprobs, visit)
+        return gradient
 
     def as_leaf(self, likelihoods):
         assert len(likelihoods) == len(self.counts)
@@ -176,12 +442,15 @@ class _PyLikelihoodTreeEdge(_LikelihoodTreeEdge):
     BASE = 2.0 ** 100
     LOG_BASE = numpy.log(BASE)
 
-    def sum_input_likelihoodsR(self, result, *likelihoods):
+    def _product(self, result, indexes, likelihoods):
+        # site axis is second last, so also works with bins
         result[:] = 1.0
-        for (i, index) in enumerate(self.indexes):
-            result *= numpy.take(likelihoods[i], index, 0)
+        for (index, lh) in zip(indexes, likelihoods):
+            result *= numpy.take(lh, index, -2)
         return result
 
+    _binned_product = _product
+
     # For root
 
     def log_dot_reduce(self, patch_probs, switch_probs, plhs):
@@ -192,34 +461,82 @@ class _PyLikelihoodTreeEdge(_LikelihoodTreeEdge):
             while max(state_probs) < 1.0:
                 state_probs *= self.BASE
                 exponent -= 1
-        return numpy.log(sum(state_probs)) + exponent * self.LOG_BASE
+        result = numpy.log(sum(state_probs)) + exponent * self.LOG_BASE
+        return result + self._log_scale_correction(plhs)
 
     def get_total_log_likelihood(self, input_likelihoods, mprobs):
-        lhs = numpy.inner(input_likelihoods, mprobs)
+        lhs = scaled_inner(input_likelihoods, mprobs)
         return self.get_log_sum_across_sites(lhs)
 
     def get_log_sum_across_sites(self, lhs):
-        return numpy.inner(numpy.log(lhs), self.counts)
+        result = numpy.inner(numpy.log(numpy.asarray(lhs)), self.counts)
+        return result + self._log_scale_correction(lhs)
 
 
 class _PyxLikelihoodTreeEdge(_LikelihoodTreeEdge):
     integer_type = numerictypes(int)  # match checkArrayInt1D
     float_type = numerictypes(float)  # match checkArrayDouble1D/2D
 
-    def sum_input_likelihoodsR(self, result, *likelihoods):
-        pyrex.sum_input_likelihoods(self.indexes, result, likelihoods)
+    def _product(self, result, indexes, likelihoods):
+        pyrex.sum_input_likelihoods(indexes, result, likelihoods)
+        return result
+
+    def _binned_product(self, result, indexes, likelihoods):
+        # arrays are [bin, site, motif], each bin is contiguous
+        for b in range(result.shape[0]):
+            lhs = [lh[b] for lh in likelihoods]
+            pyrex.sum_input_likelihoods(indexes, result[b], lhs)
         return result
 
     # For root
 
     def log_dot_reduce(self, patch_probs, switch_probs, plhs):
-        return pyrex.log_dot_reduce(self.index, patch_probs, switch_probs, plhs)
+        result = pyrex.log_dot_reduce(self.index, patch_probs, switch_probs, plhs)
+        return result + self._log_scale_correction(plhs)
 
     def get_total_log_likelihood(self, input_likelihoods, mprobs):
-        return pyrex.get_total_log_likelihood(self.counts, input_likelihoods, mprobs)
+        result = pyrex.get_total_log_likelihood(self.counts, input_likelihoods, mprobs)
+        return result + self._log_scale_correction(input_likelihoods)
 
     def get_log_sum_across_sites(self, lhs):
-        return pyrex.get_log_sum_across_sites(self.counts, lhs)
+        result = pyrex.get_log_sum_across_sites(self.counts, lhs)
+        return result + self._log_scale_correction(lhs)
+
+
+class EdgeLikelihood(object):
+    """The total log-likelihood as a function of the P matrix of one edge,
+    all other edges held constant.
+
+    Parameters
+    ----------
+    counts : array
+        site pattern counts
+    outside : array
+        likelihoods of everything outside the edge's subtree
+    inside : array
+        partial likelihoods of the edge's subtree
+    log_scale : array
+        per site pattern log of the factors removed from outside and inside
+    """
+
+    def __init__(self, counts, outside, inside, log_scale):
+        self.counts = counts
+        self.outside = outside
+        self.inside = inside
+        self.log_scale = counts.dot(log_scale)
+
+    def _site_likelihoods(self, psub):
+        return (self.outside * self.inside.dot(psub.T)).sum(axis=-1)
+
+    def __call__(self, psub):
+        site_lhs = self._site_likelihoods(psub)
+        return self.counts.dot(numpy.log(site_lhs)) + self.log_scale
+
+    def derivative(self, psub, dpsub):
+        """the derivative of the log-likelihood at psub, dpsub being the
+        derivative of psub with respect to some parameter"""
+        derivs = self._site_likelihoods(dpsub)
+        return self.counts.dot(derivs / self._site_likelihoods(psub))
 
 
 if pyrex is None:
@@ -227,28 +544,74 @@ if pyrex is None:
 else:
     LikelihoodTreeEdge = _PyxLikelihoodTreeEdge
 
+
+def set_num_threads(num_threads):
+    """sets the number of threads the compiled likelihood kernels split site
+    patterns across
+
+    Has no effect if the kernels are unavailable or were compiled without
+    OpenMP."""
+    if pyrex is not None and hasattr(pyrex, "set_num_threads"):
+        pyrex.set_num_threads(num_threads)
+
+
+def get_num_threads():
+    """the number of threads used by the compiled likelihood kernels"""
+    if pyrex is not None and hasattr(pyrex, "get_num_threads"):
+        return pyrex.get_num_threads()
+    return 1
+
+
 FLOAT_TYPE = LikelihoodTreeEdge.float_type
 INTEGER_TYPE = LikelihoodTreeEdge.integer_type
 
 
+def _packed_rows(values):
+    """returns a 1D array with one key per row of the 2D integer array values,
+    equal keys for equal rows"""
+    values = numpy.ascontiguousarray(values)
+    sizes = values.max(axis=0).astype(float) + 1
+    if (values >= 0).all() and numpy.prod(sizes) < 2 ** 62:
+        # mixed radix packing into a single integer
+        radix = numpy.ones(values.shape[1], numpy.int64)
+        radix[:-1] = numpy.cumprod(sizes[::-1].astype(numpy.int64))[::-1][1:]
+        return values.astype(numpy.int64).dot(radix)
+    row_type = numpy.dtype((numpy.void, values.dtype.itemsize * values.shape[1]))
+    return values.view(row_type).ravel()
+
+
 def _indexed(values):
     # >>> _indexed(['a', 'b', 'c', 'a', 'a'])
     # (['a', 'b', 'c'], [3, 1, 1], [0, 1, 2, 0, 0])
-    index = numpy.zeros([len(values)], INTEGER_TYPE)
-    unique = []
-    counts = []
-    seen = {}
-    for (c, key) in enumerate(values):
-        if key in seen:
-            i = seen[key]
-            counts[i] += 1
-        else:
-            i = len(unique)
-            unique.append(key)
-            counts.append(1)
-            seen[key] = i
-        index[c] = i
-    return unique, counts, index
+    # values are strings, or equal length tuples of integers
+    if isinstance(values, str):
+        values = numpy.array([values] if values else [], "U").view("U1")
+    elif not isinstance(values, numpy.ndarray):
+        values = numpy.array(list(values))
+    if len(values) == 0:
+        return [], [], numpy.zeros([0], INTEGER_TYPE)
+
+    if values.ndim == 2:
+        keys = _packed_rows(values)
+    elif values.dtype.kind == "U":
+        # the characters of each string as integers
+        chars = values.view(numpy.uint32).reshape(len(values), -1)
+        keys = chars[:, 0] if chars.shape[1] == 1 else _packed_rows(chars)
+    else:
+        keys = values
+
+    (first, inverse, counts) = numpy.unique(
+        keys, return_index=True, return_inverse=True, return_counts=True
+    )[1:]
+    # numbered in order of first occurrence
+    order = numpy.argsort(first)
+    rank = numpy.empty(len(order), INTEGER_TYPE)
+    rank[order] = numpy.arange(len(order))
+    index = rank[inverse.ravel()]
+    unique = values[first[order]].tolist()
+    if values.ndim == 2:
+        unique = [tuple(u) for u in unique]
+    return unique, counts[order].tolist(), index
 
 
 def make_likelihood_tree_leaf(sequence, alphabet=None, seq_name=None):
@@ -282,6 +645,35 @@ def make_likelihood_tree_leaf(sequence, alphabet=None, seq_name=None):
     )
 
 
+def make_likelihood_tree_leaves(alignment, alphabet, recode_gaps=False, moltype=None):
+    """returns {sequence name: LikelihoodTreeLeaf} for the sequences of alignment
+
+    The leaves are cached on the alignment, keyed by the alphabet, moltype,
+    motif length and sequence order, so fitting several models to one
+    alignment compresses its site patterns once.
+    """
+    key = (
+        alphabet,
+        getattr(alphabet, "moltype", None),
+        alphabet.get_motif_len(),
+        recode_gaps,
+        moltype,
+        tuple(alignment.names),
+    )
+    try:
+        cache = alignment._likelihood_leaves
+    except AttributeError:
+        cache = alignment._likelihood_leaves = {}
+
+    if key not in cache:
+        leaves = {}
+        for seq_name in alignment.names:
+            sequence = alignment.get_gapped_seq(seq_name, recode_gaps, moltype=moltype)
+            leaves[seq_name] = make_likelihood_tree_leaf(sequence, alphabet, seq_name)
+        cache[key] = leaves
+    return dict(cache[key])
+
+
 class LikelihoodTreeLeaf(object):
     def __init__(self, uniq, likelihoods, counts, index, edge_name, alphabet, sequence):
         if sequence is not None:
@@ -4,7 +4,7 @@ import warnings
 
 import numpy
 
-from cogent3.evolve.likelihood_tree import make_likelihood_tree_leaf
+from cogent3.evolve.likelihood_tree import make_likelihood_tree_leaves
 
 from . import substitution_calculation
 
@@ -64,11 +64,11 @@ class MotifProbModel(object):
         except AttributeError:
             mtype = self.monomer_alphabet.moltype
 
+        leaves = make_likelihood_tree_leaves(
+            alignment, self.get_counted_alphabet(), recode_gaps, mtype
+        )
         for seq_name in alignment.names:
-            sequence = alignment.get_gapped_seq(seq_name, recode_gaps, moltype=mtype)
-            leaf = make_likelihood_tree_leaf(
-                sequence, self.get_counted_alphabet(), seq_name
-            )
+            leaf = leaves[seq_name]
             count = leaf.get_motif_counts(include_ambiguity=include_ambiguity)
             if result is None:
                 result = count.copy()
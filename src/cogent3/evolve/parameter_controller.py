@@ -5,6 +5,7 @@ parameters involved in a maximum-likelihood based tree analysis.
 """
 
 
+import os
 import pickle
 import warnings
 
@@ -15,7 +16,10 @@ from cogent3.align.pairwise import AlignableSeq
 from cogent3.core.tree import TreeError
 from cogent3.evolve import likelihood_calculation
 from cogent3.evolve.likelihood_function import LikelihoodFunction as _LF
+from cogent3.evolve.substitution_calculation import BatchedPsubsDefn, LengthDefn
+from cogent3.maths.scipy_optimisers import bound_brent
 from cogent3.maths.stats.information_criteria import aic, bic
+from cogent3.recalculation.calculation import OptPar
 from cogent3.recalculation.scope import _indexed
 from cogent3.util.misc import adjusted_gt_minprob
 from cogent3.util.warning import deprecated, discontinued
@@ -201,7 +205,30 @@ class _LikelihoodParameterController(_LF):
         assert expm in ["pade", "either", "eigen", "checked"], expm
         self.set_param_rule("expm", is_constant=True, value=expm)
 
+    def set_partitioned_evaluation(self, num_threads=None):
+        """evaluate the likelihood of each locus concurrently
+
+        Parameters
+        ----------
+        num_threads : int
+            size of the thread pool used by calculators, defaults to the
+            number of CPUs. 1 restores serial evaluation.
+
+        Notes
+        -----
+        Only values specific to one locus are calculated concurrently, values
+        shared by loci are computed first and the locus log-likelihoods are
+        summed afterwards.
+        """
+        if num_threads is None:
+            num_threads = os.cpu_count() or 1
+        self._partition_threads = num_threads
+
     def make_calculator(self, **kw):
+        threads = getattr(self, "_partition_threads", None)
+        if threads and threads > 1 and len(self.locus_names) > 1:
+            kw.setdefault("partition_dimension", "locus")
+            kw.setdefault("threads", threads)
         return super(_LF, self).make_calculator(**kw)
 
     def _process_scope_info(
@@ -489,7 +516,195 @@ class AlignmentLikelihoodFunction(_LikelihoodParameterController):
         except KeyError:
             pass
 
-    def make_likelihood_defn(self, sites_independent=True, discrete_edges=None):
+    def make_calculator(self, **kw):
+        kw.setdefault("gradient", self._analytic_gradient)
+        return super(AlignmentLikelihoodFunction, self).make_calculator(**kw)
+
+    def _get_edge_psubs(self, calc):
+        """returns (root, mprobs, edges) from the current values of calc, edges
+        being {edge name: (P, exponentiator, Qd number, length cell, length)}
+
+        None unless there is a single locus and bin, and the psubs are the
+        exponentiated rate matrix times branch length."""
+        psubs = self.defn_for.get("psubs")
+        lh = self.defn_for.get("lh")
+        if (
+            len(self.locus_names) > 1
+            or len(self.bin_names) > 1
+            or not isinstance(psubs, BatchedPsubsDefn)
+            or not isinstance(psubs.args[1], LengthDefn)
+            or lh is None
+        ):
+            return None
+
+        values = calc.get_current_cell_values_for_defn
+        fixed_motifs = self.defn_for.get("fixed_motif")
+        if fixed_motifs is not None and any(
+            v not in (None, -1) for v in values(fixed_motifs)
+        ):
+            return None
+
+        (qd_defn, length_defn) = psubs.args
+        exponentiators = values(qd_defn)
+        psub_values = values(psubs)
+        length_cells = calc.results_by_id[id(length_defn)]
+        lengths = values(length_defn)
+        edges = {}
+        for edge in self.tree.get_edge_vector(include_root=False):
+            posn = psubs._getPosnForScope(edge=edge.name)
+            (qd_num, length_num) = psubs.uniq[posn]
+            edges[edge.name] = (
+                psub_values[posn],
+                exponentiators[qd_num],
+                qd_num,
+                length_cells[length_num],
+                lengths[length_num],
+            )
+
+        root = values(self.defn_for["lht"])[0]
+        mprobs = values(lh.args[-1])[0]
+        return (root, mprobs, edges)
+
+    def _analytic_gradient(self, calc):
+        """returns {opt_par rank: derivative of lnL} for the branch lengths and
+        substitution model rate parameters of calc
+
+        Empty unless there is a single locus and bin, and the psubs are the
+        exponentiated rate matrix times branch length. Other parameters are
+        differentiated numerically by the calculator."""
+        edge_psubs = self._get_edge_psubs(calc)
+        if edge_psubs is None:
+            return {}
+
+        (root, mprobs, edges) = edge_psubs
+        values = calc.get_current_cell_values_for_defn
+        qd_defn = self.defn_for["psubs"].args[0]
+        q_defn = qd_defn.args[-1]
+        if not hasattr(q_defn, "calc"):
+            return {}
+
+        # derivatives of each distinct Q with respect to its optimised inputs
+        q_values = values(q_defn)
+        dQs = []
+        for (Q, input_nums) in zip(q_values, q_defn.uniq):
+            args = [values(arg)[u] for (arg, u) in zip(q_defn.args, input_nums)]
+            cells = [
+                calc.results_by_id[id(arg)][u]
+                for (arg, u) in zip(q_defn.args, input_nums)
+            ]
+            dQ = []
+            for (j, cell) in enumerate(cells):
+                if not isinstance(cell, OptPar):
+                    continue
+                # central difference, one sided at a bound
+                delta = 1e-6 * max(1.0, abs(args[j]))
+                x_upper = min(args[j] + delta, cell.upper)
+                x_lower = max(args[j] - delta, cell.lower)
+                if x_upper <= x_lower:
+                    continue
+                shifted = list(args)
+                shifted[j] = x_upper
+                upper = q_defn.calc(*shifted)
+                shifted[j] = x_lower
+                lower = q_defn.calc(*shifted)
+                dQ.append((cell.rank, (upper - lower) / (x_upper - x_lower)))
+            dQs.append(dQ)
+
+        if not all(hasattr(exp, "derivative") for (_, exp, _, _, _) in edges.values()):
+            # only the branch lengths
+            dQs = [[] for dQ in dQs]
+
+        P = {}
+        dP = {}
+        for (name, (psub, exp, qd_num, length_cell, length)) in edges.items():
+            P[name] = psub
+            derivs = []
+            if isinstance(length_cell, OptPar):
+                derivs.append((length_cell.rank, exp.Q.dot(psub)))
+            q_num = qd_defn.uniq[qd_num][-1]
+            for (rank, dQ) in dQs[q_num]:
+                derivs.append((rank, exp.derivative(dQ, length)))
+            dP[name] = derivs
+
+        return root.get_log_likelihood_gradient(P, dP, mprobs)
+
+    def optimise_branch_lengths(self, max_rounds=10, tolerance=1e-6):
+        """optimises each branch length in turn, all other parameters held
+        constant
+
+        Parameters
+        ----------
+        max_rounds : int
+            maximum number of passes over the edges
+        tolerance : float
+            stops when a pass improves lnL by less than this
+
+        Returns
+        -------
+        True if the lengths were optimised, False if this likelihood function
+        is not supported (multiple loci or bins, or psubs that are not the
+        exponentiated rate matrix times branch length)
+
+        Notes
+        -----
+        Conditional likelihoods on either side of an edge are computed once,
+        so each evaluation during its line search costs O(patterns * motifs^2)
+        rather than a recalculation of the path to the root.
+        """
+        calc = self.make_calculator()
+        try:
+            return self._optimise_branch_lengths(calc, max_rounds, tolerance)
+        finally:
+            self.update_from_calculator(calc)
+
+    def _optimise_branch_lengths(self, calc, max_rounds, tolerance):
+        edge_psubs = self._get_edge_psubs(calc)
+        if edge_psubs is None:
+            return False
+
+        # only edges with a length of their own
+        ranks = [
+            cell.rank
+            for (_, _, _, cell, _) in edge_psubs[2].values()
+            if isinstance(cell, OptPar)
+        ]
+
+        lnL = calc.testfunction()
+        for _ in range(max_rounds):
+            (root, mprobs, edges) = self._get_edge_psubs(calc)
+            changes = {}
+
+            def visit(name, edge_lnL):
+                (psub, exp, _, cell, length) = edges[name]
+                if not isinstance(cell, OptPar) or ranks.count(cell.rank) > 1:
+                    return None
+
+                def nlnL(delta):
+                    t = length + delta
+                    if not cell.lower <= t <= cell.upper:
+                        return numpy.inf
+                    return -edge_lnL(exp(t))
+
+                (delta, fval, _, _) = bound_brent(
+                    nlnL, tol=tolerance, full_output=True
+                )
+                if fval >= nlnL(0.0):
+                    return None
+                changes[cell.rank] = cell.transform_to_optimiser(length + delta)
+                return exp(length + delta)
+
+            psubs = {name: value[0] for (name, value) in edges.items()}
+            root.traverse_edges(psubs, mprobs, visit)
+            start = lnL
+            if changes:
+                lnL = calc.change(list(changes.items()))
+            if lnL - start < tolerance:
+                break
+        return True
+
+    def make_likelihood_defn(
+        self, sites_independent=True, discrete_edges=None, fused_bins=True
+    ):
         defns = self.model.make_param_controller_defns(bin_names=self.bin_names)
         if discrete_edges is not None:
             from .discrete_markov import PartialyDiscretePsubsDefn
@@ -506,6 +721,7 @@ class AlignmentLikelihoodFunction(_LikelihoodParameterController):
             self.bin_names,
             self.locus_names,
             sites_independent,
+            fused_bins=fused_bins,
         )
 
     def set_alignment(self, aligns, motif_pseudocount=None):
@@ -4,11 +4,13 @@ import warnings
 import numpy
 
 from cogent3.maths.matrix_exponentiation import (
+    CachedExponentiator,
     CheckedExponentiator,
     FastExponentiator,
     LinAlgError,
     PadeExponentiator,
 )
+from cogent3.recalculation.calculation import BatchedCell
 from cogent3.recalculation.definition import (
     CalcDefn,
     CalculationDefn,
@@ -73,6 +75,11 @@ class _EigenPade:
         self.eigen = eigen
         self.given_expm_warning = False
 
+    @property
+    def cache_key(self):
+        # instances with the same eigen exponentiator give the same results
+        return (self.__class__, self.eigen)
+
     def __call__(self, Q):
         try:
             return self.eigen(Q)
@@ -99,7 +106,36 @@ class ExpDefn(CalculationDefn):
 
         eigen = CheckedExponentiator if check_eigen else FastExponentiator
 
-        if not allow_pade:
-            return eigen
-        else:
-            return _EigenPade(eigen=eigen)
+        if allow_pade:
+            # the result of the Pade fallback is cached too
+            eigen = _EigenPade(eigen=eigen)
+        return CachedExponentiator(eigen)
+
+
+def _batched_psubs(exponentiator, *distances):
+    if hasattr(exponentiator, "batch"):
+        return exponentiator.batch(distances)
+    return [exponentiator(distance) for distance in distances]
+
+
+class BatchedPsubsDefn(CallDefn):
+    """P = Qd(distance), with the P matrices of edges that share an
+    exponentiator computed together when they change together
+
+    Each edge has its own cell, so changing one branch length only recomputes
+    that edge's P matrix. When the exponentiator, or several distances using
+    it, change the calculator computes their stacked P matrices at once."""
+
+    name = "psubs"
+
+    def make_cell(self, *args):
+        calc = self.make_calc_function()
+        cell = BatchedCell(
+            self.name,
+            calc,
+            args,
+            _batched_psubs,
+            recycling=self.recycling,
+            default=self.default,
+        )
+        return cell
@@ -43,9 +43,13 @@ from numpy.linalg import svd
 from cogent3.core import moltype
 from cogent3.evolve import motif_prob_model, parameter_controller, predicate
 from cogent3.evolve.discrete_markov import PsubMatrixDefn
-from cogent3.evolve.likelihood_tree import make_likelihood_tree_leaf
+from cogent3.evolve.likelihood_tree import (
+    make_likelihood_tree_leaf,
+    make_likelihood_tree_leaves,
+)
 from cogent3.evolve.substitution_calculation import (
     AlignmentAdaptDefn,
+    BatchedPsubsDefn,
     CalcDefn,
     CallDefn,
     ConstDefn,
@@ -355,11 +359,9 @@ class _SubstitutionModel(object):
 
     def convert_alignment(self, alignment):
         # this is to support for everything but HMM
-        result = {}
-        for seq_name in alignment.names:
-            sequence = alignment.get_gapped_seq(seq_name, self.recode_gaps)
-            result[seq_name] = self.convert_sequence(sequence, seq_name)
-        return result
+        return make_likelihood_tree_leaves(
+            alignment, self.get_alphabet(), self.recode_gaps
+        )
 
     def convert_sequence(self, sequence, name):
         # make_likelihood_tree_leaf, sort of an indexed profile where duplicate
@@ -653,7 +655,7 @@ class _ContinuousSubstitutionModel(_SubstitutionModel):
         self, word_probs, mprobs_matrix, distance, rate_params
     ):
         Qd = self.make_Qd_defn(word_probs, mprobs_matrix, rate_params)
-        P = CallDefn(Qd, distance, name="psubs")
+        P = BatchedPsubsDefn(Qd, distance)
         return P
 
 
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""A limited memory BFGS minimiser for box constrained problems.
+
+Bounds are handled by projecting onto the box: parameters held at a bound
+by the gradient are fixed for an iteration and the line search is along
+the projected path.
+"""
+import numpy
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Alpha"
+
+
+def _project(x, lower, upper):
+    return numpy.minimum(numpy.maximum(x, lower), upper)
+
+
+def _inverse_hessian_product(g, s_list, y_list):
+    # the L-BFGS two loop recursion
+    q = g.copy()
+    alphas = []
+    for (s, y) in zip(s_list[::-1], y_list[::-1]):
+        rho = 1.0 / y.dot(s)
+        alpha = rho * s.dot(q)
+        q -= alpha * y
+        alphas.append((rho, alpha))
+
+    if s_list:
+        q *= s_list[-1].dot(y_list[-1]) / y_list[-1].dot(y_list[-1])
+
+    for ((s, y), (rho, alpha)) in zip(zip(s_list, y_list), alphas[::-1]):
+        beta = rho * y.dot(q)
+        q += (alpha - beta) * s
+    return q
+
+
+def fmin_lbfgsb(
+    func,
+    fprime,
+    x0,
+    lower=None,
+    upper=None,
+    m=10,
+    ftol=1e-6,
+    gtol=1e-5,
+    maxiter=None,
+    callback=None,
+):
+    """minimise func within bounds using its gradient
+
+    Parameters
+    ----------
+    func : callable
+        func(x) returns the value to be minimised, +inf if x is invalid
+    fprime : callable
+        fprime(x) returns the gradient of func at x
+    x0 : array
+        initial guess
+    lower, upper : array
+        bounds on x, None for unbounded
+    m : int
+        number of corrections retained for the inverse Hessian approximation
+    ftol : float
+        stops when the relative reduction of func is <= ftol for two
+        successive iterations
+    gtol : float
+        stops when the largest projected gradient component is <= gtol
+    maxiter : int
+        maximum number of iterations, defaults to 200 * len(x0)
+    callback : callable
+        called after each iteration as callback(fcalls, x, fval, delta)
+
+    Returns
+    -------
+    (xopt, fopt, iterations, func_calls, warnflag), warnflag being 1 if
+    maxiter was reached and 2 if the line search failed
+    """
+    x0 = numpy.asarray(x0, float)
+    lower = numpy.full(x0.shape, -numpy.inf) if lower is None else lower
+    upper = numpy.full(x0.shape, numpy.inf) if upper is None else upper
+    lower = numpy.asarray(lower, float)
+    upper = numpy.asarray(upper, float)
+    if maxiter is None:
+        maxiter = 200 * len(x0)
+
+    x = _project(x0, lower, upper)
+    fval = func(x)
+    g = numpy.asarray(fprime(x), float)
+    fcalls = 1
+    s_list = []
+    y_list = []
+    warnflag = 1
+    iteration = 0
+    small_steps = 0
+    while iteration < maxiter:
+        iteration += 1
+        projected = x - _project(x - g, lower, upper)
+        if numpy.abs(projected).max() <= gtol:
+            warnflag = 0
+            break
+
+        # parameters the gradient pushes against a bound stay there
+        fixed = ((x <= lower) & (g > 0)) | ((x >= upper) & (g < 0))
+        free_g = numpy.where(fixed, 0.0, g)
+        direction = -_inverse_hessian_product(free_g, s_list, y_list)
+        direction[fixed] = 0.0
+        if direction.dot(g) >= 0:
+            # not a descent direction, so discard the curvature history
+            s_list = []
+            y_list = []
+            direction = -free_g
+
+        if s_list:
+            step = 1.0
+        else:
+            step = min(1.0, 1.0 / numpy.abs(direction).max())
+
+        # backtracking Armijo search along the projected path
+        while True:
+            x_new = _project(x + step * direction, lower, upper)
+            if numpy.array_equal(x_new, x):
+                warnflag = 2
+                break
+            f_new = func(x_new)
+            fcalls += 1
+            if f_new <= fval + 1e-4 * g.dot(x_new - x):
+                break
+            step *= 0.5
+
+        if warnflag == 2:
+            break
+
+        g_new = numpy.asarray(fprime(x_new), float)
+        s = x_new - x
+        y = g_new - g
+        if s.dot(y) > 1e-10 * y.dot(y):
+            s_list.append(s)
+            y_list.append(y)
+            if len(s_list) > m:
+                del s_list[0]
+                del y_list[0]
+
+        delta = fval - f_new
+        (x, fval, g) = (x_new, f_new, g_new)
+        if callback is not None:
+            callback(fcalls, x, fval, delta)
+
+        # a single small reduction can be a poor step, so require two
+        if delta <= ftol * max(abs(fval), abs(fval + delta), 1.0):
+            small_steps += 1
+            if small_steps == 2:
+                warnflag = 0
+                break
+        else:
+            small_steps = 0
+
+    return (x, fval, iteration, fcalls, warnflag)
@@ -10,8 +10,11 @@
 # Pade       instant        slow
 # Taylor     instant        very slow
 
+import threading
 import warnings
 
+from collections import OrderedDict
+
 import numpy
 
 from numpy.linalg import LinAlgError, eig, inv, solve
@@ -36,6 +39,10 @@ class _Exponentiator(object):
     def __repr__(self):
         return "%s(%s)" % (self.__class__.__name__, repr(self.Q))
 
+    def batch(self, ts):
+        """returns the stacked P matrices for each of ts"""
+        return numpy.array([self(t) for t in ts])
+
 
 class EigenExponentiator(_Exponentiator):
     """A matrix ready for fast exponentiation.  P=exp(Q*t)"""
@@ -57,6 +64,37 @@ class EigenExponentiator(_Exponentiator):
         result = numpy.maximum(result, 0.0)
         return result
 
+    def batch(self, ts):
+        """returns the stacked P matrices for each of ts from a single
+        vectorised product"""
+        exp_roots = numpy.exp(numpy.multiply.outer(numpy.asarray(ts), self.roots))
+        # equivalent to inner(evT * exp_roots[i], evI) for every i
+        result = numpy.matmul(self.evT * exp_roots[:, None, :], self.evI.T)
+        if result.dtype.kind == "c":
+            result = numpy.asarray(result.real)
+        result = numpy.maximum(result, 0.0)
+        return result
+
+    def derivative(self, dQ, t):
+        """returns the derivative of P=exp(Q*t) given dQ, the derivative of Q
+        with respect to the same parameter"""
+        # in the eigen basis the derivative is elementwise scaled by the
+        # divided differences of exp(roots*t)
+        exp_roots = numpy.exp(t * self.roots)
+        diffs = numpy.subtract.outer(self.roots, self.roots)
+        close = numpy.abs(diffs) < 1e-8
+        numerator = numpy.subtract.outer(exp_roots, exp_roots)
+        scale = numpy.where(
+            close, t * exp_roots[:, None], numerator / numpy.where(close, 1, diffs)
+        )
+        # P = evT diag(exp_roots) evI.T
+        inverse = self.evI.T
+        projected = inverse.dot(dQ).dot(self.evT)
+        result = self.evT.dot(projected * scale).dot(inverse)
+        if result.dtype.kind == "c":
+            result = numpy.asarray(result.real)
+        return result
+
 
 def SemiSymmetricExponentiator(motif_probs, Q):
     """Like EigenExponentiator, but more numerically stable and
@@ -170,3 +208,94 @@ def CheckedExponentiator(Q):
 
 def RobustExponentiator(Q):
     return PadeExponentiator(Q)
+
+
+class ExponentiatorCache:
+    """a bounded least recently used cache of exponentiators, keyed by the
+    exponentiator factory and the bytes of Q
+
+    The same Q is frequently re-decomposed, for instance when refitting a
+    model or when several calculators share rate parameters. Access is
+    locked, as calculators may evaluate partitions in separate threads."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __getstate__(self):
+        # exponentiators are not worth transferring, nor can the lock be
+        return dict(maxsize=self.maxsize)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get(self, factory, Q):
+        """returns (exponentiator, whether it was cached)"""
+        Q = numpy.asarray(Q)
+        # equivalent factory instances can define a common cache_key
+        factory_key = getattr(factory, "cache_key", factory)
+        key = (factory_key, Q.shape, Q.dtype.char, Q.tobytes())
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result, True
+            self.misses += 1
+
+        # a copy, as Q may later be modified in place. The lock is not held
+        # while decomposing, so threads may duplicate work for the same Q
+        result = factory(Q.copy())
+        if self.maxsize:
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return result, False
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+
+# shared by all calculators
+EXPONENTIATOR_CACHE = ExponentiatorCache()
+
+
+class CachedExponentiator:
+    """an exponentiator factory that uses an ExponentiatorCache, keeping its
+    own hit and miss counts"""
+
+    def __init__(self, factory, cache=None):
+        self.factory = factory
+        self.cache = EXPONENTIATOR_CACHE if cache is None else cache
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.factory)
+
+    def __getstate__(self):
+        # the shared cache is restored as the unpickling process's own
+        cache = None if self.cache is EXPONENTIATOR_CACHE else self.cache
+        return dict(factory=self.factory, cache=cache)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __call__(self, Q):
+        result, hit = self.cache.get(self.factory, Q)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return result
@@ -10,7 +10,7 @@ import numpy
 
 from cogent3.util import progress_display as UI
 
-from .scipy_optimisers import Powell
+from .scipy_optimisers import LBFGSB, Powell
 from .simannealingoptimiser import SimulatedAnnealing
 
 
@@ -140,18 +140,27 @@ def maximise(
     global_tolerance=1e-1,
     ui=None,
     return_eval_count=False,
+    method="Powell",
+    gradient=None,
     **kw,
 ):
     """Find input values that optimise this function.
     'local' controls the choice of optimiser, the default being to run
     both the global and local optimisers. 'filename' and 'interval'
-    control checkpointing.  Unknown keyword arguments get passed on to
+    control checkpointing. 'method' is the local optimiser, either
+    'Powell' or 'L-BFGS-B', the latter requiring 'gradient', a function
+    returning the gradient of f.  Unknown keyword arguments get passed on to
     the global optimiser.
     """
     do_global = (not local) or local is None
     do_local = local or local is None
 
     assert limit_action in ["ignore", "warn", "raise", "error"]
+    method = method.upper()
+    if method not in ("POWELL", "L-BFGS-B"):
+        raise ValueError("unknown local optimiser %r" % method)
+    if method == "L-BFGS-B" and gradient is None:
+        raise ValueError("L-BFGS-B requires a gradient function")
     (get_best, f) = limited_use(f, max_evaluations)
 
     x = numpy.array(xinit, float)
@@ -159,6 +168,7 @@ def maximise(
     if not multidimensional_input:
         x = numpy.atleast_1d(x)
 
+    box = bounds
     if bounds is not None:
         (upper, lower) = bounds
         if upper is not None or lower is not None:
@@ -208,7 +218,10 @@ def maximise(
         if do_local:
             callback = unsteadyProgressIndicator(ui.display, "Local", gend, 1.0)
             # ui.display('local opt', 1.0-per_opt, per_opt)
-            opt = LocalOptimiser()
+            if method == "L-BFGS-B":
+                opt = LBFGSB(gradient, bounds=box)
+            else:
+                opt = LocalOptimiser()
             x = opt.maximise(
                 f,
                 x,
@@ -3,6 +3,7 @@ import math
 
 import numpy
 
+from cogent3.maths.lbfgsb import fmin_lbfgsb
 from cogent3.maths.scipy_optimize import brent, fmin_powell
 
 
@@ -112,4 +113,41 @@ class Powell(_SciPyOptimiser):
         return (xopt, fval, iterations, func_calls, warnflag)
 
 
+class LBFGSB(_SciPyOptimiser):
+    """A limited memory quasi-Newton optimiser, requires the gradient and
+    respects bounds."""
+
+    def __init__(self, gradient, bounds=None):
+        """
+        Parameters
+        ----------
+        gradient : callable
+            gradient(x) returns the gradient of the optimised function at x
+        bounds : tuple
+            (lower, upper) bounds arrays
+        """
+        self.gradient = gradient
+        self.bounds = bounds or (None, None)
+        self._fprime = gradient
+
+    def maximise(self, function, *args, **kw):
+        def nfprime(x):
+            return -1 * numpy.asarray(self.gradient(x))
+
+        self._fprime = nfprime
+        try:
+            return _SciPyOptimiser.maximise(self, function, *args, **kw)
+        finally:
+            self._fprime = self.gradient
+
+    def _minimise(self, f, x, ftol=None, callback=None, **kw):
+        (lower, upper) = self.bounds
+        # tolerance is on the reduction from a Powell sweep through every
+        # direction, a single quasi-Newton step reduces f much less
+        ftol = 1e-3 * ftol
+        return fmin_lbfgsb(
+            f, self._fprime, x, lower, upper, ftol=ftol, callback=callback
+        )
+
+
 DefaultLocalOptimiser = Powell
@@ -22,11 +22,17 @@ class ML(TreeEvaluator):
 
     'model' can be a substitution model or a likelihood function factory
     equivalent to Parametric.make_likelihood_function(tree).
-    If 'dists' is provided uses WLS to get initial values for lengths"""
+    If 'dists' is provided uses WLS to get initial values for lengths.
+    If 'lengths_only' trees are scored by optimising one branch length at a
+    time, other parameters held at the values set by the factory, when the
+    likelihood function supports it."""
 
-    def __init__(self, model, alignment, dists=None, opt_args=None):
+    def __init__(
+        self, model, alignment, dists=None, opt_args=None, lengths_only=False
+    ):
         opt_args = opt_args or {}
         self.opt_args = opt_args
+        self.lengths_only = lengths_only
         self.names = alignment.names
         self.alignment = alignment
         if hasattr(model, "make_likelihood_function"):
@@ -58,9 +64,13 @@ class ML(TreeEvaluator):
             tree = ancestry2tree(ancestry, init_lengths, names)
             lf = self.lf_factory(tree)
             lf.set_alignment(subalign)
+            optimised = False
             if lengths is not None:
                 lf.set_param_rule("length", is_constant=True)
-            lf.optimise(show_progress=False, **self.opt_args)
+            elif self.lengths_only and hasattr(lf, "optimise_branch_lengths"):
+                optimised = lf.optimise_branch_lengths()
+            if not optimised:
+                lf.optimise(show_progress=False, **self.opt_args)
             err = -1.0 * lf.get_log_likelihood()
             tree = lf.get_annotated_tree()
             return (err, tree)
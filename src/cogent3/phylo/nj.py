@@ -171,10 +171,39 @@ def uniq_neighbour_joins(trees, encode_partition):
         topologies.add(topology)
 
 
+def _get_names_and_array(dists):
+    """returns names and 2D distance array
+
+    A DistanceMatrix is used directly, avoiding conversion to a dict."""
+    from cogent3.evolve.fast_distance import DistanceMatrix
+
+    if not isinstance(dists, DistanceMatrix):
+        try:
+            dists = dists.to_dict()
+        except AttributeError:
+            pass
+        return distance_dict_to_2D(dists)
+
+    names = list(dists.names)
+    d = numpy.array(dists.array, dtype=float)
+    # as for lookup_symmetric_dict, a missing value is taken from d[j, i]
+    missing = numpy.isnan(d)
+    d[missing] = d.T[missing]
+    invalid = numpy.isnan(d)
+    if invalid.any():
+        i, j = [v[0] for v in numpy.nonzero(invalid)]
+        raise KeyError((names[i], names[j]))
+    if (d != d.T).any():
+        i, j = [v[0] for v in numpy.nonzero(d != d.T)]
+        a, b = names[i], names[j]
+        raise ValueError("d[%s,%s] != d[%s,%s]" % (a, b, b, a))
+    return names, d
+
+
 @UI.display_wrap
 def gnj(dists, keep=None, dkeep=0, ui=None):
     """Arguments:
-        - dists: dict of (name1, name2): distance
+        - dists: dict of (name1, name2): distance, or a DistanceMatrix
         - keep: number of best partial trees to keep at each iteration,
           and therefore to return.  Same as Q parameter in original GNJ paper.
         - dkeep: number of diverse partial trees to keep at each iteration,
@@ -182,13 +211,19 @@ def gnj(dists, keep=None, dkeep=0, ui=None):
     Result:
         - a sorted list of (tree length, tree) tuples
     """
-    try:
-        dists = dists.to_dict()
-    except AttributeError:
-        pass
+    (names, d) = _get_names_and_array(dists)
+
+    if keep == 1 and not dkeep:
+        # a single tree, use the dedicated engine
+        result = [_fast_nj(names, d, ui=ui)]
+        return ScoredTreeCollection(result)
 
-    (names, d) = distance_dict_to_2D(dists)
+    return _gnj(names, d, keep, dkeep, ui)
 
+
+def _gnj(names, d, keep, dkeep, ui):
+    """the generalised neighbour joining algorithm, arguments as for gnj
+    except names and d are from _get_names_and_array"""
     if keep is None:
         keep = len(names) * 5
     all_keep = keep + dkeep
@@ -283,9 +318,150 @@ def gnj(dists, keep=None, dkeep=0, ui=None):
     return ScoredTreeCollection(result)
 
 
+def _update_row_minima(d, L, row_min, row_arg, rows):
+    """recomputes the minimum off-diagonal distance for rows"""
+    if len(rows) == 0:
+        return
+    sub = d[rows, :L].copy()
+    sub[numpy.arange(len(rows)), rows] = numpy.inf
+    row_arg[rows] = sub.argmin(axis=1)
+    row_min[rows] = sub[numpy.arange(len(rows)), row_arg[rows]]
+
+
+def _best_join(d, r, L, row_min=None, block_size=64):
+    """returns indices (i, j) of the pair with the minimum Q value
+
+    If row_min is provided, rows are evaluated in order of a lower bound on
+    their smallest Q value, using the minimum distance in each row and the
+    largest row sum, and evaluation stops once the bound exceeds the best
+    Q value found (as for RapidNJ, Simonsen et al 2008)."""
+    scale = 1.0 / (L - 2)
+    r_active = r[:L]
+    if row_min is None:
+        # Q[i, j] = d[i, j] - r[j] * scale - r[i] * scale, minimised over j
+        # first for each row
+        q = d[:L, :L] - r_active * scale
+        numpy.fill_diagonal(q, numpy.inf)
+        cols = q.argmin(axis=1)
+        q_min = q[numpy.arange(L), cols] - r_active * scale
+        i = int(q_min.argmin())
+        return i, int(cols[i])
+
+    bound = row_min[:L] - (r_active + r_active.max()) * scale
+    order = numpy.argsort(bound)
+    best = numpy.inf
+    best_pair = None
+    for start in range(0, L, block_size):
+        rows = order[start : start + block_size]
+        rows = rows[bound[rows] < best]
+        if len(rows) == 0:
+            break
+        if start == block_size and (bound < best).sum() > L // 2:
+            # the bounds exclude too few rows to be worthwhile
+            return _best_join(d, r, L)
+        q = d[rows, :L] - (r_active[rows, None] + r_active[None, :]) * scale
+        q[numpy.arange(len(rows)), rows] = numpy.inf
+        k = int(q.argmin())
+        if q.flat[k] < best:
+            best = q.flat[k]
+            row, j = divmod(k, L)
+            best_pair = (int(rows[row]), j)
+    return best_pair
+
+
+def _fast_nj(names, d, use_bounds=True, ui=None):
+    """neighbour joining for a single tree, O(n^2) memory
+
+    The distance matrix is updated in place, with the joined node stored in
+    row i and the eliminated row j replaced by the last active row, as for
+    PartialTree.join. Row sums are updated incrementally.
+
+    Parameters
+    ----------
+    names
+        series of names
+    d
+        2D distance array, not modified
+    use_bounds : bool
+        use row minima to skip evaluating Q for rows that cannot contain the
+        best join
+
+    Returns
+    -------
+    (score, tree) as for gnj
+    """
+    d = numpy.array(d, dtype=float)
+    L = len(names)
+    nodes = [LightweightTreeTip(name) for name in names]
+    r = d.sum(axis=0)
+    score = 0.0
+    if use_bounds:
+        row_min = numpy.empty(L)
+        row_arg = numpy.empty(L, dtype=int)
+        _update_row_minima(d, L, row_min, row_arg, numpy.arange(L))
+    else:
+        row_min = None
+
+    num_tips = L
+    while L > 3:
+        if ui is not None:
+            ui.display(msg=" size %s/%s" % (L, num_tips), progress=1 - L / num_tips)
+        i, j = _best_join(d, r, L, row_min=row_min)
+        d_ij = d[i, j]
+        ij_dist_diff = (r[i] - r[j]) / (L - 2.0)
+        left_length = max(0.0, 0.5 * (d_ij + ij_dist_diff))
+        right_length = max(0.0, 0.5 * (d_ij - ij_dist_diff))
+        score += d_ij
+        nodes[i] = LightweightTreeNode(
+            [(left_length, nodes[i]), (right_length, nodes[j])]
+        )
+
+        # store new node at i, updating the row sums
+        new_dists = 0.5 * (d[i, :L] + d[j, :L] - d_ij)
+        r[:L] += new_dists - d[i, :L] - d[j, :L]
+        d[i, :L] = new_dists
+        d[:L, i] = new_dists
+        d[i, i] = 0.0
+        r[i] = new_dists.sum() - new_dists[j]
+
+        # eliminate j
+        last = L - 1
+        d[j, :L] = d[last, :L]
+        d[:L, j] = d[:L, last]
+        r[j] = r[last]
+        nodes[j] = nodes[last]
+        nodes.pop()
+        new = j if i == last else i
+        L -= 1
+
+        if not use_bounds:
+            continue
+
+        # row minima involving i or j are stale
+        stale = (row_arg[: last + 1] == i) | (row_arg[: last + 1] == j)
+        row_min[j] = row_min[last]
+        row_arg[j] = row_arg[last]
+        stale[j] = stale[last]
+        stale = stale[:L]
+        row_arg[:L][row_arg[:L] == last] = j
+        stale[new] = True
+        candidates = d[:L, new] < row_min[:L]
+        candidates[new] = False
+        row_min[:L][candidates] = d[:L, new][candidates]
+        row_arg[:L][candidates] = new
+        _update_row_minima(d, L, row_min, row_arg, numpy.flatnonzero(stale))
+
+    d = d[:L, :L]
+    lengths = numpy.sum(d, axis=0) - numpy.sum(d) / 4
+    root = LightweightTreeNode(list(zip(lengths, nodes)))
+    tree = root.convert()
+    tree.name = "root"
+    return (score + sum(lengths), tree)
+
+
 def nj(dists, no_negatives=True, show_progress=True):
     """Arguments:
-        - dists: dict of (name1, name2): distance
+        - dists: dict of (name1, name2): distance, or a DistanceMatrix
         - no_negatives: negative branch lengths will be set to 0
     """
     assert no_negatives, "no_negatives=False is deprecated"
@@ -4,6 +4,8 @@ import os
 import time
 import warnings
 
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import numpy
 
 from cogent3.maths.optimisers import ParameterOutOfBoundsError, maximise
@@ -98,6 +100,11 @@ class OptPar(object):
     def transform_to_optimiser(self, value):
         return value
 
+    def optimiser_derivative(self, value):
+        """derivative of the parameter value with respect to its optimiser
+        representation"""
+        return 1.0
+
 
 class LogOptPar(OptPar):
     # For ratios, optimiser sees log(param value).  Conversions to/from
@@ -113,6 +120,9 @@ class LogOptPar(OptPar):
         except OverflowError:
             raise OverflowError("log(%s)" % value)
 
+    def optimiser_derivative(self, value):
+        return value
+
 
 class EvaluatedCell(object):
     __slots__ = [
@@ -179,6 +189,21 @@ class EvaluatedCell(object):
                 print("%s: " % i + repr(data[arg]))
 
 
+class BatchedCell(EvaluatedCell):
+    """An EvaluatedCell of two args whose values can be computed together.
+
+    Cells with the same batch_calc and first arg that are updated in the same
+    step are evaluated as batch_calc(first, *second_args), which returns the
+    value of each cell."""
+
+    __slots__ = ["batch_calc"]
+
+    def __init__(self, name, calc, args, batch_calc, **kw):
+        super(BatchedCell, self).__init__(name, calc, args, **kw)
+        assert len(self.args) == 2, self.args
+        self.batch_calc = batch_calc
+
+
 class ConstCell(object):
     __slots__ = ["name", "scope", "value", "rank", "consequences", "clients"]
 
@@ -199,10 +224,22 @@ class Calculator(object):
     """A complete hierarchical function with N evaluation steps to call
     for each change of inputs.  Made by a ParameterController."""
 
-    def __init__(self, cells, defns, trace=None, with_undo=True):
+    def __init__(
+        self,
+        cells,
+        defns,
+        trace=None,
+        with_undo=True,
+        gradient=None,
+        partitions=None,
+        threads=None,
+    ):
         if trace is None:
             trace = TRACE_DEFAULT
         self.with_undo = with_undo
+        # gradient(calculator) returns {opt_par rank: derivative} for those
+        # parameters with analytic derivatives
+        self._analytic_gradient = gradient
         self.results_by_id = defns
         self.opt_pars = []
         other_cells = []
@@ -251,6 +288,15 @@ class Calculator(object):
                 arg.consequences[cell.rank] = True
                 arg.consequences.update(cell.consequences)
 
+        # cells of independent partitions, eg: loci, are updated concurrently
+        self._threads = threads
+        self._executor = None
+        self._split_programs = {}
+        self._batched_programs = {}
+        self._partition_labels = None
+        if partitions and threads and threads > 1:
+            self._partition_labels = self._get_partition_labels(partitions)
+
         self._programs = {}
         # Just for timings pre-calc these
         for opt_par in self.opt_pars:
@@ -263,6 +309,74 @@ class Calculator(object):
         self.set_tracing(trace)
         self.optimised = False
 
+    def _get_partition_labels(self, partitions):
+        # Returns a partition label, or None, for each cell. Cells that are
+        # inputs to only one partition belong to it. Returns None if the
+        # partitions are not independent.
+        labels = [partitions.get(id(cell)) for cell in self._cells]
+        for cell in self._cells[::-1]:
+            if labels[cell.rank] is not None or not cell.clients:
+                continue
+            client_labels = set(labels[client.rank] for client in cell.clients)
+            if len(client_labels) == 1:
+                labels[cell.rank] = client_labels.pop()
+
+        # shared cells that need partition results are updated afterwards
+        after = [False] * len(self._cells)
+        for cell in self._cells:
+            args = [arg for arg in cell.args if arg is not cell]
+            label = labels[cell.rank]
+            for arg in args:
+                arg_label = labels[arg.rank]
+                if label is not None and (
+                    arg_label not in (None, label) or after[arg.rank]
+                ):
+                    return None
+                if arg_label is not None or after[arg.rank]:
+                    after[cell.rank] = label is None
+
+        self._after_partitions = after
+        if len(set(labels) - {None}) < 2:
+            return None
+        return labels
+
+    def _split_program(self, program):
+        # (before, [cells of each partition], after)
+        key = id(program)
+        if key not in self._split_programs:
+            before = []
+            after = []
+            partitions = {}
+            for cell in program:
+                label = self._partition_labels[cell.rank]
+                if label is not None:
+                    partitions.setdefault(label, []).append(cell)
+                elif self._after_partitions[cell.rank]:
+                    after.append(cell)
+                else:
+                    before.append(cell)
+            self._split_programs[key] = (before, list(partitions.values()), after)
+        return self._split_programs[key]
+
+    def _caching_values(self):
+        # cell values, such as cached exponentiators, that count cache use
+        seen = {}
+        for values in self.cell_values:
+            for value in values:
+                if hasattr(value, "hits") and hasattr(value, "misses"):
+                    seen[id(value)] = value
+        return list(seen.values())
+
+    @property
+    def cache_hits(self):
+        """number of cache hits by cells of this calculator"""
+        return sum(value.hits for value in self._caching_values())
+
+    @property
+    def cache_misses(self):
+        """number of cache misses by cells of this calculator"""
+        return sum(value.misses for value in self._caching_values())
+
     def graphviz(self):
         """Returns a string in the 'dot' graph description language used by the
         program 'Graphviz'.  One box per cell, grouped by Defn."""
@@ -310,9 +424,51 @@ class Calculator(object):
     def optimise(self, **kw):
         x = self.get_value_array()
         bounds = self.get_bounds_vectors()
-        maximise(self, x, bounds, **kw)
+        maximise(self, x, bounds, gradient=self.gradient, **kw)
         self.optimised = True
 
+    def gradient(self, values=None):
+        """returns the gradient of the output with respect to the optimiser
+        representation of the parameters
+
+        Parameters
+        ----------
+        values
+            optimiser values at which to evaluate, defaults to the current
+            values
+
+        Notes
+        -----
+        Derivatives not provided analytically are forward finite differences,
+        each requiring one (mostly partial) recalculation.
+        """
+        if values is not None:
+            self.testoptparvector(values)
+        x = list(self.last_values)
+        fval = self.testfunction()
+        analytic = {}
+        if self._analytic_gradient is not None:
+            analytic = self._analytic_gradient(self)
+
+        result = numpy.zeros(len(self.opt_pars), Float)
+        (lower, upper) = self.get_bounds_vectors()
+        for (i, opt_par) in enumerate(self.opt_pars):
+            if opt_par.rank in analytic:
+                value = self._get_current_cell_value(opt_par)
+                result[i] = analytic[opt_par.rank] * opt_par.optimiser_derivative(
+                    value
+                )
+                continue
+
+            step = 1e-6 * max(1.0, abs(x[i]))
+            if x[i] + step > upper[i]:
+                step = -step
+            try:
+                result[i] = (self.change([(i, x[i] + step)]) - fval) / step
+            finally:
+                self.change([(i, x[i])])
+        return result
+
     def set_tracing(self, trace=False):
         """With 'trace' true every evaluated is printed.  Useful for profiling
         and debugging."""
@@ -503,9 +659,70 @@ class Calculator(object):
         return program
 
     def plain_update(self, program, data):
+        if self._partition_labels is None:
+            self._update_cells(program, data)
+            return
+
+        (before, partitions, after) = self._split_program(program)
+        self._update_cells(before, data)
+        if len(partitions) > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._threads)
+            futures = [
+                self._executor.submit(self._update_cells, cells, data)
+                for cells in partitions
+            ]
+            # all must finish before any error is raised
+            wait(futures)
+            for future in futures:
+                future.result()
+        else:
+            for cells in partitions:
+                self._update_cells(cells, data)
+        self._update_cells(after, data)
+
+    def _batch_program(self, cells):
+        # cells, with BatchedCells that can be evaluated together replaced by
+        # a tuple of them, placed before the first cell that uses one of them
+        key = id(cells)
+        if key not in self._batched_programs:
+            steps = []
+            pending = {}
+            group_of = {}
+
+            def flush(group):
+                batch = pending.pop(group)
+                steps.append(batch[0] if len(batch) == 1 else tuple(batch))
+
+            for cell in cells:
+                for rank in cell.arg_ranks:
+                    if group_of.get(rank) in pending:
+                        flush(group_of[rank])
+                if isinstance(cell, BatchedCell):
+                    group = (cell.batch_calc, cell.arg_ranks[0])
+                    pending.setdefault(group, []).append(cell)
+                    group_of[cell.rank] = group
+                else:
+                    steps.append(cell)
+            for group in list(pending):
+                flush(group)
+            # cells is kept so that its id is not reused
+            self._batched_programs[key] = (cells, steps)
+        return self._batched_programs[key][1]
+
+    def _update_cells(self, cells, data):
         try:
-            for cell in program:
-                data[cell.rank] = cell.calc(*[data[a] for a in cell.arg_ranks])
+            for cell in self._batch_program(cells):
+                if type(cell) is not tuple:
+                    data[cell.rank] = cell.calc(*[data[a] for a in cell.arg_ranks])
+                    continue
+                batch = cell
+                cell = batch[0]
+                values = cell.batch_calc(
+                    data[cell.arg_ranks[0]], *[data[c.arg_ranks[1]] for c in batch]
+                )
+                for (c, value) in zip(batch, values):
+                    data[c.rank] = value
         except ParameterOutOfBoundsError as detail:
             # Non-fatal error, just cancel this calculation.
             raise CalculationInterupted(cell, detail)
@@ -2,6 +2,7 @@
 
 import warnings
 
+from collections import defaultdict
 from contextlib import contextmanager
 
 import numpy
@@ -817,7 +818,9 @@ class ParameterController(object):
     def measure_evals_per_second(self, *args, **kw):
         return self.make_calculator().measure_evals_per_second(*args, **kw)
 
-    def make_calculator(self, calculatorClass=None, variable=None, **kw):
+    def make_calculator(
+        self, calculatorClass=None, variable=None, partition_dimension=None, **kw
+    ):
         cells = []
         input_soup = {}
         for defn in self.defns:
@@ -825,10 +828,29 @@ class ParameterController(object):
             (newcells, outputs) = defn.make_cells(input_soup, variable)
             cells.extend(newcells)
             input_soup[id(defn)] = outputs
+        if partition_dimension is not None:
+            kw["partitions"] = self._partition_cells(partition_dimension, input_soup)
         if calculatorClass is None:
             calculatorClass = Calculator
         return calculatorClass(cells, input_soup, **kw)
 
+    def _partition_cells(self, dimension, input_soup):
+        # {id(cell): category} for cells specific to one category of dimension
+        result = {}
+        for defn in self.defns:
+            index = getattr(defn, "index", None)
+            if not index or dimension not in defn.valid_dimensions:
+                continue
+            posn = defn.valid_dimensions.index(dimension)
+            categories = defaultdict(set)
+            for (scope_t, u) in index.items():
+                categories[u].add(scope_t[posn])
+            for (u, cell) in enumerate(input_soup[id(defn)]):
+                cats = categories[u] - {"all"}
+                if len(cats) == 1 and len(categories[u]) == 1:
+                    result[id(cell)] = cats.pop()
+        return result
+
     def update_from_calculator(self, calc):
         changed = []
         for defn in list(self.defn_for.values()):
@@ -858,13 +880,15 @@ class ParameterController(object):
         max_evaluations=None,
         tolerance=1e-6,
         global_tolerance=1e-1,
+        method="Powell",
         **kw,
     ):
         """Find input values that optimise this function.
         'local' controls the choice of optimiser, the default being to run
         both the global and local optimisers. 'filename' and 'interval'
-        control checkpointing.  Unknown keyword arguments get passed on to
-        the optimiser(s)."""
+        control checkpointing. 'method' is the local optimiser, 'Powell' or
+        the gradient based 'L-BFGS-B'.  Unknown keyword arguments get passed
+        on to the optimiser(s)."""
         return_calculator = kw.pop("return_calculator", False)  # only for debug
         for n in [
             "local",
@@ -873,6 +897,7 @@ class ParameterController(object):
             "max_evaluations",
             "tolerance",
             "global_tolerance",
+            "method",
         ]:
             kw[n] = locals()[n]
         lc = self.make_calculator()
@@ -188,6 +188,12 @@ def deserialise_seq(data, aligned=False):
     return result
 
 
+def deserialise_packed(data):
+    """returns a PackedSeq or PackedAlignment"""
+    klass = _get_class(data["type"])
+    return klass.from_rich_dict(data)
+
+
 def deserialise_seq_collections(data):
     """returns a cogent3 sequence/collection/alignment instance"""
     # We first try to load moltype/alphabet using get_moltype
@@ -293,7 +299,9 @@ def deserialise_object(data):
     if type_ is None:
         return data
 
-    if "core.sequence" in type_:
+    if "core.packed_seq" in type_:
+        func = deserialise_packed
+    elif "core.sequence" in type_:
         func = deserialise_seq
     elif "core.alignment" in type_:
         func = deserialise_seq_collections
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import concurrent.futures as concurrentfutures
+import itertools
 import math
 import multiprocessing
 import os
@@ -97,7 +98,15 @@ def set_default_chunksize(s, max_workers):
     return chunksize
 
 
-def imap(f, s, max_workers=None, use_mpi=False, if_serial="raise", chunksize=None):
+def imap(
+    f,
+    s,
+    max_workers=None,
+    use_mpi=False,
+    if_serial="raise",
+    chunksize=None,
+    batched=False,
+):
     """
     Parameters
     ----------
@@ -114,14 +123,46 @@ def imap(f, s, max_workers=None, use_mpi=False, if_serial="raise", chunksize=Non
         values are 'raise', 'ignore', 'warn'. Defaults to 'raise'.
     chunksize : int or None
         Size of data chunks executed by worker processes. Defaults to None
-        where stable chunksize is determined by set_default_chunksize()
+        where stable chunksize is determined by set_default_chunksize(), or
+        if batched, from the observed time per element.
+    batched : bool
+        f is sent once to each worker, rather than with every chunk, and
+        elements of s are sent in lists. Suited to when f is cheap relative
+        to the cost of pickling it.
 
     Returns
     -------
     imap is a generator yielding result of f(s[i]), map returns the result
     series
     """
+    if batched:
+        # results arrive in completion order, buffer until their turn
+        buffered = {}
+        next_index = 0
+        for index, result in _imap_batched(
+            f, s, max_workers, use_mpi, if_serial, chunksize
+        ):
+            buffered[index] = result
+            while next_index in buffered:
+                yield buffered.pop(next_index)
+                next_index += 1
+        return
+
+    executor, max_workers = _get_executor(max_workers, use_mpi, if_serial)
+
+    if not chunksize:
+        chunksize = set_default_chunksize(s, max_workers)
+
+    if not use_mpi:
+        f = PicklableAndCallable(f)
+
+    with executor:
+        for result in executor.map(f, s, chunksize=chunksize):
+            yield result
 
+
+def _get_executor(max_workers, use_mpi, if_serial, initializer=None, initargs=()):
+    """returns a pool executor and the number of workers it uses"""
     if_serial = if_serial.lower()
     assert if_serial in ("ignore", "raise", "warn"), f"invalid choice '{if_serial}'"
 
@@ -144,27 +185,205 @@ def imap(f, s, max_workers=None, use_mpi=False, if_serial="raise", chunksize=Non
         if not max_workers:
             max_workers = COMM.Get_attr(MPI.UNIVERSE_SIZE) - 1
 
-        if not chunksize:
-            chunksize = set_default_chunksize(s, max_workers)
-
-        with MPIfutures.MPIPoolExecutor(max_workers=max_workers) as executor:
-            for result in executor.map(f, s, chunksize=chunksize):
-                yield result
+        executor = MPIfutures.MPIPoolExecutor(
+            max_workers=max_workers, initializer=initializer, initargs=initargs
+        )
     else:
         if not max_workers:
             max_workers = multiprocessing.cpu_count() - 1
         assert max_workers < multiprocessing.cpu_count()
 
-        if not chunksize:
-            chunksize = set_default_chunksize(s, max_workers)
+        executor = concurrentfutures.ProcessPoolExecutor(
+            max_workers, initializer=initializer, initargs=initargs
+        )
+
+    return executor, max_workers
+
+
+def as_completed(
+    f,
+    s,
+    max_workers=None,
+    use_mpi=False,
+    if_serial="raise",
+    max_in_flight=None,
+    chunksize=None,
+    batched=False,
+):
+    """
+    Parameters
+    ----------
+    f : callable
+        function that operates on values in s
+    s : iterable
+        series of inputs to f
+    max_workers : int or None
+        maximum number of workers. Defaults to 1-maximum available.
+    use_mpi : bool
+        use MPI for parallel execution
+    if_serial : str
+        action to take if conditions will result in serial execution. Valid
+        values are 'raise', 'ignore', 'warn'. Defaults to 'raise'.
+    max_in_flight : int or None
+        maximum number of inputs submitted to workers whose results have not
+        been yielded. Defaults to 4 * max_workers, or if batched, to no limit
+        beyond 2 tasks per worker.
+    chunksize : int or None
+        if batched, the number of elements per task. Defaults to None
+        where it is determined from the observed time per element.
+    batched : bool
+        f is sent once to each worker, rather than with every task, and
+        elements of s are sent in lists. Suited to when f is cheap relative
+        to the cost of pickling it.
+
+    Returns
+    -------
+    generator yielding (i, f(s[i])) in the order the results complete
+
+    Notes
+    -----
+    Only max_in_flight elements of s are consumed ahead of the results, so
+    s can be a lazy iterable. References to results are dropped once they
+    have been yielded.
+    """
+    if batched:
+        yield from _imap_batched(
+            f, s, max_workers, use_mpi, if_serial, chunksize, max_in_flight
+        )
+        return
+
+    executor, max_workers = _get_executor(max_workers, use_mpi, if_serial)
+    max_in_flight = max_in_flight or 4 * max_workers
+
+    if not use_mpi:
+        f = PicklableAndCallable(f)
+
+    series = enumerate(s)
+    with executor:
+        pending = {}
+        for index, value in itertools.islice(series, max_in_flight):
+            pending[executor.submit(f, value)] = index
+
+        while pending:
+            done, _ = concurrentfutures.wait(
+                pending, return_when=concurrentfutures.FIRST_COMPLETED
+            )
+            for future in done:
+                index = pending.pop(future)
+                # keep the workers busy before handing back the result
+                for next_index, value in itertools.islice(series, 1):
+                    pending[executor.submit(f, value)] = next_index
+                yield index, future.result()
+
+
+# the function applied by a worker process in batched mode
+_WORKER_FUNC = None
+
+
+def _set_worker_func(f):
+    """executor initializer, so f is transferred once per worker"""
+    global _WORKER_FUNC
+    _WORKER_FUNC = f
+
+
+def _apply_batch(batch):
+    """returns results for elements of batch and the time taken"""
+    start = time.perf_counter()
+    results = [_WORKER_FUNC(value) for value in batch]
+    return results, time.perf_counter() - start
+
+
+class _ChunkSizer:
+    """chooses the number of elements per task from the time per element
+
+    Initial tasks contain a single element. Thereafter, tasks are sized to
+    take target_time seconds, based on the mean time per element so far.
+    """
+
+    def __init__(self, chunksize=None, target_time=0.1, max_chunksize=1024):
+        self._chunksize = chunksize
+        self._target_time = target_time
+        self._max_chunksize = max_chunksize
+        self._num_done = 0
+        self._time_taken = 0.0
+
+    def record(self, num, time_taken):
+        """records the time_taken for num elements"""
+        self._num_done += num
+        self._time_taken += time_taken
+
+    @property
+    def chunksize(self):
+        if self._chunksize:
+            return self._chunksize
+
+        if not self._num_done:
+            return 1
+
+        per_element = self._time_taken / self._num_done
+        if per_element <= 0:
+            return self._max_chunksize
+
+        size = int(self._target_time / per_element)
+        return min(max(size, 1), self._max_chunksize)
+
 
+def _imap_batched(
+    f, s, max_workers, use_mpi, if_serial, chunksize=None, max_in_flight=None
+):
+    """generator yielding (i, f(s[i])) in the order batches complete"""
+    if not use_mpi:
         f = PicklableAndCallable(f)
 
-        with concurrentfutures.ProcessPoolExecutor(max_workers) as executor:
-            for result in executor.map(f, s, chunksize=chunksize):
-                yield result
+    executor, max_workers = _get_executor(
+        max_workers, use_mpi, if_serial, initializer=_set_worker_func, initargs=(f,)
+    )
+    sizer = _ChunkSizer(chunksize=chunksize)
+    max_tasks = 2 * max_workers
+    series = enumerate(s)
+    pending = {}
+    num_in_flight = 0
+
+    def submit_batches():
+        nonlocal num_in_flight
+        while len(pending) < max_tasks:
+            size = sizer.chunksize
+            if max_in_flight:
+                size = min(size, max_in_flight - num_in_flight)
+            if size <= 0:
+                break
+
+            batch = list(itertools.islice(series, size))
+            if not batch:
+                break
+
+            indices, values = zip(*batch)
+            pending[executor.submit(_apply_batch, list(values))] = indices
+            num_in_flight += len(indices)
+
+    with executor:
+        submit_batches()
+        while pending:
+            done, _ = concurrentfutures.wait(
+                pending, return_when=concurrentfutures.FIRST_COMPLETED
+            )
+            for future in done:
+                indices = pending.pop(future)
+                results, time_taken = future.result()
+                sizer.record(len(indices), time_taken)
+                num_in_flight -= len(indices)
+                submit_batches()
+                yield from zip(indices, results)
 
 
 @extend_docstring_from(imap)
-def map(f, s, max_workers=None, use_mpi=False, if_serial="raise", chunksize=None):
-    return list(imap(f, s, max_workers, use_mpi, if_serial, chunksize))
+def map(
+    f,
+    s,
+    max_workers=None,
+    use_mpi=False,
+    if_serial="raise",
+    chunksize=None,
+    batched=False,
+):
+    return list(imap(f, s, max_workers, use_mpi, if_serial, chunksize, batched))
@@ -139,6 +139,19 @@ class ProgressContext:
         for result in self.series(results, count=len(s), **kw):
             yield result
 
+    def as_completed(
+        self, f, s, mininterval=1.0, parallel=False, par_kw=None, max_in_flight=None
+    ):
+        """yields (i, f(s[i])), in completion order if parallel"""
+        self.mininterval = mininterval
+        if parallel:
+            par_kw = par_kw or {}
+            results = PAR.as_completed(f, s, max_in_flight=max_in_flight, **par_kw)
+        else:
+            results = enumerate(map(f, s))
+        for result in self.series(results, count=len(s)):
+            yield result
+
     def map(self, f, s, **kw):
         return list(self.imap(f, s, **kw))
 
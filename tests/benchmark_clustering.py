@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""times UPGMA clustering for increasing numbers of sequences
+
+Usage: python benchmark_clustering.py [max_size]
+
+The 'matrix' engine is O(n^3) and is only timed up to 2000 sequences.
+"""
+import sys
+import time
+
+import numpy
+
+from cogent3.cluster.UPGMA import upgma
+from cogent3.evolve.fast_distance import DistanceMatrix
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Production"
+
+MAX_MATRIX_SIZE = 2000
+
+
+def random_distances(size, seed=0):
+    """returns a condensed DistanceMatrix of ultrametric-like distances"""
+    rng = numpy.random.default_rng(seed)
+    # points on a line plus noise give a clustered structure
+    points = numpy.sort(rng.random(size))
+    names = ["s%d" % i for i in range(size)]
+    condensed = numpy.concatenate(
+        [numpy.abs(points[i + 1 :] - points[i]) for i in range(size - 1)]
+    )
+    condensed += rng.random(len(condensed)) * 1e-3
+    return DistanceMatrix.from_condensed(condensed, names)
+
+
+def test(size, engine):
+    if engine == "matrix" and size > MAX_MATRIX_SIZE:
+        return "-"
+    dists = random_distances(size)
+    t0 = time.perf_counter()
+    upgma(dists, engine=engine)
+    return "%.2f" % (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sizes = [s for s in [250, 500, 1000, 2000, 5000, 10000] if s <= max_size]
+    engines = ["condensed", "matrix"]
+    template = "%10s " * 3
+    print("                 seconds")
+    print(template % tuple(["size"] + engines))
+    for size in sizes:
+        print(template % tuple([size] + [test(size, e) for e in engines]))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""compares local optimisers by evaluations and time to convergence
+
+Usage: python benchmark_gradient.py [num_seqs]
+
+Fits models to the first num_seqs sequences of data/brca1.fasta, using
+Powell and the gradient based L-BFGS-B.
+"""
+import sys
+import time
+
+from cogent3 import get_model, load_aligned_seqs, make_tree
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Production"
+
+METHODS = ["Powell", "L-BFGS-B"]
+
+
+def fit(aln, model_name, method):
+    tree = make_tree(tip_names=aln.names)
+    lf = get_model(model_name).make_likelihood_function(tree)
+    lf.set_alignment(aln)
+    t0 = time.perf_counter()
+    calc = lf.optimise(
+        method=method, return_calculator=True, show_progress=False, max_restarts=1
+    )
+    return calc.evaluations, time.perf_counter() - t0, lf.lnL
+
+
+if __name__ == "__main__":
+    num_seqs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    aln = load_aligned_seqs("data/brca1.fasta", moltype="dna")
+    aln = aln.take_seqs(aln.names[:num_seqs])
+    template = "%10s %10s %8s %10s %12s"
+    print(template % ("model", "method", "evals", "seconds", "lnL"))
+    for model_name in ["HKY85", "GTR", "CNFGTR"]:
+        sub_aln = aln.no_degenerates(motif_length=3) if "CNF" in model_name else aln
+        for method in METHODS:
+            evals, seconds, lnL = fit(sub_aln, model_name, method)
+            print(template % (model_name, method, evals, "%.2f" % seconds, "%.3f" % lnL))
@@ -122,6 +122,69 @@ class TestComposableBase(TestCase):
         with self.assertRaises(ValueError):
             proc.apply_to(["", ""])
 
+    def test_iter_apply_to(self):
+        """iter_apply_to yields results and logs each input"""
+        dstore = io_app.get_data_store("data", suffix="fasta", limit=3)
+        reader = io_app.load_unaligned(format="fasta", moltype="dna")
+        got = reader.iter_apply_to(dstore)
+        self.assertFalse(isinstance(got, list))
+        self.assertEqual(len(list(got)), len(dstore))
+        with TemporaryDirectory(dir=".") as dirname:
+            min_length = sample_app.min_length(10)
+            outpath = os.path.join(os.getcwd(), dirname, "delme.tinydb")
+            writer = io_app.write_db(outpath)
+            process = reader + min_length + writer
+            got = list(process.iter_apply_to(dstore[:2], logger=True))
+            self.assertEqual(len(got), 2)
+            self.assertEqual(len(process.data_store.logs), 1)
+            # members already done are skipped, with inputs logged against
+            # their own member
+            reader = io_app.load_unaligned(format="fasta", moltype="dna")
+            writer = io_app.write_db(outpath)
+            process = reader + sample_app.min_length(10) + writer
+            got = process.apply_to(dstore, show_progress=False, logger=True)
+            self.assertEqual(len(got), 1)
+            log = process.data_store.logs[-1].read()
+            self.assertIn(str(dstore[2]), log)
+            self.assertNotIn(f"input : {dstore[0]}", log)
+            process.data_store.close()
+
+    def test_iter_apply_to_stopped_early(self):
+        """the log is stored and the data store closed if iteration stops"""
+        dstore = io_app.get_data_store("data", suffix="fasta", limit=3)
+        with TemporaryDirectory(dir=".") as dirname:
+            reader = io_app.load_unaligned(format="fasta", moltype="dna")
+            outpath = os.path.join(os.getcwd(), dirname, "delme.tinydb")
+            writer = io_app.write_db(outpath)
+            process = reader + sample_app.min_length(10) + writer
+            got = process.iter_apply_to(dstore, logger=True, background_write=True)
+            next(got)
+            got.close()
+            self.assertIsNone(writer._writer)
+            self.assertIsNotNone(writer.input)
+            written = io_app.get_data_store(outpath)
+            self.assertEqual(len(written), 1)
+            self.assertEqual(len(written.logs), 1)
+            written.close()
+
+    def test_apply_to_background_write(self):
+        """apply_to with background writing logs and stores all outcomes"""
+        dstore = io_app.get_data_store("data", suffix="fasta", limit=3)
+        with TemporaryDirectory(dir=".") as dirname:
+            reader = io_app.load_aligned(format="fasta", moltype="dna")
+            # trigger creation of notcompleted
+            min_length = sample_app.min_length(3000)
+            outpath = os.path.join(os.getcwd(), dirname, "delme.tinydb")
+            writer = io_app.write_db(outpath)
+            process = reader + min_length + writer
+            r = process.apply_to(dstore, show_progress=False, background_write=True)
+            self.assertEqual(len(r), 3)
+            self.assertEqual(len(process.data_store.incomplete), 3)
+            self.assertEqual(len(process.data_store.logs), 1)
+            self.assertIsInstance(writer.write_wait_time, float)
+            self.assertIsNone(writer._writer)
+            process.data_store.close()
+
     def test_apply_to_strings(self):
         """apply_to handles strings as paths"""
         dstore = io_app.get_data_store("data", suffix="fasta", limit=3)
@@ -1,6 +1,10 @@
+import gc
+import json
 import os
 import shutil
+import subprocess
 import sys
+import time
 import zipfile
 
 from tempfile import TemporaryDirectory
@@ -8,12 +12,15 @@ from unittest import TestCase, main, skipIf
 
 from cogent3.app.data_store import (
     OVERWRITE,
+    BackgroundWriter,
     DataStoreMember,
     ReadOnlyDirectoryDataStore,
+    ReadOnlySqliteDataStore,
     ReadOnlyTinyDbDataStore,
     ReadOnlyZippedDataStore,
     SingleReadDataStore,
     WritableDirectoryDataStore,
+    WritableSqliteDataStore,
     WritableTinyDbDataStore,
     WritableZippedDataStore,
 )
@@ -208,6 +215,60 @@ class DataStoreBaseTests:
             self.assertEqual(got_b, expect_b)
             dstore.close()
 
+    def test_write_many(self):
+        """write_many writes multiple records at once"""
+        names = "brca1.fasta", "primates_brca1.fasta"
+        data = {}
+        for name in names:
+            with open("data" + os.sep + name) as infile:
+                data[name] = infile.read()
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, suffix=".fa", create=True)
+            records = [
+                (dstore.make_absolute_identifier(n), data[n]) for n in names
+            ]
+            members = dstore.write_many(records)
+            self.assertEqual(len(members), 2)
+            self.assertEqual(len(dstore), 2)
+            for member, name in zip(members, names):
+                self.assertEqual(dstore.read(member), data[name])
+            dstore.close()
+
+    def test_background_writer(self):
+        """BackgroundWriter writes all records and calls callbacks in order"""
+        with open("data" + os.sep + "brca1.fasta") as infile:
+            data = infile.read()
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, suffix=".fa", create=True)
+            writer = BackgroundWriter(dstore, max_queue=3, batch_size=2)
+            written = []
+            for i in range(7):
+                identifier = dstore.make_absolute_identifier(f"seqs-{i}.fasta")
+                writer.write(identifier, data, callback=written.append)
+            writer.call(written.append, "done")
+            writer.close()
+            self.assertEqual(writer.num_written, 7)
+            self.assertEqual(len(dstore), 7)
+            self.assertEqual(written[-1], "done")
+            self.assertEqual(dstore.read(written[3]), data)
+            with self.assertRaises(RuntimeError):
+                writer.write(identifier, data)
+
+            # the data store is not modified while another thread holds lock
+            writer = BackgroundWriter(dstore)
+            identifier = dstore.make_absolute_identifier("locked.fasta")
+            with writer.lock:
+                writer.write(identifier, data)
+                time.sleep(0.05)
+                self.assertNotIn(identifier, dstore)
+            writer.close()
+            self.assertIn(identifier, dstore)
+            dstore.close()
+
     def test_filter(self):
         """filter method should return correctly matching members"""
         dstore = self.ReadClass(self.basedir, suffix="*")
@@ -332,6 +393,95 @@ class DirectoryDataStoreTests(TestCase, DataStoreBaseTests):
             )
             self.assertEqual(len(dstore), 0)
 
+    def test_manifest(self):
+        """manifest caches members and md5, rescanning only changed dirs"""
+        with open(os.path.join("data", "brca1.fasta")) as infile:
+            data = infile.read()
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, "delme_dir")
+            os.makedirs(os.path.join(path, "sub"))
+            for name in ("a.fasta", os.path.join("sub", "b.fasta"), "c.txt"):
+                with open(os.path.join(path, name), "w") as out:
+                    out.write(data)
+
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            expect = self.ReadClass(path, suffix="fasta")
+            self.assertEqual(sorted(dstore), sorted(expect))
+            self.assertTrue(os.path.exists(dstore.manifest_path))
+            self.assertIn("b.fasta", dstore)
+            self.assertNotIn("c.fasta", dstore)
+            md5 = dstore.md5("a.fasta", force=True)
+            dstore.close()
+
+            # md5 now comes from the manifest
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            self.assertEqual(len(dstore), 2)
+            self.assertEqual(dstore.md5("a.fasta", force=False), md5)
+            dstore.close()
+
+            # a new file is found, a modified file loses its md5
+            with open(os.path.join(path, "sub", "d.fasta"), "w") as out:
+                out.write(data)
+            with open(os.path.join(path, "a.fasta"), "a") as out:
+                out.write(">x\nACGT\n")
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            expect = self.ReadClass(path, suffix="fasta")
+            self.assertEqual(sorted(dstore), sorted(expect))
+            self.assertIsNone(dstore.md5("a.fasta", force=False))
+            self.assertNotEqual(dstore.md5("a.fasta"), md5)
+
+    def test_manifest_saved_without_close(self):
+        """md5s are saved to the manifest without closing the data store"""
+        from unittest.mock import patch
+
+        from cogent3.app import data_store
+
+        with open(os.path.join("data", "brca1.fasta")) as infile:
+            data = infile.read()
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, "delme_dir")
+            os.makedirs(path)
+            for name in ("a.fasta", "b.fasta", "c.fasta"):
+                with open(os.path.join(path, name), "w") as out:
+                    out.write(data)
+
+            # on garbage collection
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            expect = {m.name: dstore.md5(m) for m in dstore}
+            manifest_path = dstore.manifest_path
+            del dstore
+            gc.collect()
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            got = {m.name: dstore.md5(m, force=False) for m in dstore}
+            self.assertEqual(got, expect)
+            del dstore
+
+            # at exit
+            os.remove(manifest_path)
+            script = (
+                "from cogent3.app.data_store import ReadOnlyDirectoryDataStore\n"
+                f"dstore = ReadOnlyDirectoryDataStore({path!r}, suffix='fasta', "
+                "manifest=True)\n"
+                "md5s = [dstore.md5(m) for m in dstore]\n"
+            )
+            subprocess.run([sys.executable, "-c", script], check=True)
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            got = {m.name: dstore.md5(m, force=False) for m in dstore}
+            self.assertEqual(got, expect)
+
+            # after every MANIFEST_SAVE_EVERY checksums
+            os.remove(dstore.manifest_path)
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            with patch.object(data_store, "MANIFEST_SAVE_EVERY", 2):
+                for member in dstore:
+                    dstore.md5(member)
+            with open(dstore.manifest_path) as infile:
+                records = json.load(infile)["fasta"]["files"]
+            saved = [r[2] for r in records.values() if r[2] is not None]
+            self.assertEqual(len(saved), 2)
+
 
 class ZippedDataStoreTests(TestCase, DataStoreBaseTests):
     basedir = "data.zip"
@@ -427,6 +577,39 @@ class ZippedDataStoreTests(TestCase, DataStoreBaseTests):
             )
             self.assertEqual(len(dstore), 0)
 
+    def test_manifest(self):
+        """manifest caches members and md5, rereading changed archives"""
+        with open(os.path.join("data", "brca1.fasta")) as infile:
+            data = infile.read()
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, "delme.zip")
+            with zipfile.ZipFile(path, "w") as archive:
+                for name in ("a.fasta", "b.fasta", "c.txt"):
+                    archive.writestr(os.path.join("delme", name), data)
+
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            expect = self.ReadClass(path, suffix="fasta")
+            self.assertEqual(list(dstore), list(expect))
+            self.assertTrue(os.path.exists(dstore.manifest_path))
+            self.assertIn("b.fasta", dstore)
+            md5 = dstore.md5("a.fasta", force=True)
+            dstore.close()
+
+            # md5 now comes from the manifest
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            self.assertEqual(len(dstore), 2)
+            self.assertEqual(dstore.md5("a.fasta", force=False), md5)
+            dstore.close()
+
+            # a new member is found, unchanged members keep their md5
+            with zipfile.ZipFile(path, "a") as archive:
+                archive.writestr(os.path.join("delme", "d.fasta"), data)
+            dstore = self.ReadClass(path, suffix="fasta", manifest=True)
+            expect = self.ReadClass(path, suffix="fasta")
+            self.assertEqual(list(dstore), list(expect))
+            self.assertEqual(dstore.md5("a.fasta", force=False), md5)
+
 
 class TinyDBDataStoreTests(TestCase):
     basedir = "data"
@@ -449,6 +632,43 @@ class TinyDBDataStoreTests(TestCase):
             self.assertTrue(len(dstore), len(self.data))
             dstore.close()
 
+    def test_tiny_write_many(self):
+        """write_many inserts records once, existing records are not changed"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            records = [
+                (dstore.make_relative_identifier(id_), data)
+                for id_, data in self.data.items()
+            ]
+            first = dstore.write(*records[0])
+            members = dstore.write_many(records + records[-1:])
+            self.assertEqual(len(members), len(records) + 1)
+            self.assertEqual(members[0].id, first.id)
+            self.assertEqual(members[-1].id, members[-2].id)
+            self.assertEqual(len(dstore), len(records))
+            for member, (_, data) in zip(members, records):
+                self.assertEqual(member.read(), data)
+            dstore.close()
+
+    def test_background_writer_error(self):
+        """errors in the writer thread are raised on flush"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            writer = BackgroundWriter(dstore)
+
+            def fail(member):
+                raise ValueError("bad callback")
+
+            writer.write("a.json", "data", callback=fail)
+            with self.assertRaises(ValueError):
+                writer.flush()
+            writer.write("b.json", "data")
+            writer.close()
+            self.assertEqual(len(dstore), 2)
+            dstore.close()
+
     def test_tiny_contains(self):
         """contains operation works for tinydb data store"""
         with TemporaryDirectory(dir=".") as dirname:
@@ -677,6 +897,123 @@ class TinyDBDataStoreTests(TestCase):
             dstore.close()
 
 
+class SqliteDataStoreTests(TinyDBDataStoreTests):
+    ReadClass = ReadOnlySqliteDataStore
+    WriteClass = WritableSqliteDataStore
+
+    def test_store_suffix(self):
+        """sqlitedb suffix is added to the source"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            self.assertTrue(dstore.source.endswith(".sqlitedb"))
+            dstore.close()
+
+    def test_pickleable_roundtrip(self):
+        """pickling of data stores should be reversible"""
+        from pickle import dumps, loads
+
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, "data")
+            dstore = self.WriteClass(path, if_exists="ignore")
+            for id_, data in self.data.items():
+                identifier = dstore.make_relative_identifier(id_)
+                dstore.write(identifier, data)
+            re_dstore = loads(dumps(dstore))
+            got = re_dstore[0].read()
+            self.assertEqual(str(dstore), str(re_dstore))
+            self.assertEqual(got, dstore[0].read())
+            re_dstore.close()
+            dstore.close()
+
+    def test_tiny_write_incomplete(self):
+        """write an incomplete result"""
+        from cogent3.app.composable import NotCompleted
+
+        keys = list(self.data)
+        incomplete = NotCompleted("FAIL", "somefunc", "checking", source="testing.txt")
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            id_ = dstore.make_relative_identifier(keys[0])
+            dstore.write_incomplete(id_, incomplete)
+            for k in keys[1:]:
+                id_ = dstore.make_relative_identifier(k)
+                dstore.write(id_, self.data[k])
+            dstore.close()
+
+            # all records are contained
+            dstore = self.ReadClass(path)
+            for k in self.data:
+                id_ = f"{k.split('.')[0]}.json"
+                self.assertTrue(id_ in dstore)
+
+            # but len(dstore) reflects only members with completed==True
+            self.assertEqual(len(dstore), len(keys) - 1)
+            self.assertIn("1x incomplete", repr(dstore))
+            # the incomplete property contains the incomplete ones
+            got = dstore.incomplete[0].read()
+            self.assertTrue("notcompleted" in got["type"].lower())
+            dstore.close()
+
+    def test_dblock(self):
+        """locking/unlocking of db"""
+        from cogent3.app.data_store import _sqlite_lockid
+        from pathlib import Path
+
+        keys = list(self.data)
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            for k in keys:
+                id_ = dstore.make_relative_identifier(k)
+                dstore.write(id_, self.data[k])
+            self.assertTrue(dstore.locked)
+            dstore.unlock(force=True)
+            # now introduce an artificial lock
+            with dstore.db:
+                dstore.db.execute("INSERT INTO lock (pid) VALUES (123)")
+            self.assertTrue(dstore.locked)
+            self.assertEqual(_sqlite_lockid(dstore.source), 123)
+            # now calling _source_create_delete with overwrite should have no
+            # effect
+            dstore._source_create_delete("overwrite", False)
+            path = Path(dstore.source)
+            self.assertTrue(path.exists())
+            # a read only data store does not touch the lock
+            reader = self.ReadClass(str(path))
+            reader.unlock(force=True)
+            reader.close()
+            self.assertTrue(dstore.locked)
+            # unlocking with wrong pid has no effect
+            dstore.unlock()
+            self.assertTrue(dstore.locked)
+            # but we can force it
+            dstore.unlock(force=True)
+            self.assertFalse(dstore.locked)
+            dstore.close()
+            # and now a call to _source_create_delete will delete
+            dstore._source_create_delete("overwrite", False)
+            self.assertFalse(path.exists())
+
+    def test_concurrent_reader(self):
+        """a reader sees records committed by an open writer"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, self.basedir)
+            dstore = self.WriteClass(path, if_exists="overwrite")
+            records = [
+                (dstore.make_relative_identifier(k), v) for k, v in self.data.items()
+            ]
+            dstore.write_many(records[:2])
+            reader = self.ReadClass(dstore.source)
+            self.assertEqual(len(reader), 2)
+            dstore.write_many(records[2:])
+            self.assertTrue(records[-1][0] in reader)
+            self.assertEqual(reader.get_member(records[-1][0]).read(), records[-1][1])
+            reader.close()
+            dstore.close()
+
+
 class SingleReadStoreTests(TestCase):
     basedir = f"data{os.sep}brca1.fasta"
     Class = SingleReadDataStore
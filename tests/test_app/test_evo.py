@@ -585,6 +585,59 @@ class TestBootstrap(TestCase):
         result = strapper(aln)
         self.assertIsInstance(result, evo_app.bootstrap_result)
 
+    def test_bstrap_seed(self):
+        """bootstrap replicates reproducible from the seed"""
+        aln = load_aligned_seqs(join(data_dir, "brca1.fasta"), moltype="dna")
+        aln = aln.take_seqs(aln.names[:3])
+        aln = aln.omit_gap_pos(allowed_gap_frac=0)
+        opt_args = dict(max_evaluations=20, limit_action="ignore")
+        m1 = evo_app.model("F81", opt_args=opt_args)
+        m2 = evo_app.model("HKY85", opt_args=opt_args)
+        hyp = evo_app.hypothesis(m1, m2)
+        null_dists = []
+        for seed in (3, 3, 4):
+            strapper = evo_app.bootstrap(hyp, num_reps=2, seed=seed)
+            null_dists.append(strapper(aln).null_dist)
+        self.assertEqual(null_dists[0], null_dists[1])
+        self.assertNotEqual(null_dists[0], null_dists[2])
+
+    def test_in_order(self):
+        """results are yielded in index order as soon as they can be"""
+        from cogent3.app.evo import _in_order
+
+        completed = []
+
+        def as_completed():
+            for i in (1, 0, 3, 4, 2):
+                completed.append(i)
+                yield i, str(i)
+
+        got = [(r, len(completed)) for r in _in_order(as_completed())]
+        self.assertEqual(got, [("0", 2), ("1", 2), ("2", 5), ("3", 5), ("4", 5)])
+
+    def test_bstrap_parallel_order(self):
+        """parallel replicates are in replicate order, not completion order"""
+        from unittest.mock import patch
+
+        def reversed_completion(f, s, **kwargs):
+            s = list(s)
+            for i in reversed(range(len(s))):
+                yield i, f(s[i])
+
+        aln = load_aligned_seqs(join(data_dir, "brca1.fasta"), moltype="dna")
+        aln = aln.take_seqs(aln.names[:3])
+        aln = aln.omit_gap_pos(allowed_gap_frac=0)
+        opt_args = dict(max_evaluations=20, limit_action="ignore")
+        m1 = evo_app.model("F81", opt_args=opt_args)
+        m2 = evo_app.model("HKY85", opt_args=opt_args)
+        hyp = evo_app.hypothesis(m1, m2)
+        expect = evo_app.bootstrap(hyp, num_reps=3, seed=3)(aln)
+        strapper = evo_app.bootstrap(hyp, num_reps=3, parallel=True, seed=3)
+        with patch.object(evo_app.parallel, "as_completed", reversed_completion):
+            got = strapper(aln)
+        self.assertEqual(list(got), list(expect))
+        self.assertEqual(got.null_dist, expect.null_dist)
+
 
 if __name__ == "__main__":
     main()
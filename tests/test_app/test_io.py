@@ -217,6 +217,21 @@ class TestIo(TestCase):
             dstore.close()
             self.assertEqual(got, data)
 
+    def test_write_db_load_db_sqlite(self):
+        """correctly write/load from an sqlitedb"""
+        with TemporaryDirectory(dir=".") as dirname:
+            outpath = join(dirname, "delme.sqlitedb")
+            writer = write_db(outpath, create=True, if_exists="ignore")
+            data = dict(a=[1, 2], b="string")
+            m = writer(data, identifier=join("blah", "delme.json"))
+            writer.data_store.close()
+            dstore = io_app.get_data_store(outpath)
+            self.assertIsInstance(dstore, io_app.ReadOnlySqliteDataStore)
+            reader = io_app.load_db()
+            got = reader(dstore[0])
+            dstore.close()
+            self.assertEqual(got, data)
+
     def test_load_db_failure_json_file(self):
         """informative load_db error message when given a json file path"""
         # todo this test has a trapped exception about being unable to delete
@@ -512,17 +527,18 @@ class TestIo(TestCase):
     def test_restricted_usage_of_tinydb_suffix(self):
         """can only use tinydb in a load_db, write_db context"""
         with TemporaryDirectory(dir=".") as dirname:
-            outdir = join(dirname, "delme.tinydb")
-            for writer_class in (
-                io_app.write_seqs,
-                io_app.write_json,
-                io_app.write_tabular,
-            ):
-                with self.assertRaises(ValueError):
-                    writer_class(outdir, create=True, if_exists="skip")
-            # but OK for write_db
-            w = io_app.write_db(outdir, create=True, if_exists="skip")
-            w.data_store.close()
+            for outdir in ("delme.tinydb", "delme.sqlitedb"):
+                outdir = join(dirname, outdir)
+                for writer_class in (
+                    io_app.write_seqs,
+                    io_app.write_json,
+                    io_app.write_tabular,
+                ):
+                    with self.assertRaises(ValueError):
+                        writer_class(outdir, create=True, if_exists="skip")
+                # but OK for write_db
+                w = io_app.write_db(outdir, create=True, if_exists="skip")
+                w.data_store.close()
 
     def test_write_db_parallel(self):
         """writing with overwrite in parallel should reset db"""
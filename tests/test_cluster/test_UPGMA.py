@@ -1,13 +1,16 @@
 #!/usr/bin/env python
 from collections import defaultdict
+from unittest.mock import patch
 
 import numpy
 
 from numpy import array
 
 from cogent3 import make_tree
+from cogent3.cluster import UPGMA
 from cogent3.cluster.UPGMA import (
     UPGMA_cluster,
+    UPGMA_cluster_condensed,
     condense_matrix,
     condense_node_order,
     find_smallest_index,
@@ -15,6 +18,7 @@ from cogent3.cluster.UPGMA import (
     upgma,
 )
 from cogent3.core.tree import PhyloNode
+from cogent3.evolve.fast_distance import DistanceMatrix
 from cogent3.util.dict_array import DictArray, DictArrayTemplate, convert2DDict
 from cogent3.util.unit_test import TestCase, main
 
@@ -168,6 +172,40 @@ class UPGMATests(TestCase):
             str(tree), "(((a:0.5,b:0.5):1.75,c:2.25):5.875,(d:1.0,e:1.0):7.125);"
         )
 
+    def test_upgma_cluster_condensed(self):
+        """UPGMA_cluster_condensed clusters nodes from a condensed array"""
+        condensed = self.matrix_zeros[numpy.triu_indices(5, k=1)]
+        tree = UPGMA_cluster_condensed(condensed, self.node_order)
+        self.assertEqual(
+            str(tree), "(((a:0.5,b:0.5):1.75,c:2.25):5.875,(d:1.0,e:1.0):7.125);"
+        )
+
+    def test_upgma_engines(self):
+        """upgma engines produce the same tree, including with ties"""
+        names = ["s%02d" % i for i in range(30)]
+        rng = numpy.random.RandomState(13)
+        for values in (rng.random_sample((30, 30)), rng.randint(0, 4, (30, 30))):
+            values = (values + values.T).astype(float)
+            values[numpy.diag_indices(30)] = 0
+            dists = {
+                (a, b): values[i, j]
+                for i, a in enumerate(names)
+                for j, b in enumerate(names)
+                if i != j
+            }
+            expect = str(upgma(dists, engine="matrix"))
+            self.assertEqual(str(upgma(dists, engine="condensed")), expect)
+            # rows rescanned in many blocks
+            with patch.object(UPGMA, "SCAN_BLOCK_ELEMENTS", 7):
+                self.assertEqual(str(upgma(dists, engine="condensed")), expect)
+            dmat = DistanceMatrix.from_condensed(
+                values[numpy.triu_indices(30, k=1)], names
+            )
+            self.assertEqual(str(upgma(dmat)), expect)
+
+        with self.assertRaises(ValueError):
+            upgma(self.pairwise_distances, engine="other")
+
     def test_inputs_from_dict_array(self):
         """inputs_from_dict_array makes an array object and PhyloNode list"""
         twod = {
@@ -2886,6 +2886,107 @@ class ArrayAlignmentSpecificTests(TestCase):
         e = array([0, 0, 1, 1])
         self.assertEqual(f, e)
 
+    def test_column_stats_match_alignment(self):
+        """array column statistics match those of Alignment"""
+        data = {
+            "a": "ACGT-NAAC-",
+            "b": "ACGA-ACCAT",
+            "c": "AGGAYRCC-G",
+            "d": "TGGA-RCGAT",
+        }
+        arr = ArrayAlignment(data=data, moltype="dna")
+        aln = Alignment(data=data, moltype="dna")
+        for motif_length in (1, 2, 3):
+            self.assertEqual(
+                arr.counts_per_pos(motif_length=motif_length).array,
+                aln.counts_per_pos(motif_length=motif_length).array,
+            )
+        self.assertEqual(str(arr.majority_consensus()), str(aln.majority_consensus()))
+        self.assertEqual(arr.iupac_consensus(), aln.iupac_consensus())
+        for include_gap_motif in (True, False):
+            self.assertEqual(
+                arr.variable_positions(include_gap_motif),
+                aln.variable_positions(include_gap_motif),
+            )
+        assert_allclose(arr.entropy_per_pos(), aln.entropy_per_pos())
+        assert_allclose(arr.probs_per_pos().array, aln.probs_per_pos().array)
+
+    def test_counts_per_seq_match_alignment(self):
+        """array counts per sequence match those of Alignment"""
+        data = {"a": "ACGT-NAAC-", "b": "ACGA-ACCAT", "c": "AGGAYRCC-G"}
+        for moltype in ("dna", "bytes"):
+            arr = ArrayAlignment(data=data, moltype=moltype)
+            aln = Alignment(data=data, moltype=moltype)
+            for motif_length in (1, 2):
+                for exclude_unobserved in (False, True):
+                    got = arr.counts_per_seq(
+                        motif_length, exclude_unobserved=exclude_unobserved
+                    )
+                    expect = aln.counts_per_seq(
+                        motif_length, exclude_unobserved=exclude_unobserved
+                    )
+                    self.assertEqual(got.template.names, expect.template.names)
+                    self.assertEqual(got.array, expect.array)
+
+    def test_slices_are_views(self):
+        """slices and consecutive take_seqs share the array, read only"""
+        data = {"a": "ACGT-NAAC-", "b": "ACGA-ACCAT", "c": "AGGAYRCC-G"}
+        aln = ArrayAlignment(data=data, moltype="dna")
+        for got in (
+            aln[2:8],
+            aln[::3],
+            list(aln.sliding_windows(4, 3))[1],
+            aln.take_seqs(["b", "c"]),
+        ):
+            self.assertTrue(numpy.shares_memory(got.array_seqs, aln.array_seqs))
+            self.assertFalse(got.array_seqs.flags.writeable)
+            self.assertEqual(got.moltype, aln.moltype)
+        self.assertEqual(aln[2:8].to_dict(), {n: s[2:8] for (n, s) in data.items()})
+        self.assertEqual(aln.take_seqs(["b", "c"]).names, ["b", "c"])
+        # the source is still writeable, and copies are independent
+        self.assertTrue(aln.array_seqs.flags.writeable)
+        got = aln[2:8].copy()
+        self.assertTrue(got.array_seqs.flags.writeable)
+        self.assertFalse(numpy.shares_memory(got.array_seqs, aln.array_seqs))
+        got = aln.take_seqs(["c", "a"])
+        self.assertFalse(numpy.shares_memory(got.array_seqs, aln.array_seqs))
+        self.assertEqual(got.to_dict(), {"c": data["c"], "a": data["a"]})
+        got = aln.get_sub_alignment()
+        self.assertFalse(numpy.shares_memory(got.array_seqs, aln.array_seqs))
+
+    def test_column_filters_match_alignment(self):
+        """array column filtering matches that of Alignment"""
+        data = {
+            "a": "ACGT-NAAC-TTG",
+            "b": "ACGA-ACCATAT?",
+            "c": "AGGAYRCC-GCAA",
+            "d": "TGGA-RCGATAGC",
+        }
+        arr = ArrayAlignment(data=data, moltype="dna")
+        aln = Alignment(data=data, moltype="dna")
+        for motif_length in (1, 2, 3):
+            for allow_gap in (False, True):
+                self.assertEqual(
+                    arr.no_degenerates(motif_length, allow_gap).to_dict(),
+                    aln.no_degenerates(motif_length, allow_gap).to_dict(),
+                )
+            for allowed_frac in (0, 0.25, 0.5):
+                self.assertEqual(
+                    arr.omit_gap_pos(allowed_frac, motif_length).to_dict(),
+                    aln.omit_gap_pos(allowed_frac, motif_length).to_dict(),
+                )
+        self.assertIsNone(arr[4:5].omit_gap_pos(0.5))
+
+        # take_positions accepts a bool array
+        mask = numpy.array([c != "-" for c in data["a"]])
+        expect = arr.take_positions(numpy.nonzero(mask)[0])
+        self.assertEqual(arr.take_positions(mask).to_dict(), expect.to_dict())
+        expect = arr.take_positions(numpy.nonzero(mask)[0], negate=True)
+        got = arr.take_positions(mask, negate=True)
+        self.assertEqual(got.to_dict(), expect.to_dict())
+        with self.assertRaises(ValueError):
+            arr.take_positions(mask[:-1])
+
     def test_coevolution_segments(self):
         """specifying coordinate segments produces matrix with just those"""
         aln = load_aligned_seqs("data/brca1.fasta", moltype="dna")
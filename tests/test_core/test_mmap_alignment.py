@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Provides tests for classes and functions in mmap_alignment.py
+"""
+import os
+
+from tempfile import TemporaryDirectory
+
+import numpy
+
+from cogent3 import load_aligned_seqs, make_aligned_seqs
+from cogent3.core.alignment import ArrayAlignment
+from cogent3.core.mmap_alignment import load_mmap_alignment, write_mmap_alignment
+from cogent3.util.unit_test import TestCase, main
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+
+class MmapAlignmentTests(TestCase):
+    def setUp(self):
+        self.data = {
+            "a": "ACGTACGTNN-AC",
+            "b": "ACGAACGTRRAAT",
+            "c": "TCG-ACGTACACG",
+        }
+        self.aln = make_aligned_seqs(self.data, moltype="dna", array_align=True)
+
+    def test_round_trip(self):
+        """alignment written and loaded is memory mapped and unchanged"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, "aln.c3aln")
+            self.aln.write(path)
+            got = load_aligned_seqs(path)
+            self.assertIsInstance(got, ArrayAlignment)
+            self.assertIsInstance(got.array_seqs.base, numpy.memmap)
+            self.assertEqual(got.names, self.aln.names)
+            self.assertEqual(got.moltype, self.aln.moltype)
+            self.assertEqual(got.to_dict(), self.data)
+            self.assertEqual(got.info.source, path)
+            # can be converted on loading
+            got = load_aligned_seqs(path, array_align=False)
+            self.assertEqual(got.to_dict(), self.data)
+
+    def test_write_named_seqs(self):
+        """(name, seq) pairs are encoded in chunks"""
+        pairs = [(n, self.data[n].lower()) for n in "cab"]
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, "aln.c3aln")
+            write_mmap_alignment(path, iter(pairs), moltype="dna", chunk_size=4)
+            got = load_mmap_alignment(path)
+            self.assertEqual(got.names, ["c", "a", "b"])
+            self.assertEqual(got.to_dict(), self.data)
+
+            with self.assertRaises(ValueError):
+                write_mmap_alignment(path, [("a", "ACGT"), ("b", "ACG")], "dna")
+            with self.assertRaises(ValueError):
+                write_mmap_alignment(path, [("a", "ACGT"), ("b", "ACGZ")], "dna")
+            with open(path, "wb") as outfile:
+                outfile.write(b">a\nACGT\n")
+            with self.assertRaises(ValueError):
+                load_mmap_alignment(path)
+
+    def test_operations_match_in_memory(self):
+        """slicing, take_seqs, sliding_windows and counts_per_seq match"""
+        with TemporaryDirectory(dir=".") as dirname:
+            path = os.path.join(dirname, "aln.c3aln")
+            write_mmap_alignment(path, self.aln)
+            got = load_mmap_alignment(path)
+            self.assertEqual(got[2:7].to_dict(), self.aln[2:7].to_dict())
+            self.assertEqual(
+                got.take_seqs(["c", "a"]).to_dict(),
+                self.aln.take_seqs(["c", "a"]).to_dict(),
+            )
+            self.assertEqual(got.take_seqs("a", negate=True).names, ["b", "c"])
+            self.assertEqual(
+                [w.to_dict() for w in got.sliding_windows(5, 3)],
+                [w.to_dict() for w in self.aln.sliding_windows(5, 3)],
+            )
+            for motif_length in (1, 2, 3):
+                for exclude_unobserved in (False, True):
+                    expect = self.aln.counts_per_seq(
+                        motif_length, exclude_unobserved=exclude_unobserved
+                    )
+                    counts = got.counts_per_seq(
+                        motif_length, exclude_unobserved=exclude_unobserved
+                    )
+                    self.assertEqual(counts.to_dict(), expect.to_dict())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Provides tests for classes and functions in packed_seq.py
+"""
+import numpy
+
+from cogent3 import DNA, make_aligned_seqs
+from cogent3.core.packed_seq import (
+    PackedAlignment,
+    PackedSeq,
+    pack_indices,
+    packed_hamming,
+    pad_to_words,
+    unpack_indices,
+)
+from cogent3.util.unit_test import TestCase, main
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "Gavin.Huttley@anu.edu.au"
+__status__ = "Alpha"
+
+
+class PackedSeqTests(TestCase):
+    def test_pack_unpack_indices(self):
+        """indices are packed 4 to a byte and recovered"""
+        indices = numpy.array([[0, 1, 2, 3, 3, -9], [3, 3, 3, 3, 0, 1]])
+        packed, valid = pack_indices(indices)
+        self.assertEqual(packed.shape, (2, 2))
+        self.assertEqual(packed[0, 0], 0b11100100)
+        self.assertEqual(valid[0].tolist(), [0b01010101, 0b0001])
+        self.assertEqual(
+            unpack_indices(packed, 6).tolist(),
+            [[0, 1, 2, 3, 3, 0], [3, 3, 3, 3, 0, 1]],
+        )
+
+    def test_packed_hamming(self):
+        """counts of valid and differing positions match a direct count"""
+        rng = numpy.random.default_rng(13)
+        indices = rng.integers(-1, 4, size=(6, 101))
+        packed, valid = pack_indices(indices)
+        expect_total = []
+        expect_diffs = []
+        for other in indices:
+            both = (indices[0] >= 0) & (other >= 0)
+            expect_total.append(both.sum())
+            expect_diffs.append((indices[0] != other)[both].sum())
+
+        for pad in (lambda x: x, pad_to_words):
+            total, diffs = packed_hamming(
+                pad(packed[0]), pad(valid[0]), pad(packed), pad(valid)
+            )
+            self.assertEqual(total.tolist(), expect_total)
+            self.assertEqual(diffs.tolist(), expect_diffs)
+
+    def test_seq_round_trip(self):
+        """packed sequences unpack to the original with runs of non-canonical"""
+        seq = DNA.make_seq("ACGTnnN-RYAcgtA", name="s1")
+        got = PackedSeq.from_seq(seq)
+        self.assertEqual(got.name, "s1")
+        self.assertEqual(len(got), len(seq))
+        self.assertEqual(got.nbytes, 4)
+        self.assertEqual(str(got), "ACGTNNN-RYACGTA")
+        self.assertEqual(
+            got.runs, [[4, 7, "N"], [7, 8, "-"], [8, 9, "R"], [9, 10, "Y"]]
+        )
+        unpacked = got.unpack()
+        self.assertEqual(unpacked.moltype, DNA)
+        self.assertEqual(unpacked.name, "s1")
+        self.assertEqual(PackedSeq.from_seq("ACGU", moltype="rna").unpack(), "ACGU")
+        with self.assertRaises(ValueError):
+            PackedSeq.from_seq("ACGJ")
+        with self.assertRaises(ValueError):
+            PackedSeq.from_seq("ACDE", moltype="protein")
+
+    def test_seq_comparison(self):
+        """packed sequences compare and hash on their content"""
+        seq = PackedSeq.from_seq("ACGTNNAC")
+        same = PackedSeq.from_seq("acgtnnac", name="other")
+        diff = PackedSeq.from_seq("TCGTNRAC")
+        self.assertEqual(seq, same)
+        self.assertEqual(hash(seq), hash(same))
+        self.assertEqual(seq, "ACGTNNAC")
+        self.assertNotEqual(seq, diff)
+        self.assertEqual(seq.hamming(diff), (6, 1))
+        with self.assertRaises(ValueError):
+            seq.hamming(PackedSeq.from_seq("ACG"))
+
+    def test_seq_rich_dict(self):
+        """to_rich_dict and to_json enable round trips"""
+        from cogent3.util.deserialise import deserialise_object
+
+        seq = PackedSeq.from_seq("ACGT-NRAC", name="s1")
+        got = PackedSeq.from_rich_dict(seq.to_rich_dict())
+        self.assertEqual(got, seq)
+        self.assertEqual(got.name, "s1")
+        got = deserialise_object(seq.to_json())
+        self.assertIsInstance(got, PackedSeq)
+        self.assertEqual(str(got), str(seq))
+
+
+class PackedAlignmentTests(TestCase):
+    data = {"a": "ACGT-NAC", "b": "ACGAAAAR", "c": "TTTTTTTT"}
+
+    def test_from_alignment(self):
+        """packing array and non-array alignments and dicts is the same"""
+        expect = None
+        for aln in (
+            make_aligned_seqs(self.data, moltype="dna", array_align=True),
+            make_aligned_seqs(self.data, moltype="dna", array_align=False),
+            self.data,
+        ):
+            got = PackedAlignment.from_alignment(aln)
+            self.assertEqual(got.names, ["a", "b", "c"])
+            self.assertEqual(len(got), 8)
+            self.assertEqual(got.num_seqs, 3)
+            self.assertEqual(got.nbytes, 6)
+            self.assertEqual(got.to_dict(), self.data)
+            if expect is not None:
+                self.assertEqual(got.packed.tolist(), expect.packed.tolist())
+            expect = got
+
+        self.assertEqual(got.get_seq("b"), PackedSeq.from_seq(self.data["b"]))
+        self.assertEqual(got.to_indices()[0].tolist(), [2, 1, 3, 0, -9, -9, 2, 1])
+        self.assertEqual(got.unpack().to_dict(), self.data)
+        self.assertEqual(got.unpack(array_align=False).to_dict(), self.data)
+        with self.assertRaises(ValueError):
+            PackedAlignment.from_alignment({"a": "ACGT", "b": "ACG"})
+
+    def test_rich_dict(self):
+        """to_rich_dict and to_json enable round trips"""
+        from cogent3.util.deserialise import deserialise_object
+
+        aln = PackedAlignment.from_alignment(self.data)
+        got = PackedAlignment.from_rich_dict(aln.to_rich_dict())
+        self.assertEqual(got.to_dict(), self.data)
+        got = deserialise_object(aln.to_json())
+        self.assertIsInstance(got, PackedAlignment)
+        self.assertEqual(got.to_dict(), self.data)
+        self.assertEqual(got.valid_mask().tolist(), aln.valid_mask().tolist())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
+import multiprocessing
 import os
 import warnings
 
-from unittest import TestCase, main
+from unittest import TestCase, main, skipIf
 
 import numpy
 
@@ -16,6 +17,7 @@ from cogent3 import (
     make_aligned_seqs,
     make_unaligned_seqs,
 )
+from cogent3.core.packed_seq import PackedAlignment
 from cogent3.evolve._pairwise_distance import (
     _fill_diversity_matrix as pyx_fill_diversity_matrix,
 )
@@ -29,7 +31,12 @@ from cogent3.evolve.fast_distance import (
     PercentIdentityPair,
     TN93Pair,
     _calculators,
+    _condensed_index,
+    _SharedIndexedSeqs,
+    _TileCalculator,
+    _fill_diversity_matrices,
     _fill_diversity_matrix,
+    _get_tiles,
     _hamming,
     _jc69_from_matrix,
     _tn93_from_matrix,
@@ -41,6 +48,12 @@ from cogent3.evolve.fast_distance import (
 from cogent3.evolve.models import F81, HKY85, JC69
 
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
 warnings.filterwarnings("ignore", "Not using MPI as mpi4py not found")
 
 
@@ -133,6 +146,131 @@ class TestPair(TestCase):
         pyx_fill_diversity_matrix(matrix2, s1, s2)
         assert_allclose(matrix1, matrix2)
 
+    def test_fill_diversity_matrices(self):
+        """batched diversity matrices match those from individual pairs"""
+        s1 = seq_to_indices("RACGTACGTACN", self.dna_char_indices)
+        others = [
+            seq_to_indices(s, self.dna_char_indices)
+            for s in ("AGTGTACGTACA", "RACGTACGTACN", "TTTTTTTTTTTT")
+        ]
+        got = _fill_diversity_matrices(s1, numpy.array(others), 4)
+        self.assertEqual(got.shape, (3, 4, 4))
+        for i, s2 in enumerate(others):
+            expect = numpy.zeros((4, 4), float)
+            _fill_diversity_matrix(expect, s1, s2)
+            assert_equal(got[i], expect)
+
+    def test_batch_vs_pair_calculators(self):
+        """batched calculations match the per-pair calculations"""
+        aln = load_aligned_seqs("data/brca1_5.paml", moltype=DNA)
+        for calc_class in (
+            HammingPair,
+            PercentIdentityPair,
+            JC69Pair,
+            TN93Pair,
+            LogDetPair,
+            ParalinearPair,
+        ):
+            batched = calc_class(moltype=DNA, alignment=aln)
+            batched.run(show_progress=False)
+            single = calc_class(moltype=DNA, alignment=aln)
+            single._batch_func = None
+            single.run(show_progress=False)
+            assert_allclose(batched._stats, single._stats)
+
+    def test_packed_vs_matrix_calculators(self):
+        """distances from packed nucleotides match the diversity matrices"""
+        data = {
+            "a": "ACGGTAC-AGTTACGGTACGAG",
+            "b": "ACGGTACGAGTTNNGGTACGAR",
+            "c": "ACGGTACGAGTTNNGGTACGAR",
+            "d": "TCGGAACGAGTA--GGTACGAA",
+            "e": "----------------------",
+        }
+        aln = make_aligned_seqs(data=data, moltype=DNA)
+        packed = PackedAlignment.from_alignment(aln)
+        for calc_class in (HammingPair, PercentIdentityPair):
+            expect = calc_class(moltype=DNA, alignment=aln)
+            self.assertIsNotNone(expect._packed)
+            expect._packed = None
+            expect.run(show_progress=False)
+            for data in (aln, packed):
+                got = calc_class(moltype=DNA, alignment=data)
+                got.run(show_progress=False)
+                self.assertEqual(got.duplicated, expect.duplicated)
+                assert_allclose(got._stats, expect._stats)
+
+        # packing is only used for nucleotides and counts of differences
+        self.assertIsNone(JC69Pair(moltype=DNA, alignment=aln)._packed)
+        prot = make_aligned_seqs(data={"a": "ACDEF", "b": "ACDEY"}, moltype=PROTEIN)
+        self.assertIsNone(HammingPair(moltype=PROTEIN, alignment=prot)._packed)
+
+    def test_tiles_cover_upper_triangle(self):
+        """tiles include every pair in the upper triangle exactly once"""
+        for num, size in ((5, 2), (7, 3), (4, 10), (2, 1)):
+            pairs = []
+            for row_start, row_end, col_start, col_end in _get_tiles(num, size):
+                pairs.extend(
+                    (i, j)
+                    for i in range(row_start, row_end)
+                    for j in range(col_start, col_end)
+                    if i < j
+                )
+            expect = [(i, j) for i in range(num) for j in range(i + 1, num)]
+            self.assertEqual(sorted(pairs), expect)
+            indices = [_condensed_index(num, i, j) for i, j in expect]
+            self.assertEqual(indices, list(range(len(expect))))
+
+    @skipIf(multiprocessing.cpu_count() < 2, "requires multiple cpus")
+    def test_parallel_matches_serial(self):
+        """parallel calculation produces same distances and duplicates"""
+        data = {
+            "a": "ACGGTAC-AGTT",
+            "b": "ACGGTACGAGTT",
+            "c": "ACGGTACGAGTT",
+            "d": "TCGGAACGAGTA",
+            "e": "ACGGTACGAGNT",
+        }
+        aln = make_aligned_seqs(data=data, moltype=DNA)
+        for calc_class in (JC69Pair, TN93Pair, ParalinearPair):
+            serial = calc_class(moltype=DNA, alignment=aln)
+            serial.run(show_progress=False)
+            par = calc_class(moltype=DNA, alignment=aln)
+            par.run(show_progress=False, parallel=True, par_kw=dict(max_workers=1))
+            self.assertEqual(par.duplicated, serial.duplicated)
+            assert_allclose(
+                par.get_pairwise_distances().array,
+                serial.get_pairwise_distances().array,
+            )
+
+    @skipIf(shared_memory is None, "requires multiprocessing.shared_memory")
+    def test_tile_detaches_shared_memory(self):
+        """a worker's tile calculator closes its shared memory attachment"""
+        import pickle
+
+        from unittest.mock import patch
+
+        data = {"a": "ACGGTACGAGTT", "b": "ACGGTACGAGTA", "c": "TCGGAACGAGTA"}
+        aln = make_aligned_seqs(data=data, moltype=DNA)
+        calc = TN93Pair(moltype=DNA, alignment=aln)
+        args = calc._dim, calc.func, calc._batch_func, calc._func_args
+        expect = _TileCalculator(calc.indexed_seqs, *args)((0, 3, 0, 3))
+
+        shared = _SharedIndexedSeqs(calc.indexed_seqs)
+        try:
+            # as sent to a worker process
+            tile_calc = pickle.loads(pickle.dumps(_TileCalculator(shared, *args)))
+            close = shared_memory.SharedMemory.close
+            with patch.object(
+                shared_memory.SharedMemory, "close", autospec=True, side_effect=close
+            ) as closed:
+                got = tile_calc((0, 3, 0, 3))
+            self.assertEqual(closed.call_count, 1)
+        finally:
+            shared.close()
+        assert_allclose(got[2], expect[2])
+        assert_equal(got[3], expect[3])
+
     def test_hamming_from_matrix(self):
         """compute hamming from diversity matrix"""
         s1 = seq_to_indices("ACGTACGTAC", self.dna_char_indices)
@@ -746,6 +884,99 @@ class TestDistanceMatrix(TestCase):
         self.assertEqual(set(darr.names), names)
 
 
+class TestCondensedDistanceMatrix(TestCase):
+    names = ["a", "b", "c", "d"]
+    # a-b, a-c, a-d, b-c, b-d, c-d
+    condensed = numpy.array([0.1, 0.2, 0.3, 0.4, numpy.nan, 0.6])
+
+    def test_from_condensed(self):
+        """condensed storage matches dict construction"""
+        dmat = DistanceMatrix.from_condensed(self.condensed, self.names)
+        expect = {}
+        k = 0
+        for i in range(4):
+            for j in range(i + 1, 4):
+                expect[(self.names[i], self.names[j])] = self.condensed[k]
+                expect[(self.names[j], self.names[i])] = self.condensed[k]
+                k += 1
+        expect = DistanceMatrix(expect)
+        self.assertEqual(dmat.names, expect.names)
+        assert_allclose(dmat.array, expect.array)
+        self.assertEqual(dmat["a", "c"], 0.2)
+        self.assertEqual(dmat["d", "a"], 0.3)
+        self.assertEqual(dmat["b", "b"], 0)
+        with self.assertRaises(ValueError):
+            DistanceMatrix.from_condensed(self.condensed[:4], self.names)
+
+    def test_condensed_duplicates(self):
+        """names sharing a row are duplicates"""
+        dmat = DistanceMatrix.from_condensed(
+            self.condensed, ["a", "a2", "c"], row_index=[0, 0, 2], num_rows=4
+        )
+        self.assertEqual(dmat["a", "a2"], 0)
+        self.assertEqual(dmat["a2", "c"], 0.2)
+        assert_allclose(
+            dmat.array, numpy.array([[0, 0, 0.2], [0, 0, 0.2], [0.2, 0.2, 0]])
+        )
+
+    def test_to_condensed(self):
+        """to_condensed returns the upper triangle for the order of names"""
+        dmat = DistanceMatrix.from_condensed(self.condensed, self.names)
+        got = dmat.to_condensed()
+        assert_allclose(got, self.condensed)
+        got[0] = 9
+        self.assertEqual(dmat["a", "b"], 0.1)
+        dmat = DistanceMatrix.from_condensed(
+            self.condensed, ["a", "a2", "c"], row_index=[0, 0, 2], num_rows=4
+        )
+        assert_allclose(dmat.to_condensed(), [0, 0.2, 0.2])
+        dmat = DistanceMatrix.from_condensed(
+            self.condensed, ["b", "d"], row_index=[1, 3], num_rows=4
+        )
+        assert_allclose(dmat.to_condensed(), [numpy.nan])
+
+    def test_condensed_take_drop(self):
+        """take_dists and drop_invalid work with condensed storage"""
+        dmat = DistanceMatrix.from_condensed(self.condensed, self.names)
+        got = dmat.take_dists(["a", "c", "d"])
+        self.assertEqual(got.names, ["a", "c", "d"])
+        self.assertEqual(got["c", "d"], 0.6)
+        self.assertIsNone(dmat.take_dists(["a"]))
+        # b-d is invalid, so both are dropped
+        got = dmat.drop_invalid()
+        self.assertEqual(got.names, ["a", "c"])
+        got = dmat.take_dists(["a", "c", "d"]).drop_invalid()
+        self.assertEqual(got.names, ["a", "c", "d"])
+
+    def test_condensed_setitem(self):
+        """setting values converts to 2D storage"""
+        dmat = DistanceMatrix.from_condensed(self.condensed, self.names)
+        shared = dmat.take_dists(["a", "b"])
+        shared["a", "b"] = 0.9
+        self.assertEqual(shared["a", "b"], 0.9)
+        self.assertEqual(dmat["a", "b"], 0.1)
+
+    def test_calculator_duplicates(self):
+        """calculator distances with duplicates use condensed storage"""
+        data = {
+            "s1": "ACGGTACGAGTT",
+            "s2": "ACGGTACGAGTA",
+            "s3": "ACGGTACGAGTA",
+            "s4": "TCGGAACGAGTA",
+        }
+        aln = make_aligned_seqs(data=data, moltype=DNA)
+        calc = JC69Pair(moltype=DNA, alignment=aln)
+        calc.run(show_progress=False)
+        dists = calc.get_pairwise_distances()
+        self.assertEqual(dists.names, ["s1", "s2", "s3", "s4"])
+        self.assertEqual(dists["s2", "s3"], 0)
+        self.assertEqual(dists["s1", "s2"], dists["s1", "s3"])
+        unique = calc.get_pairwise_distances(include_duplicates=False)
+        self.assertEqual(unique.shape, (3, 3))
+        tree = dists.quick_tree(show_progress=False)
+        self.assertEqual(set(tree.get_tip_names()), set(data))
+
+
 class DistancesTests(TestCase):
     def setUp(self):
         self.al = make_aligned_seqs(
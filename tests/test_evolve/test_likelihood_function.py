@@ -27,6 +27,7 @@ from cogent3 import (
     make_tree,
 )
 from cogent3.evolve import ns_substitution_model, predicate, substitution_model
+from cogent3.evolve.likelihood_tree import scaled
 from cogent3.evolve.models import (
     CNFGTR,
     GN,
@@ -998,6 +999,200 @@ NineBande      root    1.0000    1.0000
         bprobs = lf.get_bin_probs()
         self.assertEqual(bprobs.shape[1], len(aln))
 
+    def test_calculator_cache_counts(self):
+        """calculators report use of the exponentiator cache"""
+        from cogent3.maths.matrix_exponentiation import EXPONENTIATOR_CACHE
+
+        EXPONENTIATOR_CACHE.clear()
+        tree = make_tree(tip_names=["Human", "Mouse", "Opossum"])
+        sm = get_model("HKY85")
+        counts = []
+        for i in range(2):
+            lf = sm.make_likelihood_function(tree)
+            lf.set_alignment(_aln)
+            calc = lf.make_calculator()
+            counts.append((calc.cache_hits, calc.cache_misses))
+        # the second calculator reuses the first's decomposition of Q
+        self.assertEqual(counts[1][1], 0)
+        self.assertGreater(counts[1][0], 0)
+        self.assertGreater(EXPONENTIATOR_CACHE.hits, 0)
+
+    def test_batched_psubs(self):
+        """psubs of edges sharing Q that change together are computed in one
+        batch"""
+        from unittest.mock import patch
+
+        from cogent3.maths.matrix_exponentiation import EigenExponentiator
+
+        tree = make_tree(tip_names=["Human", "Mouse", "Opossum"])
+        lf = get_model("HKY85").make_likelihood_function(tree)
+        lf.set_alignment(_aln)
+        calc = lf.make_calculator()
+        x = calc.get_value_array()
+        lengths = [i for (i, p) in enumerate(calc.opt_pars) if p.name == "length"]
+        kappa = [i for (i, p) in enumerate(calc.opt_pars) if p.name == "kappa"]
+        batch = EigenExponentiator.batch
+        with patch.object(
+            EigenExponentiator, "batch", autospec=True, side_effect=batch
+        ) as batched:
+            # changing Q recomputes every edge in one batch
+            calc.change([(kappa[0], x[kappa[0]] * 2)])
+            self.assertEqual(batched.call_count, 1)
+            self.assertEqual(len(batched.call_args[0][1]), 3)
+            # as does changing every length, e.g. a gradient based step
+            calc.change([(i, x[i] * 2) for i in lengths])
+            self.assertEqual(batched.call_count, 2)
+            # a single length is computed on its own
+            calc.change([(lengths[0], x[lengths[0]] * 3)])
+            self.assertEqual(batched.call_count, 2)
+
+            # the values from this batch are checked below
+            calc.change([(kappa[0], x[kappa[0]] * 3)])
+            self.assertEqual(batched.call_count, 3)
+
+        value = calc._get_current_cell_value
+        psubs = [cell for cell in calc._cells if cell.name == "psubs"]
+        self.assertEqual(len(psubs), 3)
+        for cell in psubs:
+            (exponentiator, distance) = cell.args
+            expect = value(exponentiator)(value(distance))
+            assert_allclose(value(cell), expect)
+
+    def test_length_change_recomputes_one_psubs(self):
+        """changing one branch length only recomputes that edge's psubs"""
+        names = ["Human", "HowlerMon", "Mouse", "Rat", "Cow"]
+        tree = make_tree(tip_names=names)
+        lf = get_model("HKY85").make_likelihood_function(tree)
+        lf.set_alignment(ALIGNMENT.take_seqs(names))
+        calc = lf.make_calculator()
+        lengths = [i for (i, p) in enumerate(calc.opt_pars) if p.name == "length"]
+        self.assertEqual(len(lengths), 5)
+        for i in lengths:
+            program = calc.cells_changed_by([(i, 0.5)])
+            psubs = [c for c in program if c.name.startswith("psubs")]
+            self.assertEqual(len(psubs), 1)
+            # the P matrix, and the partials from the edge to the root
+            self.assertLess(len(program), 10)
+
+        # changing Q recomputes every edge
+        kappa = [i for (i, p) in enumerate(calc.opt_pars) if p.name == "kappa"]
+        program = calc.cells_changed_by([(kappa[0], 2.0)])
+        psubs = [c for c in program if c.name == "psubs"]
+        self.assertEqual(len(psubs), 5)
+
+    def test_gradient(self):
+        """analytic gradients match finite differences"""
+        tree = make_tree(tip_names=["Human", "Mouse", "Opossum"])
+        for name in ("HKY85", "GTR"):
+            lf = get_model(name).make_likelihood_function(tree)
+            lf.set_alignment(_aln)
+            calc = lf.make_calculator()
+            analytic = calc.gradient()
+            calc._analytic_gradient = None
+            numeric = calc.gradient()
+            assert_allclose(analytic, numeric, rtol=1e-4, atol=1e-4)
+
+    def test_gradient_at_bound(self):
+        """analytic gradients are accurate for rate parameters at a bound"""
+        tree = make_tree(tip_names=["Human", "Mouse", "Opossum"])
+        lf = get_model("GTR").make_likelihood_function(tree)
+        lf.set_alignment(_aln)
+        lf.set_param_rule("A/G", init=1e-6)
+        calc = lf.make_calculator()
+        analytic = calc.gradient()
+        calc._analytic_gradient = None
+        numeric = calc.gradient()
+        assert_allclose(analytic, numeric, rtol=1e-4, atol=1e-4)
+
+        # a rate of zero does not produce a zero step size
+        lf.set_param_rule("A/C", init=0.0, lower=0.0, upper=10.0)
+        calc = lf.make_calculator()
+        analytic = lf._analytic_gradient(calc)
+        self.assertTrue(numpy.isfinite(list(analytic.values())).all())
+
+    def test_optimise_lbfgsb(self):
+        """L-BFGS-B and Powell find the same maximum"""
+        tree = make_tree(tip_names=_aln.names)
+        lnLs = []
+        for method in ("Powell", "L-BFGS-B"):
+            lf = get_model("HKY85").make_likelihood_function(tree)
+            lf.set_alignment(_aln)
+            lf.optimise(method=method, local=True, show_progress=False)
+            lnLs.append(lf.lnL)
+        assert_allclose(lnLs[0], lnLs[1], atol=1e-3)
+
+    def test_edge_likelihoods(self):
+        """lnL from the conditional likelihoods either side of an edge"""
+        tree = make_tree(tip_names=_aln.names)
+        lf = get_model("HKY85").make_likelihood_function(tree)
+        lf.set_alignment(_aln)
+        lf.set_param_rule("kappa", init=4.0)
+        calc = lf.make_calculator()
+        (root, mprobs, edges) = lf._get_edge_psubs(calc)
+        psubs = {name: value[0] for (name, value) in edges.items()}
+        expect = {}
+        for name in psubs:
+            lf.set_param_rule("length", edge=name, init=0.3)
+            expect[name] = lf.lnL
+            lf.set_param_rule("length", edge=name, init=1.0)
+
+        got = {}
+
+        def visit(name, edge_lnL):
+            self.assertAlmostEqual(edge_lnL(psubs[name]), calc.testfunction())
+            exp = edges[name][1]
+            got[name] = edge_lnL(exp(0.3))
+
+        root.traverse_edges(psubs, mprobs, visit)
+        self.assertEqual(set(got), set(expect))
+        for name in expect:
+            assert_allclose(got[name], expect[name])
+
+    def test_optimise_branch_lengths(self):
+        """optimising one branch length at a time finds the maximum"""
+        tree = make_tree(tip_names=_aln.names)
+        lnLs = []
+        for by_edge in (False, True):
+            lf = get_model("HKY85").make_likelihood_function(tree)
+            lf.set_alignment(_aln)
+            lf.set_param_rule("kappa", value=4.0, is_constant=True)
+            if by_edge:
+                self.assertTrue(lf.optimise_branch_lengths())
+            else:
+                lf.optimise(local=True, show_progress=False)
+            lnLs.append(lf.lnL)
+        assert_allclose(lnLs[0], lnLs[1], atol=1e-4)
+
+        # not supported with multiple bins
+        sm = get_model("HKY85", ordered_param="rate", distribution="gamma")
+        lf = sm.make_likelihood_function(tree, bins=2)
+        lf.set_alignment(_aln)
+        self.assertFalse(lf.optimise_branch_lengths())
+
+    def test_fused_bins(self):
+        """single traversal of all bins matches separate traversals"""
+        aln = load_aligned_seqs("data/primates_brca1.fasta", moltype="dna")
+        tree = load_tree("data/primates_brca1.tree")
+        sm = get_model("HKY85", ordered_param="rate", distribution="gamma")
+        results = []
+        for fused in (False, True):
+            lf = sm.make_likelihood_function(tree, bins=4, fused_bins=fused)
+            lf.set_alignment(aln)
+            lf.set_param_rule("rate_shape", init=0.5)
+            lf.set_param_rule("kappa", init=3.0, bin="bin3")
+            results.append(lf)
+
+        unfused, fused = results
+        assert_allclose(fused.lnL, unfused.lnL)
+        assert_allclose(fused.get_bin_probs().array, unfused.get_bin_probs().array)
+        assert_allclose(
+            fused.get_full_length_likelihoods(), unfused.get_full_length_likelihoods()
+        )
+        expect = unfused.reconstruct_ancestral_seqs()
+        got = fused.reconstruct_ancestral_seqs()
+        for edge in expect:
+            assert_allclose(got[edge].array, expect[edge].array)
+
     def test_time_het_init_from_nested(self):
         """initialise from nested should honour alt model setting"""
         # setting time-het for entire Q
@@ -1968,6 +2163,32 @@ class ComparisonTests(TestCase):
         assert_allclose(lf.lnL, lnL, rtol=1e-5)
         assert_allclose(lf.nfp, nfp)
 
+    def test_partitioned_evaluation(self):
+        """loci evaluated concurrently give the same likelihood"""
+        from cogent3.recalculation.scope import EACH
+
+        aln = load_aligned_seqs("data/long_testseqs.fasta")
+        half = len(aln) // 2
+        loci = [aln[:half], aln[half:]]
+        tree = make_tree(tip_names=aln.names)
+        sm = get_model("HKY85")
+        lnLs = []
+        for threads in (1, 2):
+            lf = sm.make_likelihood_function(tree, loci=["1st-half", "2nd-half"])
+            lf.set_param_rule("kappa", loci=EACH)
+            lf.set_alignment(loci)
+            lf.set_partitioned_evaluation(threads)
+            calc = lf.make_calculator()
+            self.assertEqual(calc._partition_labels is not None, threads > 1)
+            lf.optimise(
+                local=True,
+                show_progress=False,
+                max_evaluations=200,
+                limit_action="ignore",
+            )
+            lnLs.append(lf.lnL)
+        assert_allclose(lnLs[0], lnLs[1])
+
     def test_loci(self):
         """recap multiple-loci"""
         from cogent3.recalculation.scope import EACH, ALL
@@ -2115,5 +2336,130 @@ class ComparisonTests(TestCase):
         assert_allclose(lf.nfp, nfp)
 
 
+class ScaledLikelihoodTests(TestCase):
+    """partial likelihoods are rescaled once they would underflow"""
+
+    def test_scaled_product(self):
+        """rescaling avoids underflow at an edge"""
+        from cogent3.evolve.likelihood_tree import (
+            LikelihoodTreeEdge,
+            get_exponents,
+            make_likelihood_tree_leaf,
+        )
+
+        aln = make_aligned_seqs(
+            data={"a": "ACGT", "b": "ACGA", "c": "ACGT", "d": "TCGA"}, moltype=DNA
+        )
+        leaves = [make_likelihood_tree_leaf(aln.get_seq(n), seq_name=n) for n in "abcd"]
+        # an edge is only rescaled once its product is too small
+        edge = LikelihoodTreeEdge(leaves, "root")
+        got = edge.sum_input_likelihoods(*[numpy.full(l.shape, 0.5) for l in leaves])
+        self.assertIsNone(get_exponents(got))
+        self.assertFalse(edge.scaled)
+
+        # tiny child values would underflow in a product of 4
+        child_lhs = [numpy.full(leaf.shape, 1e-100) for leaf in leaves]
+        got = edge.sum_input_likelihoods(*child_lhs)
+        self.assertTrue(edge.scaled)
+        lhs = numpy.inner(got, numpy.full(4, 0.25))
+        lhs = scaled(lhs, got.exponents)
+        expect = -400 * numpy.log(10) * edge.counts.sum()
+        assert_allclose(edge.get_log_sum_across_sites(lhs), expect)
+        assert_allclose(
+            edge.get_full_length_likelihoods(lhs), numpy.zeros(len(edge.index))
+        )
+
+    def test_scaled_lnL(self):
+        """lnL the same with and without scaling"""
+        from functools import partial
+        from unittest.mock import patch
+
+        from cogent3.evolve import likelihood_calculation
+
+        aln = load_aligned_seqs("data/primates_brca1.fasta", moltype="dna")
+        tree = load_tree("data/primates_brca1.tree")
+        sm = get_model("HKY85", ordered_param="rate", distribution="gamma")
+        build = likelihood_calculation.recursive_lht_build
+        for kw in ({}, dict(bins=2), dict(bins=2, sites_independent=False)):
+            results = []
+            for force in (False, True):
+                # every edge is rescaled when forced
+                with patch.object(
+                    likelihood_calculation,
+                    "recursive_lht_build",
+                    partial(build, scaled=force),
+                ):
+                    lf = sm.make_likelihood_function(tree, **kw)
+                    lf.set_param_rule("length", init=2.0)
+                    lf.set_alignment(aln)
+                results.append(lf)
+            unscaled, scaled_lf = results
+            assert_allclose(scaled_lf.lnL, unscaled.lnL)
+            assert_allclose(
+                scaled_lf.get_G_statistic(), unscaled.get_G_statistic(), rtol=1e-5
+            )
+            if kw:
+                assert_allclose(
+                    scaled_lf.get_bin_probs().array, unscaled.get_bin_probs().array
+                )
+
+
+class LikelihoodKernelTests(TestCase):
+    def test_num_threads(self):
+        """lnL independent of the number of kernel threads"""
+        from cogent3.evolve import likelihood_tree
+
+        aln = load_aligned_seqs("data/brca1.fasta", moltype="dna")
+        tree = make_tree(tip_names=aln.names)
+        orig = likelihood_tree.get_num_threads()
+        lnLs = []
+        try:
+            for num_threads in (1, 3):
+                likelihood_tree.set_num_threads(num_threads)
+                lf = get_model("HKY85").make_likelihood_function(tree)
+                lf.set_alignment(aln)
+                lnLs.append(lf.lnL)
+        finally:
+            likelihood_tree.set_num_threads(orig)
+        assert_allclose(lnLs[0], lnLs[1])
+
+    def test_indexed(self):
+        """site patterns numbered in order of first occurrence"""
+        from cogent3.evolve.likelihood_tree import _indexed
+
+        got = _indexed("ACAAG")
+        self.assertEqual(got[:2], (["A", "C", "G"], [3, 1, 1]))
+        self.assertEqual(got[2].tolist(), [0, 1, 0, 0, 2])
+        got = _indexed(["TTA", "TC", "TTA"])
+        self.assertEqual(got[:2], (["TTA", "TC"], [2, 1]))
+        self.assertEqual(got[2].tolist(), [0, 1, 0])
+        got = _indexed([(3, 0), (0, 2), (3, 0)])
+        self.assertEqual(got[:2], ([(3, 0), (0, 2)], [2, 1]))
+        self.assertEqual(got[2].tolist(), [0, 1, 0])
+        # too many combinations to pack into an integer
+        big = numpy.array([[2 ** 40, 2 ** 40, 1], [0, 0, 0], [2 ** 40, 2 ** 40, 1]])
+        self.assertEqual(_indexed(big)[2].tolist(), [0, 1, 0])
+        self.assertEqual(_indexed("")[:2], ([], []))
+
+    def test_leaves_cached(self):
+        """leaves made once per alignment and alphabet"""
+        aln = load_aligned_seqs("data/brca1.fasta", moltype="dna")
+        aln = aln.take_seqs(aln.names[:5])
+        tree = make_tree(tip_names=aln.names)
+        lnLs = []
+        for name in ("HKY85", "GTR"):
+            lf = get_model(name).make_likelihood_function(tree)
+            lf.set_alignment(aln)
+            lnLs.append(lf.lnL)
+        leaves = aln._likelihood_leaves
+        self.assertEqual(len(leaves), 2)  # model and counted alphabets
+
+        # same result as an alignment without cached leaves
+        fresh = aln.take_seqs(aln.names)
+        lf = get_model("GTR").make_likelihood_function(tree)
+        lf.set_alignment(fresh)
+        assert_allclose(lf.lnL, lnLs[1])
+
+
 if __name__ == "__main__":
     main()
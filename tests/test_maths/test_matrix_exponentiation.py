@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Unit tests for matrix exponentiation."""
+import pickle
+
+from concurrent.futures import ThreadPoolExecutor
+
+from numpy import array
+from numpy.testing import assert_allclose
+
+from cogent3.maths.matrix_exponentiation import (
+    EXPONENTIATOR_CACHE,
+    CachedExponentiator,
+    ExponentiatorCache,
+    FastExponentiator,
+    PadeExponentiator,
+)
+from cogent3.util.unit_test import TestCase, main
+
+
+__author__ = "Gavin Huttley"
+__copyright__ = "Copyright 2007-2019, The Cogent Project"
+__credits__ = ["Gavin Huttley"]
+__license__ = "BSD-3"
+__version__ = "2019.12.6a"
+__maintainer__ = "Gavin Huttley"
+__email__ = "gavin.huttley@anu.edu.au"
+__status__ = "Production"
+
+
+Q = array(
+    [
+        [-0.9, 0.2, 0.5, 0.2],
+        [0.1, -0.5, 0.1, 0.3],
+        [0.3, 0.3, -0.8, 0.2],
+        [0.2, 0.4, 0.1, -0.7],
+    ]
+)
+
+
+class ExponentiatorCacheTests(TestCase):
+    def test_cache_hit(self):
+        """equal Q values reuse the exponentiator"""
+        cache = ExponentiatorCache()
+        first, hit = cache.get(FastExponentiator, Q)
+        self.assertFalse(hit)
+        second, hit = cache.get(FastExponentiator, Q.copy())
+        self.assertTrue(hit)
+        self.assertIs(first, second)
+        assert_allclose(second(0.1), PadeExponentiator(Q)(0.1))
+        # different factory or Q are different entries
+        cache.get(PadeExponentiator, Q)
+        cache.get(FastExponentiator, Q * 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(len(cache), 3)
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_cache_bounded(self):
+        """least recently used entries are discarded"""
+        cache = ExponentiatorCache(maxsize=2)
+        cache.get(FastExponentiator, Q)
+        cache.get(FastExponentiator, Q * 2)
+        cache.get(FastExponentiator, Q)
+        cache.get(FastExponentiator, Q * 3)
+        self.assertEqual(len(cache), 2)
+        _, hit = cache.get(FastExponentiator, Q)
+        self.assertTrue(hit)
+        _, hit = cache.get(FastExponentiator, Q * 2)
+        self.assertFalse(hit)
+
+    def test_cached_exponentiator(self):
+        """counts its own use of a shared cache"""
+        cache = ExponentiatorCache()
+        exp1 = CachedExponentiator(FastExponentiator, cache)
+        exp2 = CachedExponentiator(FastExponentiator, cache)
+        exp1(Q)
+        exp2(Q)
+        exp2(Q)
+        self.assertEqual((exp1.hits, exp1.misses), (0, 1))
+        self.assertEqual((exp2.hits, exp2.misses), (2, 0))
+
+    def test_threaded_access(self):
+        """concurrent use of a constantly evicting cache is consistent"""
+        cache = ExponentiatorCache(maxsize=2)
+        exp = CachedExponentiator(FastExponentiator, cache)
+        scales = [1 + (i % 5) / 10 for i in range(2000)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda x: exp(Q * x), scales))
+        self.assertEqual(len(results), len(scales))
+        self.assertEqual(cache.hits + cache.misses, len(scales))
+        self.assertEqual(exp.hits + exp.misses, len(scales))
+        self.assertLessEqual(len(cache), 2)
+
+    def test_pickling(self):
+        """cached exponentiators pickle without the cache contents"""
+        cache = ExponentiatorCache(maxsize=3)
+        cache.get(FastExponentiator, Q)
+        got = pickle.loads(pickle.dumps(cache))
+        self.assertEqual((got.maxsize, len(got)), (3, 0))
+        got = pickle.loads(pickle.dumps(CachedExponentiator(FastExponentiator)))
+        self.assertIs(got.cache, EXPONENTIATOR_CACHE)
+        assert_allclose(got(Q)(0.1), PadeExponentiator(Q)(0.1))
+
+
+class BatchTests(TestCase):
+    def test_batch(self):
+        """stacked P matrices match individual exponentiations"""
+        ts = [0.0, 0.01, 0.2, 1.5]
+        for factory in (FastExponentiator, PadeExponentiator):
+            exp = factory(Q)
+            got = exp.batch(ts)
+            self.assertEqual(got.shape, (4, 4, 4))
+            for (t, P) in zip(ts, got):
+                assert_allclose(P, exp(t), atol=1e-12)
+
+
+if __name__ == "__main__":
+    main()
@@ -61,6 +61,10 @@ def MakeF():
     return f, last, evals
 
 
+def quartic_gradient(x):
+    return -0.1 * (12 * x ** 3 + 24 * x ** 2 - 96 * x)
+
+
 class OptimiserTestCase(TestCase):
     def _test_optimisation(self, target=-4, xinit=1.0, bounds=None, **kw):
         bounds = bounds or ([-10, 10])
@@ -87,6 +91,29 @@ class OptimiserTestCase(TestCase):
         # Global minimum not the nearest one
         self._test_optimisation(local=True, target=2)
 
+    def test_lbfgsb(self):
+        """gradient based local optimiser"""
+        self._test_optimisation(
+            local=True, target=2, method="L-BFGS-B", gradient=quartic_gradient
+        )
+        self._test_optimisation(
+            local=True,
+            xinit=-3.0,
+            target=-4,
+            method="L-BFGS-B",
+            gradient=quartic_gradient,
+        )
+        # the maximum is at the bound
+        self._test_optimisation(
+            local=True,
+            bounds=([0.0], [1.5]),
+            target=1.5,
+            method="L-BFGS-B",
+            gradient=quartic_gradient,
+        )
+        with self.assertRaises(ValueError):
+            self._test_optimisation(local=True, method="L-BFGS-B")
+
     def test_limited(self):
         self.assertRaises(
             MaximumEvaluationsReached, self._test_optimisation, max_evaluations=5
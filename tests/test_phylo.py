@@ -9,7 +9,7 @@ from cogent3 import get_model, load_aligned_seqs, load_tree, make_tree
 from cogent3.phylo.consensus import get_splits, get_tree, majority_rule
 from cogent3.phylo.least_squares import wls
 from cogent3.phylo.maximum_likelihood import ML
-from cogent3.phylo.nj import gnj, nj
+from cogent3.phylo.nj import _fast_nj, _get_names_and_array, _gnj, gnj, nj
 from cogent3.phylo.tree_collection import (
     LogLikelihoodScoredTreeCollection,
     ScoredTreeCollection,
@@ -509,6 +509,28 @@ class TreeReconstructionTests(unittest.TestCase):
         reconstructed = nj(self.dists, show_progress=False)
         self.assertTreeDistancesEqual(self.tree, reconstructed)
 
+    def test_fast_nj(self):
+        """the single tree engine matches the generalised algorithm"""
+        from numpy.random import RandomState
+
+        from cogent3.util.progress_display import NULL_CONTEXT
+
+        names, d = _get_names_and_array(self.dists)
+        score, reconstructed = _fast_nj(names, d)
+        self.assertTreeDistancesEqual(self.tree, reconstructed)
+
+        rng = RandomState(7)
+        for num in (4, 9, 25):
+            names = ["t%d" % i for i in range(num)]
+            points = rng.random_sample((num, 3))
+            d = ((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=-1) ** 0.5
+            ((expect_score, expect),) = _gnj(names, d, 1, 0, NULL_CONTEXT)
+            for use_bounds in (False, True):
+                score, got = _fast_nj(names, d, use_bounds=use_bounds)
+                self.assertAlmostEqual(score, expect_score)
+                self.assertTrue(got.same_topology(expect))
+                self.assertTreeDistancesEqual(got, expect)
+
     def test_gnj(self):
         """testing gnj"""
         results = gnj(self.dists, keep=1, show_progress=False)
@@ -582,6 +604,19 @@ class TreeReconstructionTests(unittest.TestCase):
         assert_allclose(lnL, -8882.217502905267)
         self.assertTrue(tree.same_topology(make_tree("(Mouse,Rat,(Human,Dog));")))
 
+    def test_ml_lengths_only(self):
+        """ML scoring trees by optimising one branch length at a time"""
+        from numpy.testing import assert_allclose
+
+        aln = load_aligned_seqs(os.path.join(data_path, "brca1.fasta"), moltype="dna")
+        aln = aln.take_seqs(["Human", "Mouse", "Rat", "Dog"])
+        aln = aln.omit_gap_pos(allowed_gap_frac=0)
+        model = get_model("JC69")
+        ml = ML(model, aln, lengths_only=True)
+        lnL, tree = ml.trex(a=3, k=1, show_progress=False)
+        assert_allclose(lnL, -8882.217502905267, rtol=1e-6)
+        self.assertTrue(tree.same_topology(make_tree("(Mouse,Rat,(Human,Dog));")))
+
 
 if __name__ == "__main__":
     unittest.main()
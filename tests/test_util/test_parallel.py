@@ -56,6 +56,43 @@ class ParallelTests(TestCase):
         self.assertEqual(result1[0], result2[0])
         self.assertNotEqual(result1, result2)
 
+    @skipIf(multiprocessing.cpu_count() < 2, "requires multiple cpus")
+    def test_as_completed(self):
+        """as_completed yields all indices and results"""
+        index = list(range(10))
+        got = parallel.as_completed(
+            get_ranint, iter(index), max_workers=1, max_in_flight=2
+        )
+        got = dict(got)
+        self.assertEqual(set(got), set(index))
+        self.assertEqual(got, dict(enumerate(map(get_ranint, index))))
+
+    @skipIf(multiprocessing.cpu_count() < 2, "requires multiple cpus")
+    def test_batched(self):
+        """batched execution returns results in the order of inputs"""
+        index = list(range(50))
+        expect = list(map(get_ranint, index))
+        got = parallel.map(get_ranint, index, max_workers=1, batched=True)
+        self.assertEqual(got, expect)
+        got = parallel.as_completed(
+            get_ranint, index, max_workers=1, max_in_flight=7, batched=True
+        )
+        self.assertEqual(dict(got), dict(enumerate(expect)))
+
+    def test_chunk_sizer(self):
+        """chunk size adapts to the time per element"""
+        sizer = parallel._ChunkSizer(target_time=0.1, max_chunksize=100)
+        self.assertEqual(sizer.chunksize, 1)
+        sizer.record(1, 0.01)
+        self.assertEqual(sizer.chunksize, 10)
+        sizer.record(9, 0.0)
+        self.assertEqual(sizer.chunksize, 100)
+        sizer.record(1, 10.0)
+        self.assertEqual(sizer.chunksize, 1)
+        sizer = parallel._ChunkSizer(chunksize=3)
+        sizer.record(1, 10.0)
+        self.assertEqual(sizer.chunksize, 3)
+
     @skipIf(sys.version_info[1] < 7, "method exclusive to Python 3.7 and above")
     def test_is_master_process(self):
         """